@@ -0,0 +1,105 @@
+"""
+Compare the throughput of WorkFlow.run_many() in serial, thread and process mode for a CPU bound and an I/O bound
+Function, and of a Function summing numbers against a BatchFunction doing the same per batch of records.
+
+Run from the project root with:
+
+    python -m benchmarks.bench_batch [--items 2000] [--workers 4]
+"""
+import argparse, time, os
+from pytaskflow.taskflow_engine import Function, BatchFunction, Result, Task, WorkFlow
+from pytaskflow.columns import numpy
+from benchmarks.harness import measure, new_report, write_report
+
+
+class CpuBoundFunction(Function):
+    def __init__(self):
+        super(CpuBoundFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        total = 0
+        for i in range(input_result.result_obj['Value'] % 100 + 20000):
+            total += i * i
+        return Result(result_obj={'Total': total})
+
+
+class IoBoundFunction(Function):
+    def __init__(self):
+        super(IoBoundFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        time.sleep(0.002)
+        return Result(result_obj={'Value': input_result.result_obj['Value']})
+
+
+class SumFunction(Function):
+    def __init__(self):
+        super(SumFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj={'Total': sum(input_result.result_obj['Numbers'])})
+
+
+class SumBatchFunction(BatchFunction):
+    columns = ('Numbers',)
+
+    def __init__(self):
+        super(SumBatchFunction, self).__init__()
+
+    def execute_batch(self, input_results, globals_dict={}):
+        numbers = input_results['Numbers']
+        if numpy is not None and isinstance(numbers, numpy.ndarray):
+            totals = numbers.sum(axis=1)
+        else:
+            totals = [sum(row) for row in numbers]
+        return input_results.to_results({'Total': totals}, keep_fields=False)
+
+
+def get_workflow(function):
+    t = Task(task_name=function.__class__.__name__)
+    t.register_function(function=function, success_task=None, err_task=None)
+    return WorkFlow(workflow_name='Benchmark Workflow', starter_task=t)
+
+
+def run_batch(workflow, items, workers, mode):
+    inputs = (Result(result_obj={'Value': i}) for i in range(items))
+    for _ in workflow.run_many(inputs=inputs, workers=workers, mode=mode, chunk_size=32):
+        pass
+
+
+def run_sums(workflow, items, chunk_size):
+    inputs = (Result(result_obj={'Numbers': list(range(i % 10, i % 10 + 64))}) for i in range(items))
+    for _ in workflow.run_many(inputs=inputs, mode='serial', chunk_size=chunk_size):
+        pass
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark WorkFlow.run_many()')
+    parser.add_argument('--items', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    options = parser.parse_args(args)
+
+    report = new_report(suite='batch')
+    for workload, function in (('cpu_bound', CpuBoundFunction()), ('io_bound', IoBoundFunction())):
+        workflow = get_workflow(function)
+        for mode in ('serial', 'thread', 'process'):
+            stats = measure(
+                lambda: run_batch(workflow=workflow, items=options.items, workers=options.workers, mode=mode),
+                repeat=1, items=options.items
+            )
+            report['benchmarks']['{}.{}'.format(workload, mode)] = stats
+            print('{:<10} {:<8} {:>10.1f} items/s'.format(workload, mode, 1e9 / stats['best_ns']))
+    for workload, function in (('sum.per_record', SumFunction()), ('sum.batch_function', SumBatchFunction())):
+        workflow = get_workflow(function)
+        stats = measure(lambda: run_sums(workflow=workflow, items=options.items, chunk_size=256), repeat=1, items=options.items)
+        report['benchmarks'][workload] = stats
+        print('{:<19} {:>10.1f} items/s'.format(workload, 1e9 / stats['best_ns']))
+    if options.output is not None:
+        write_report(report, options.output)
+
+
+if __name__ == '__main__':
+    main()
+
+# EOF
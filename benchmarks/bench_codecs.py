@@ -0,0 +1,65 @@
+"""
+Compare the session codecs of pytaskflow.serialization: the encoded size and the time to encode and to decode a
+typical session (a Result holding a dict of numbers, strings and a list) per codec.
+
+Run from the project root with:
+
+    python -m benchmarks.bench_codecs [--items 100] [--number 1000]
+"""
+import argparse
+from pytaskflow.taskflow_engine import Result, Task
+from pytaskflow.serialization import get_codec
+from benchmarks.harness import measure, new_report, print_report, write_report
+
+
+CODECS = ('pickle', 'json', 'marshal')
+
+
+def get_session_data(items):
+    result_obj = {
+        'Numbers': list(range(items)),
+        'Names': dict(('name{}'.format(i), 'value {}'.format(i)) for i in range(items)),
+        'Total': float(items),
+    }
+    # The override Task is not part of the lean wire form, so it costs nothing
+    return Result(result_obj=result_obj, override_success_task=Task(task_name='Next'))
+
+
+def run_benchmarks(items=100, number=1000, repeat=5):
+    """
+    :param items: int with the number of items in the lists and dicts of the session
+    :param number: int with the number of encodes or decodes per measurement
+    :param repeat: int with the number of measurements
+    :return: dict report, with the encoded size in bytes per codec under 'sizes'
+    """
+    report = new_report(suite='codecs')
+    report['sizes'] = {}
+    session_data = get_session_data(items)
+    for name in CODECS:
+        codec = get_codec(name)
+        data = codec.encode(session_data)
+        report['benchmarks']['codec.{}.encode'.format(name)] = measure(lambda: codec.encode(session_data), number=number, repeat=repeat)
+        report['benchmarks']['codec.{}.decode'.format(name)] = measure(lambda: codec.decode(data), number=number, repeat=repeat)
+        report['sizes'][name] = len(data)
+    return report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark session codecs')
+    parser.add_argument('--items', type=int, default=100)
+    parser.add_argument('--number', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    options = parser.parse_args(args)
+    report = run_benchmarks(items=options.items, number=options.number, repeat=options.repeat)
+    print_report(report)
+    for name in CODECS:
+        print('{:<40} {:>12} bytes'.format('codec.{}.size'.format(name), report['sizes'][name]))
+    if options.output is not None:
+        write_report(report, options.output)
+
+
+if __name__ == '__main__':
+    main()
+
+# EOF
@@ -0,0 +1,67 @@
+"""
+Measure the per-step dispatch overhead of the executor for an uncompiled and a compiled WorkFlow, using a Function
+that does next to nothing so that the engine itself dominates. As a reference, the same chain is also walked with
+Task.execute_function() and Task.select_next_task(), which re-check every Result and override target on every step.
+
+Run from the project root with:
+
+    python -m benchmarks.bench_dispatch [--steps 200000]
+"""
+import argparse
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
+from benchmarks.harness import measure, new_report, print_report, write_report
+
+
+class CountDownFunction(Function):
+    def __init__(self):
+        super(CountDownFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        count = input_result.result_obj['Count'] - 1
+        return Result(result_obj={'Count': count}, stop=count <= 0)
+
+
+def get_workflow():
+    t = Task(task_name='Count Down')
+    t.register_function(function=CountDownFunction(), success_task=t, err_task=None)
+    return WorkFlow(workflow_name='Dispatch Benchmark', starter_task=t)
+
+
+def walk_tasks(workflow, input_result):
+    task = workflow.starter_task
+    result = input_result
+    while task is not None:
+        result = task.execute_function(input_result=result)
+        task = task.select_next_task(result=result)
+    return result
+
+
+def measure_steps(run, workflow, steps):
+    return measure(lambda: run(workflow, Result(result_obj={'Count': steps})), items=steps)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark executor dispatch overhead')
+    parser.add_argument('--steps', type=int, default=200000)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    options = parser.parse_args(args)
+
+    # Without an ExecutionContext, so that only dispatch is compared with the task walk
+    run_workflow = lambda workflow, input_result: workflow.executor.run(
+        starter_task=workflow.starter_task, input_result=input_result, graph=workflow.compiled
+    )
+    report = new_report(suite='dispatch')
+    workflow = get_workflow()
+    report['benchmarks']['dispatch.task_walk'] = measure_steps(run=walk_tasks, workflow=workflow, steps=options.steps)
+    report['benchmarks']['dispatch.uncompiled'] = measure_steps(run=run_workflow, workflow=workflow, steps=options.steps)
+    workflow.compile()
+    report['benchmarks']['dispatch.compiled'] = measure_steps(run=run_workflow, workflow=workflow, steps=options.steps)
+    print_report(report)
+    if options.output is not None:
+        write_report(report, options.output)
+
+
+if __name__ == '__main__':
+    main()
+
+# EOF
@@ -0,0 +1,160 @@
+"""
+Benchmarks for the engine hot path: per-step overhead, long chains, loops through override_success_task (also with
+the TaskStatsAggregator hook enabled), error routing, Result construction and session save/load (file and SQLite).
+Nothing here needs the network.
+
+Run from the project root with:
+
+    python -m benchmarks.bench_engine [--scale 1.0] [--output engine.json]
+
+Compare two reports with benchmarks.compare.
+"""
+import argparse, os, shutil, tempfile, uuid
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow, FileBasedSessionPersistence
+from pytaskflow.instrumentation import TaskStatsAggregator
+from pytaskflow.sqlite_store import SqliteSessionStore
+from benchmarks.harness import measure, new_report, print_report, write_report
+
+
+class PassThroughFunction(Function):
+    def __init__(self):
+        super(PassThroughFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj=input_result.result_obj)
+
+
+class OverrideLoopFunction(Function):
+    """
+    Loops by setting itself as override_success_task, the way examples/example01 does
+    """
+    def __init__(self):
+        super(OverrideLoopFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        count = input_result.result_obj['Count'] - 1
+        if count > 0:
+            return Result(result_obj={'Count': count}, override_success_task=globals_dict['LoopTask'])
+        return Result(result_obj={'Count': count})
+
+
+class FailFunction(Function):
+    def __init__(self):
+        super(FailFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj={}, is_error=True, err_msg='failed')
+
+
+def get_single_task():
+    t = Task(task_name='Single')
+    t.register_function(function=PassThroughFunction(), success_task=None, err_task=None)
+    return t
+
+
+def get_linear_workflow(length):
+    next_task = None
+    for i in range(length):
+        t = Task(task_name='Step {}'.format(length - i))
+        t.register_function(function=PassThroughFunction(), success_task=next_task, err_task=None)
+        next_task = t
+    return WorkFlow(workflow_name='Linear', starter_task=next_task)
+
+
+def get_loop_workflow():
+    t = Task(task_name='Loop')
+    t.register_function(function=OverrideLoopFunction(), success_task=None, err_task=None, globals_dict={'LoopTask': t})
+    return WorkFlow(workflow_name='Loop', starter_task=t)
+
+
+def get_error_workflow():
+    t_err = Task(task_name='Error')
+    t_err.register_function(function=PassThroughFunction(), success_task=None, err_task=None)
+    t = Task(task_name='Fail')
+    t.register_function(function=FailFunction(), success_task=None, err_task=t_err)
+    return WorkFlow(workflow_name='Error', starter_task=t)
+
+
+def run_benchmarks(scale=1.0, repeat=5):
+    """
+    Run every engine benchmark
+    :param scale: float to shrink (or grow) the amount of work done by every benchmark
+    :param repeat: int with the number of repeats per benchmark
+    :return: dict with the report
+    """
+    report = new_report(suite='engine')
+    benchmarks = report['benchmarks']
+    calls = max(1, int(2000 * scale))
+    steps = max(1, int(20000 * scale))
+    chain_length = max(1, int(1000 * scale))
+
+    task = get_single_task()
+    benchmarks['task.run_task'] = measure(lambda: task.run_task(input_result=Result(result_obj={})), number=calls, repeat=repeat)
+
+    for compiled in (False, True):
+        suffix = '.compiled' if compiled else ''
+        linear = get_linear_workflow(length=chain_length)
+        loop = get_loop_workflow()
+        error = get_error_workflow()
+        if compiled:
+            linear.compile()
+            loop.compile()
+            error.compile()
+        benchmarks['chain.linear' + suffix] = measure(
+            lambda: linear.run_workflow(input_result=Result(result_obj={})), repeat=repeat, items=chain_length
+        )
+        benchmarks['loop.override_success_task' + suffix] = measure(
+            lambda: loop.run_workflow(input_result=Result(result_obj={'Count': steps})), repeat=repeat, items=steps
+        )
+        benchmarks['routing.err_task' + suffix] = measure(
+            lambda: error.run_workflow(input_result=Result(result_obj={})), number=calls, repeat=repeat
+        )
+
+    instrumented = get_loop_workflow()
+    instrumented.compile()
+    instrumented.executor.add_hook(TaskStatsAggregator())
+    benchmarks['loop.override_success_task.instrumented'] = measure(
+        lambda: instrumented.run_workflow(input_result=Result(result_obj={'Count': steps})), repeat=repeat, items=steps
+    )
+
+    benchmarks['result.construct'] = measure(
+        lambda: Result(result_obj={'Numbers': [1, 2, 3]}, stop=False), number=calls * 10, repeat=repeat
+    )
+
+    token = 'pytaskflow-bench-{}'.format(uuid.uuid4().hex)
+    session_data = Result(result_obj=dict(('Key{}'.format(i), list(range(10))) for i in range(100)))
+    persistence = FileBasedSessionPersistence(session_token=token, session_data=session_data)
+    benchmarks['session.save'] = measure(persistence.save_session_data, number=max(1, calls // 10), repeat=repeat)
+    benchmarks['session.load'] = measure(persistence.get_session_data, number=max(1, calls // 10), repeat=repeat)
+    persistence.delete_session_data()
+
+    directory = tempfile.mkdtemp()
+    try:
+        store = SqliteSessionStore(os.path.join(directory, 'sessions.db'))
+        benchmarks['session.sqlite.save'] = measure(lambda: store.save(token, session_data), number=max(1, calls // 10), repeat=repeat)
+        benchmarks['session.sqlite.load'] = measure(lambda: store.load(token), number=max(1, calls // 10), repeat=repeat)
+        many = [('{}-{}'.format(token, i), session_data) for i in range(100)]
+        benchmarks['session.sqlite.save_many'] = measure(lambda: store.save_many(many), repeat=repeat, items=len(many))
+        store.close()
+    finally:
+        shutil.rmtree(directory)
+    return report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the engine hot path')
+    parser.add_argument('--scale', type=float, default=1.0, help='shrink or grow the work done per benchmark')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    options = parser.parse_args(args)
+
+    report = run_benchmarks(scale=options.scale, repeat=options.repeat)
+    print_report(report)
+    if options.output is not None:
+        write_report(report, options.output)
+
+
+if __name__ == '__main__':
+    main()
+
+# EOF
@@ -0,0 +1,93 @@
+"""
+Measure the cost of a log call on the thread running a Task: a call below max_level, a call handled by a
+QueueLogHandler, a call handled by a synchronous logging.StreamHandler and the print() the old LoggingHandler did.
+The stream is a slow writer that sleeps a little on every write, like a disk or a pipe that is not keeping up.
+
+Run from the project root with:
+
+    python -m benchmarks.bench_logging [--calls 20000] [--write-delay 0.00005]
+"""
+import argparse, contextlib, logging, time
+from pytaskflow.taskflow_engine import LoggingHandler
+from pytaskflow.async_logging import QueueLogHandler
+from benchmarks.harness import measure, new_report, print_report, write_report
+
+
+class SlowWriter:
+    """
+    A stream that takes write_delay seconds per write() call
+    """
+    def __init__(self, write_delay):
+        self.write_delay = write_delay
+        self.writes = 0
+
+    def write(self, data):
+        self.writes += 1
+        if self.write_delay > 0:
+            time.sleep(self.write_delay)
+
+    def flush(self):
+        pass
+
+
+def get_log_handler(name, handler):
+    logger = logging.getLogger('pytaskflow.bench.{}'.format(name))
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.DEBUG)
+    return LoggingHandler(max_level='info', logger=logger)
+
+
+def run_benchmarks(calls=20000, write_delay=0.00005, repeat=3):
+    """
+    :param calls: int with the number of log calls per measurement
+    :param write_delay: float with the seconds every write to the stream takes
+    :param repeat: int with the number of measurements
+    :return: dict report, with the writes made to the streams under 'writes'
+    """
+    report = new_report(suite='logging')
+    benchmarks = report['benchmarks']
+    disabled = get_log_handler('disabled', logging.NullHandler())
+    benchmarks['log.disabled'] = measure(lambda: disabled.log('debug', 'Task %s step %d', 'Task 1', 1), number=calls, repeat=repeat)
+    benchmarks['log.disabled.callable'] = measure(lambda: disabled.log('debug', lambda: 'Task 1 step 1'), number=calls, repeat=repeat)
+
+    queue_writer = SlowWriter(write_delay)
+    queue_handler = QueueLogHandler(stream=queue_writer, queue_size=calls * repeat + 1)
+    queued = get_log_handler('queue', queue_handler)
+    benchmarks['log.enabled.queue'] = measure(lambda: queued.log('info', 'Task %s step %d', 'Task 1', 1), number=calls, repeat=repeat)
+    queue_handler.close()
+
+    stream_writer = SlowWriter(write_delay)
+    synchronous = get_log_handler('stream', logging.StreamHandler(stream_writer))
+    benchmarks['log.enabled.stream'] = measure(lambda: synchronous.log('info', 'Task %s step %d', 'Task 1', 1), number=calls, repeat=repeat)
+
+    print_writer = SlowWriter(write_delay)
+    with contextlib.redirect_stdout(print_writer):
+        benchmarks['log.print'] = measure(lambda: print("[info] Task %s step %d" % ('Task 1', 1)), number=calls, repeat=repeat)
+    report['writes'] = {
+        'log.enabled.queue': queue_writer.writes,
+        'log.enabled.stream': stream_writer.writes,
+        'log.print': print_writer.writes,
+    }
+    return report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark log calls')
+    parser.add_argument('--calls', type=int, default=20000)
+    parser.add_argument('--write-delay', type=float, default=0.00005)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    options = parser.parse_args(args)
+    report = run_benchmarks(calls=options.calls, write_delay=options.write_delay, repeat=options.repeat)
+    print_report(report)
+    for name, writes in sorted(report['writes'].items()):
+        print('{:<40} {:>12} writes'.format(name, writes))
+    if options.output is not None:
+        write_report(report, options.output)
+
+
+if __name__ == '__main__':
+    main()
+
+# EOF
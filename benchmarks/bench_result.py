@@ -0,0 +1,127 @@
+"""
+Measure the slotted Result against the previous Result class (the same fields kept in a per-instance __dict__), and
+the cost of sharing a result_obj between the steps of a long loop: a defensive deep copy per step, a CopyOnWriteDict
+and a FrozenDict.
+
+Run from the project root with:
+
+    python -m benchmarks.bench_result [--steps 20000] [--payload 100]
+"""
+import argparse, copy, tracemalloc
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow, CopyOnWriteDict, freeze
+from benchmarks.harness import measure, new_report, print_report, write_report
+
+
+class LegacyResult:
+    """
+    The Result class before it got __slots__
+    """
+    def __init__(self, result_obj, is_error=False, err_msg=None, stop=False, override_success_task=None, override_err_task=None):
+        self.result_obj = result_obj
+        self.is_error = is_error
+        self.err_msg = err_msg
+        if self.result_obj is None:
+            self.result_obj = {}
+        self.stop = stop
+        self.override_success_task = override_success_task
+        self.override_err_task = override_err_task
+
+
+class DeepCopyCountDownFunction(Function):
+    def __init__(self):
+        super(DeepCopyCountDownFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        result_obj = copy.deepcopy(input_result.result_obj)
+        result_obj['Count'] -= 1
+        return Result(result_obj=result_obj, stop=result_obj['Count'] <= 0)
+
+
+class CopyOnWriteCountDownFunction(Function):
+    def __init__(self):
+        super(CopyOnWriteCountDownFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        result_obj = CopyOnWriteDict(input_result.result_obj)
+        result_obj['Count'] -= 1
+        return Result(result_obj=result_obj, stop=result_obj['Count'] <= 0)
+
+
+class FrozenCountDownFunction(Function):
+    def __init__(self):
+        super(FrozenCountDownFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        count = input_result.result_obj['Count'] - 1
+        return Result(result_obj=input_result.result_obj.set('Count', count), stop=count <= 0)
+
+
+def get_workflow(function):
+    t = Task(task_name='Count Down')
+    t.register_function(function=function, success_task=t, err_task=None)
+    workflow = WorkFlow(workflow_name='Result Benchmark', starter_task=t)
+    workflow.compile()
+    return workflow
+
+
+def bytes_per_result(result_class, count):
+    """
+    :return: float with the bytes allocated per Result (including its result_obj dict) while count Results are alive
+    """
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        results = [result_class(result_obj={'Index': i}) for i in range(count)]
+        allocated = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del results
+    return allocated / count
+
+
+def run_benchmarks(steps=20000, payload=100, repeat=3):
+    """
+    :param steps: int with the number of steps of the loops and the number of Results measured for memory
+    :param payload: int with the number of items carried along in the result_obj of the loops
+    :param repeat: int with the number of measurements
+    :return: dict report, with the bytes per Result under 'memory'
+    """
+    report = new_report(suite='result')
+    benchmarks = report['benchmarks']
+    benchmarks['result.construct.legacy'] = measure(lambda: LegacyResult(result_obj={'Count': 1}), number=steps, repeat=repeat)
+    benchmarks['result.construct.slots'] = measure(lambda: Result(result_obj={'Count': 1}), number=steps, repeat=repeat)
+    report['memory'] = {
+        'result.legacy': bytes_per_result(LegacyResult, steps),
+        'result.slots': bytes_per_result(Result, steps),
+    }
+    start = {'Count': steps, 'Payload': dict(('Key{}'.format(i), [i] * 3) for i in range(payload))}
+    loops = (
+        ('loop.deepcopy', DeepCopyCountDownFunction(), lambda: Result(result_obj=start)),
+        ('loop.copy_on_write', CopyOnWriteCountDownFunction(), lambda: Result(result_obj=start).copy_on_write()),
+        ('loop.frozen', FrozenCountDownFunction(), lambda: Result(result_obj=freeze(start))),
+    )
+    for name, function, get_input in loops:
+        workflow = get_workflow(function)
+        benchmarks[name] = measure(lambda: workflow.run_workflow(input_result=get_input()), repeat=repeat, items=steps)
+    return report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark Result and shared result_obj mappings')
+    parser.add_argument('--steps', type=int, default=20000)
+    parser.add_argument('--payload', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the report as JSON to this file')
+    options = parser.parse_args(args)
+    report = run_benchmarks(steps=options.steps, payload=options.payload, repeat=options.repeat)
+    print_report(report)
+    for name, size in sorted(report['memory'].items()):
+        print('{:<40} {:>12.0f} bytes/item'.format(name, size))
+    if options.output is not None:
+        write_report(report, options.output)
+
+
+if __name__ == '__main__':
+    main()
+
+# EOF
@@ -0,0 +1,49 @@
+"""
+Compare two benchmark reports written by the benchmarks in this directory and flag regressions.
+
+    python -m benchmarks.compare baseline.json current.json [--threshold 0.10]
+
+The exit code is 1 if any benchmark's best time got slower by more than the threshold.
+"""
+import argparse, sys
+from benchmarks.harness import read_report
+
+
+def compare(baseline, current, threshold=0.10):
+    """
+    Compare the best times of two reports
+    :param baseline: dict with the baseline report
+    :param current: dict with the current report
+    :param threshold: float with the allowed slow down (0.10 is 10%)
+    :return: list of (name, baseline_ns, current_ns, ratio, regressed) tuples for benchmarks found in both reports
+    """
+    rows = []
+    for name, stats in sorted(current['benchmarks'].items()):
+        if name not in baseline['benchmarks']:
+            continue
+        baseline_ns = baseline['benchmarks'][name]['best_ns']
+        current_ns = stats['best_ns']
+        ratio = current_ns / baseline_ns if baseline_ns > 0 else 1.0
+        rows.append((name, baseline_ns, current_ns, ratio, ratio > 1.0 + threshold))
+    return rows
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark reports')
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10)
+    options = parser.parse_args(args)
+
+    rows = compare(read_report(options.baseline), read_report(options.current), threshold=options.threshold)
+    for name, baseline_ns, current_ns, ratio, regressed in rows:
+        print('{:<40} {:>12.0f} {:>12.0f} {:>7.2f}x {}'.format(name, baseline_ns, current_ns, ratio, 'REGRESSION' if regressed else ''))
+    if any(row[4] for row in rows):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# EOF
@@ -0,0 +1,66 @@
+"""
+Small timing harness shared by the benchmarks. Results are collected in a report dict that can be written as JSON
+and compared between releases with benchmarks.compare.
+"""
+import json, platform, statistics, sys, time
+
+
+def measure(func, number=1, repeat=5, items=1):
+    """
+    Time a callable
+    :param func: callable without arguments to time
+    :param number: int with the number of calls per repeat
+    :param repeat: int with the number of repeats. The best repeat is the most stable figure to compare
+    :param items: int with the number of items (steps, records, ...) one call processes
+    :return: dict with best_ns, median_ns and mean_ns per item, and the parameters used
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / (number * items) * 1e9)
+    return {
+        'best_ns': min(timings),
+        'median_ns': statistics.median(timings),
+        'mean_ns': statistics.mean(timings),
+        'number': number,
+        'repeat': repeat,
+        'items': items,
+    }
+
+
+def new_report(suite):
+    """
+    Create an empty report
+    :param suite: str with the name of the benchmark suite
+    :return: dict
+    """
+    return {
+        'suite': suite,
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'timestamp': time.time(),
+        },
+        'benchmarks': {},
+    }
+
+
+def print_report(report):
+    for name, stats in sorted(report['benchmarks'].items()):
+        print('{:<40} {:>12.0f} ns/item (median {:.0f})'.format(name, stats['best_ns'], stats['median_ns']))
+
+
+def write_report(report, filename):
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+
+
+def read_report(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+# EOF
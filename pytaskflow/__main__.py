@@ -1,16 +1,8 @@
 import sys
+from pytaskflow.cli import main
 
 
-def main(args=None):
-    """The main routine."""
-    if args is None:
-        args = sys.argv[1:]
-
-    print("This is the main routine.")
-    print("It should do something interesting.")
-
-    # Do argument parsing here (eg. with argparse) and anything else
-    # you want your project to do.
-
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
+
+# EOF
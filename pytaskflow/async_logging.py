@@ -0,0 +1,178 @@
+"""
+Non-blocking logging for work flows. QueueLogHandler is a standard logging.Handler that only puts records on a
+bounded queue; a background thread formats them and writes them in batches. Threads running Tasks never wait on the
+stream, and records below the logger's level are dropped by the logging module before they are even created.
+
+    from pytaskflow.async_logging import configure_async_logging
+    handler = configure_async_logging(level='info', stream=open('/var/log/myapp/workflow.log', 'a'))
+    ...
+    handler.close()        # or let logging.shutdown() do it when the interpreter exits
+
+Records are formatted on the background thread, so the args of a log call must not be changed after the call.
+"""
+import logging, queue, sys, threading
+from pytaskflow.taskflow_engine import _level_number
+
+
+_STOP = object()
+
+
+class QueueLogHandler(logging.Handler):
+    """
+    A logging.Handler that hands records to a background thread. The thread takes up to batch_size records at a time
+    off the queue, formats them with the handler's Formatter and writes them to the stream with a single write() and
+    flush() - or, with targets, passes them to other handlers (a RotatingFileHandler, a SysLogHandler, ...).
+
+    When the queue is full, a record is dropped and counted in stats()['dropped'], unless block is set, in which case
+    the logging thread waits for room.
+    """
+    def __init__(self, stream=None, targets=None, level=logging.NOTSET, queue_size=10000, batch_size=256, linger=0.0,
+                 block=False):
+        """
+        :param stream: file object to write to (default: sys.stderr). Not used with targets
+        :param targets: list of logging.Handler to pass the records to instead of writing them to stream (optional)
+        :param level: logging level number or name of the least severe records handled
+        :param queue_size: int with the number of records the queue holds
+        :param batch_size: int with the largest number of records written at a time
+        :param linger: float with the seconds to wait for more records before writing a batch that is not full - more
+        records per write at the cost of some delay
+        :param block: bool. If True, wait for room in a full queue instead of dropping the record
+        """
+        super(QueueLogHandler, self).__init__(level=_level_number(level))
+        if batch_size < 1:
+            raise Exception("batch_size must be at least 1")
+        self.stream = stream if stream is not None else sys.stderr
+        self.targets = list(targets) if targets is not None else []
+        self.batch_size = batch_size
+        self.linger = linger
+        self.block = block
+        self.terminator = '\n'
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.emitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='QueueLogHandler', daemon=True)
+        self._thread.start()
+
+    def emit(self, record):
+        # Called by handle() with the handler lock held, so the counters need no lock of their own
+        if self._closed:
+            self._write([record])
+            return
+        try:
+            if self.block:
+                self.queue.put(record)
+            else:
+                self.queue.put_nowait(record)
+            self.emitted += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _next_batch(self):
+        batch = [self.queue.get()]
+        while len(batch) < self.batch_size and batch[-1] is not _STOP:
+            try:
+                batch.append(self.queue.get(timeout=self.linger) if self.linger > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, records):
+        if len(self.targets) > 0:
+            for record in records:
+                for target in self.targets:
+                    if record.levelno >= target.level:
+                        target.handle(record)
+            self.written += len(records)
+            return
+        lines = []
+        for record in records:
+            try:
+                lines.append(self.format(record))
+            except Exception:
+                self.handleError(record)
+        if len(lines) == 0:
+            return
+        try:
+            self.stream.write(self.terminator.join(lines) + self.terminator)
+            self.stream.flush()
+            self.written += len(lines)
+        except Exception:
+            self.handleError(records[0])
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = batch[-1] is _STOP
+            records = batch[:-1] if stop else batch
+            try:
+                if len(records) > 0:
+                    self._write(records)
+                    self.batches += 1
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """
+        Wait until every record queued so far is written
+        """
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self.queue.join()
+        for target in self.targets:
+            target.flush()
+
+    def close(self):
+        """
+        Write the queued records and stop the background thread. Records logged afterwards are written on the
+        calling thread. The targets are flushed but not closed.
+        """
+        if not self._closed:
+            self._closed = True
+            if self._thread.is_alive():
+                self.queue.put(_STOP)
+                self._thread.join()
+            for target in self.targets:
+                target.flush()
+        super(QueueLogHandler, self).close()
+
+    def stats(self):
+        """
+        :return: dict with the records emitted (queued), dropped and written, the batches written and the records
+        waiting in the queue
+        """
+        return {
+            'emitted': self.emitted,
+            'dropped': self.dropped,
+            'written': self.written,
+            'batches': self.batches,
+            'queued': self.queue.qsize(),
+        }
+
+
+def configure_async_logging(logger_name='pytaskflow', level='info', formatter=None, propagate=False, **handler_options):
+    """
+    Add a QueueLogHandler to a logger - by default the "pytaskflow" logger used by LoggingHandler
+    :param logger_name: str with the name of the logger
+    :param level: str with the level name, or a logging level number, set on the logger
+    :param formatter: logging.Formatter (default: time, level, logger name and message)
+    :param propagate: bool. If False, records are not passed on to the handlers of the parent loggers as well
+    :param handler_options: keyword arguments for QueueLogHandler, see QueueLogHandler.__init__()
+    :return: QueueLogHandler
+    """
+    handler = QueueLogHandler(**handler_options)
+    if formatter is None:
+        formatter = logging.Formatter('%(asctime)s %(levelname)s %(name)s %(message)s')
+    handler.setFormatter(formatter)
+    logger = logging.getLogger(logger_name)
+    logger.setLevel(_level_number(level))
+    logger.propagate = propagate
+    logger.addHandler(handler)
+    return handler
+
+
+# EOF
@@ -0,0 +1,146 @@
+import pickle, traceback, os, collections
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pytaskflow.taskflow_engine import Result
+
+
+BATCH_MODES = ('serial', 'thread', 'process')
+
+# The WorkFlow a process pool worker runs, unpickled once by _init_worker() when the worker starts
+_worker_workflow = None
+
+
+def _init_worker(workflow_bytes):
+    global _worker_workflow
+    _worker_workflow = pickle.loads(workflow_bytes)
+
+
+def _run_chunk_in_worker(chunk, chunk_function):
+    return chunk_function(workflow=_worker_workflow, chunk=chunk)
+
+
+def run_chunk(workflow, chunk):
+    """
+    Run a WorkFlow for every input in a chunk. An exception raised while running one input does not stop the rest of
+    the chunk - it is reported as an error Result for that input instead.
+    :param workflow: WorkFlow to run
+    :param chunk: list of (index, Result) tuples
+    :return: list of (index, Result) tuples
+    """
+    return [(index, run_one(workflow=workflow, input_result=input_result)) for index, input_result in chunk]
+
+
+def run_chunk_grouped(workflow, chunk):
+    """
+    Run a WorkFlow for every input in a chunk with WorkFlow.run_workflow_batch(), so the inputs reaching a Task with a
+    BatchFunction together are executed with one call. Used by run_many() for WorkFlows with BatchFunctions.
+    :param workflow: WorkFlow to run
+    :param chunk: list of (index, Result) tuples
+    :return: list of (index, Result) tuples
+    """
+    results = workflow.run_workflow_batch(input_results=[input_result for index, input_result in chunk])
+    return [(index, result) for (index, input_result), result in zip(chunk, results)]
+
+
+def run_one(workflow, input_result):
+    """
+    Run a WorkFlow for one input, reporting an exception as an error Result
+    :param workflow: WorkFlow to run
+    :param input_result: Result
+    :return: Result
+    """
+    try:
+        return workflow.run_workflow(input_result=input_result)
+    except Exception:
+        return Result(result_obj={}, is_error=True, err_msg=traceback.format_exc())
+
+
+def _iter_chunks(inputs, chunk_size):
+    chunk = []
+    for index, input_result in enumerate(inputs):
+        chunk.append((index, input_result))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def run_many(workflow, inputs, workers=None, mode='thread', chunk_size=64, ordered=True, max_pending_chunks=None,
+             chunk_function=None):
+    """
+    Run a WorkFlow over many input Results. Inputs are consumed lazily in chunks and at most max_pending_chunks chunks
+    are in flight at any time, so inputs can be a generator of any length.
+
+    In process mode the WorkFlow is pickled once and shipped to every worker when the worker starts - only the input
+    and output Results travel per item. All Function classes used by the WorkFlow must therefore be importable by the
+    worker processes.
+
+    :param workflow: WorkFlow to run
+    :param inputs: iterable of Result objects
+    :param workers: int with the number of worker threads or processes (defaults to the number of CPUs)
+    :param mode: str, one of 'serial', 'thread' or 'process'
+    :param chunk_size: int with the number of inputs sent to a worker at a time
+    :param ordered: bool. If True, Results are yielded in input order. If False, (index, Result) tuples are yielded as
+    soon as their chunk completes
+    :param max_pending_chunks: int with the number of chunks that may be in flight (defaults to twice the workers)
+    :param chunk_function: callable(workflow, chunk) that runs a chunk like run_chunk() does, for callers that need
+    more than the Result of every input (for example timings). Defaults to run_chunk(), or run_chunk_grouped() when
+    the WorkFlow has BatchFunctions, so every chunk is one batch for them. It returns a list of (index, item) tuples and the items
+    are yielded in place of the Results. In process mode it must be a module level function so it can be pickled
+    :return: generator of Result (ordered) or (index, Result) tuples (not ordered)
+    """
+    if mode not in BATCH_MODES:
+        raise Exception("mode must be one of {}".format(', '.join(BATCH_MODES)))
+    if chunk_size < 1:
+        raise Exception("chunk_size must be at least 1")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if max_pending_chunks is None:
+        max_pending_chunks = workers * 2
+    if chunk_function is None:
+        chunk_function = run_chunk_grouped if workflow.uses_batch_functions() else run_chunk
+
+    if mode == 'serial':
+        for chunk in _iter_chunks(inputs, chunk_size):
+            for index, item in chunk_function(workflow=workflow, chunk=chunk):
+                yield item if ordered else (index, item)
+        return
+
+    if mode == 'process':
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(pickle.dumps(workflow, pickle.HIGHEST_PROTOCOL),))
+        submit_chunk = lambda chunk: pool.submit(_run_chunk_in_worker, chunk, chunk_function)
+    else:
+        pool = ThreadPoolExecutor(max_workers=workers)
+        submit_chunk = lambda chunk: pool.submit(chunk_function, workflow, chunk)
+
+    try:
+        chunks = _iter_chunks(inputs, chunk_size)
+        if ordered:
+            pending = collections.deque()
+            for chunk in chunks:
+                pending.append(submit_chunk(chunk))
+                while len(pending) >= max_pending_chunks:
+                    for index, result in pending.popleft().result():
+                        yield result
+            while len(pending) > 0:
+                for index, result in pending.popleft().result():
+                    yield result
+        else:
+            pending = set()
+            for chunk in chunks:
+                pending.add(submit_chunk(chunk))
+                while len(pending) >= max_pending_chunks:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for item in future.result():
+                            yield item
+            while len(pending) > 0:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    for item in future.result():
+                        yield item
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# EOF
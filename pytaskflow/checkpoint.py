@@ -0,0 +1,94 @@
+import traceback, warnings
+from pytaskflow.taskflow_engine import FileBasedSessionPersistence
+
+
+class Checkpoint:
+    """
+    Where a run is: the ID of the Task to execute next (None once the run finished) and the Result that Task gets as
+    input (or the final Result). This is what is stored in the SessionPersistence.
+    """
+    def __init__(self, workflow_name, run_id, task_id, task_name, result, step_count):
+        self.workflow_name = workflow_name
+        self.run_id = run_id
+        self.task_id = task_id
+        self.task_name = task_name
+        self.result = result
+        self.step_count = step_count
+
+    @property
+    def finished(self):
+        return self.task_id is None
+
+
+class Checkpointer:
+    """
+    Saves a Checkpoint of a run into a SessionPersistence at Task boundaries, so that WorkFlow.resume() can continue
+    the run after a restart instead of executing the earlier Tasks again.
+
+    Checkpoints are saved after every `every` steps and always when the run finishes. Task IDs come from the
+    CompiledWorkFlow, so the WorkFlow must be compiled, and a step that moves on to a Task outside the compiled graph
+    (for example a Task created by a Function) is not checkpointed.
+    """
+    def __init__(self, persistence_factory=FileBasedSessionPersistence, every=1, keep_finished=True):
+        """
+        :param persistence_factory: callable(session_token, session_data) returning a SessionPersistence, for example
+        a SessionPersistence subclass
+        :param every: int with the number of steps between checkpoints
+        :param keep_finished: bool. If True, the final Result is kept as a finished Checkpoint, otherwise the
+        checkpoint is deleted when the run finishes
+        """
+        if every < 1:
+            raise Exception("every must be at least 1")
+        self.persistence_factory = persistence_factory
+        self.every = every
+        self.keep_finished = keep_finished
+
+    def after_step(self, context, graph, next_entry, result):
+        """
+        Called by the executor after every step of a run that has a session_token
+        :param context: ExecutionContext of the run
+        :param graph: CompiledWorkFlow the run dispatches with
+        :param next_entry: DispatchEntry that will be executed next, or None if the run finished
+        :param result: Result that next_entry gets as input, or the final Result
+        """
+        if next_entry is None:
+            if self.keep_finished:
+                self.save(context, Checkpoint(context.workflow_name, context.run_id, None, None, result, context.step_count))
+            else:
+                self.delete(context.session_token)
+            return
+        if context.step_count % self.every != 0 or next_entry.task_id < 0:
+            return
+        self.save(context, Checkpoint(context.workflow_name, context.run_id, next_entry.task_id, next_entry.task_name, result, context.step_count))
+
+    def save(self, context, checkpoint):
+        """
+        Save a Checkpoint. A failure to save is reported as a warning and does not stop the run.
+        :param context: ExecutionContext with the session_token to save under
+        :param checkpoint: Checkpoint
+        """
+        if not self.persistence_factory(context.session_token, checkpoint).save_session_data():
+            warnings.warn("Checkpoint of run {} at step {} could not be saved".format(context.run_id, checkpoint.step_count))
+
+    def load(self, session_token):
+        """
+        :param session_token: str
+        :return: Checkpoint, or None if there is none
+        """
+        checkpoint = self.persistence_factory(session_token, None).get_session_data()
+        if checkpoint is not None and not isinstance(checkpoint, Checkpoint):
+            raise Exception("session {} does not contain a Checkpoint".format(session_token))
+        return checkpoint
+
+    def delete(self, session_token):
+        """
+        Delete the checkpoint of a session
+        :param session_token: str
+        """
+        try:
+            self.persistence_factory(session_token, None).delete_session_data()
+        except:
+            warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+
+
+# EOF
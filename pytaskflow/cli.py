@@ -0,0 +1,257 @@
+"""
+Command line runner behind python -m pytaskflow (and the pytaskflow console script). It runs a WorkFlow over input
+Results read from a JSON lines file or stdin, in serial, thread or process mode, and reports the throughput, the
+latency percentiles of the runs and the timings of every Task:
+
+    python -m pytaskflow examples/example01/workflow.json --count 1000 --mode thread --workers 8
+    python -m pytaskflow examples.example01.workflow_factory:get_workflow --input inputs.jsonl --mode process
+
+Every line of the input is the JSON object used as result_obj of one input Result.
+"""
+import argparse, array, json, os, sys, time
+from pytaskflow.taskflow_engine import Result, WorkFlow
+from pytaskflow.instrumentation import TaskStatsAggregator, percentile
+from pytaskflow.batch import BATCH_MODES, run_many, run_one, run_chunk_grouped
+from pytaskflow.definition import import_object, load_workflow
+
+
+DEFINITION_SUFFIXES = ('.json', '.yaml', '.yml')
+
+
+class TimedRun:
+    """
+    The Result of one run with its latency, and the Task statistics of the chunk it was the last run of
+    """
+    __slots__ = ('result', 'latency', 'task_stats')
+
+    def __init__(self, result, latency, task_stats=None):
+        self.result = result
+        self.latency = latency
+        self.task_stats = task_stats
+
+
+def get_workflow(spec, cache_dir=None):
+    """
+    Load the WorkFlow to run
+    :param spec: str with the path of a definition file, or the import path of a WorkFlow or of a callable without
+    arguments that returns one (a factory like examples.example01.workflow_factory:get_workflow)
+    :param cache_dir: str with the definition cache directory (see pytaskflow.definition.load_workflow())
+    :return: WorkFlow
+    """
+    if os.path.splitext(spec)[1].lower() in DEFINITION_SUFFIXES and os.path.exists(spec):
+        if cache_dir is None:
+            return load_workflow(spec)
+        return load_workflow(spec, cache_dir=cache_dir)
+    workflow = import_object(spec)
+    if not isinstance(workflow, WorkFlow) and callable(workflow):
+        workflow = workflow()
+    if not isinstance(workflow, WorkFlow):
+        raise Exception("{} is not a WorkFlow or a factory returning a WorkFlow".format(spec))
+    return workflow
+
+
+def read_inputs(stream, repeat=1):
+    """
+    Read input Results from JSON lines, one result_obj per line. Blank lines are skipped.
+    :param stream: file object to read, or a list of lines
+    :param repeat: int with the number of times to go over the lines. The lines are kept in memory when repeat > 1
+    :return: generator of Result
+    """
+    lines = stream
+    if repeat > 1:
+        lines = [line for line in stream if line.strip() != '']
+    for _ in range(repeat):
+        for line in lines:
+            if line.strip() != '':
+                yield Result(result_obj=json.loads(line))
+
+
+def empty_inputs(count):
+    for _ in range(count):
+        yield Result(result_obj={})
+
+
+class _RunnerStats(TaskStatsAggregator):
+    """
+    The TaskStatsAggregator added by run(). Its own class marks it among the hooks of the WorkFlow, also in the copy
+    of the WorkFlow a worker process gets, so TaskStatsAggregators added by the caller are never drained.
+    """
+
+
+def _find_aggregator(workflow):
+    for hook in workflow.executor.hooks:
+        if isinstance(hook, _RunnerStats):
+            return hook
+    return None
+
+
+def run_timed_chunk(workflow, chunk):
+    """
+    The batch chunk_function of the runner: runs every input of the chunk, timing it, and hands the Task statistics
+    collected in this worker back with the last run of the chunk. A WorkFlow with BatchFunctions runs the whole chunk
+    with WorkFlow.run_workflow_batch(), like run_many() does, and every run gets the latency of the chunk: its Result
+    is only ready when the whole chunk is.
+    :param workflow: WorkFlow to run, with the TaskStatsAggregator hook added by run()
+    :param chunk: list of (index, Result) tuples
+    :return: list of (index, TimedRun) tuples
+    """
+    output = []
+    if workflow.uses_batch_functions():
+        started = time.perf_counter()
+        results = run_chunk_grouped(workflow=workflow, chunk=chunk)
+        latency = time.perf_counter() - started
+        output = [(index, TimedRun(result=result, latency=latency)) for index, result in results]
+    else:
+        for index, input_result in chunk:
+            started = time.perf_counter()
+            result = run_one(workflow=workflow, input_result=input_result)
+            output.append((index, TimedRun(result=result, latency=time.perf_counter() - started)))
+    aggregator = _find_aggregator(workflow)
+    if len(output) > 0 and aggregator is not None:
+        output[-1][1].task_stats = aggregator.drain()
+    return output
+
+
+def run(workflow, inputs, mode='serial', workers=None, chunk_size=16, on_result=None, percentiles=(0.5, 0.9, 0.99)):
+    """
+    Run a WorkFlow over inputs and measure it
+    :param workflow: WorkFlow to run. A TaskStatsAggregator hook is added for the run
+    :param inputs: iterable of Result objects
+    :param mode: str, one of 'serial', 'thread' or 'process'
+    :param workers: int with the number of worker threads or processes (defaults to the number of CPUs)
+    :param chunk_size: int with the number of inputs sent to a worker at a time
+    :param on_result: callable(index, Result) called for every Result in input order (optional)
+    :param percentiles: tuple of float with the latency percentiles to report
+    :return: dict report with the runs, errors, elapsed seconds, throughput, latency and per Task statistics
+    """
+    aggregator = _RunnerStats(percentiles=percentiles)
+    task_stats = TaskStatsAggregator(percentiles=percentiles)
+    workflow.executor.add_hook(aggregator)
+    latencies = array.array('d')
+    errors = 0
+    started = time.perf_counter()
+    try:
+        timed_runs = run_many(
+            workflow=workflow, inputs=inputs, workers=workers, mode=mode, chunk_size=chunk_size, chunk_function=run_timed_chunk
+        )
+        for index, timed_run in enumerate(timed_runs):
+            latencies.append(timed_run.latency)
+            if timed_run.result.is_error:
+                errors += 1
+            if timed_run.task_stats is not None:
+                task_stats.merge(timed_run.task_stats)
+            if on_result is not None:
+                on_result(index, timed_run.result)
+    finally:
+        workflow.executor.remove_hook(aggregator)
+    elapsed = time.perf_counter() - started
+    latencies = sorted(latencies)
+    return {
+        'workflow_name': workflow.workflow_name,
+        'mode': mode,
+        'workers': workers if workers is not None else os.cpu_count() or 1,
+        'runs': len(latencies),
+        'errors': errors,
+        'elapsed': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'latency': {
+            'mean': sum(latencies) / len(latencies) if len(latencies) > 0 else None,
+            'min': latencies[0] if len(latencies) > 0 else None,
+            'max': latencies[-1] if len(latencies) > 0 else None,
+            'percentiles': dict(('p{:g}'.format(fraction * 100), percentile(latencies, fraction)) for fraction in percentiles),
+        },
+        'tasks': task_stats.snapshot(),
+    }
+
+
+def _ms(seconds):
+    return '-' if seconds is None else '{:.3f}'.format(seconds * 1000)
+
+
+def print_report(report, out=sys.stdout):
+    latency = report['latency']
+    out.write('Work flow:   {}\n'.format(report['workflow_name']))
+    out.write('Mode:        {} ({} workers)\n'.format(report['mode'], report['workers']))
+    out.write('Runs:        {} ({} errors)\n'.format(report['runs'], report['errors']))
+    out.write('Elapsed:     {:.3f} s\n'.format(report['elapsed']))
+    out.write('Throughput:  {:.1f} runs/s\n'.format(report['throughput']))
+    out.write('Latency ms:  mean {} min {} {} max {}\n'.format(
+        _ms(latency['mean']), _ms(latency['min']),
+        ' '.join('{} {}'.format(name, _ms(value)) for name, value in sorted(latency['percentiles'].items(), key=lambda item: float(item[0][1:]))),
+        _ms(latency['max'])
+    ))
+    if len(report['tasks']) == 0:
+        return
+    out.write('\n{:<40} {:>8} {:>7} {:>10} {:>10} {:>10} {:>10} {:>10}\n'.format(
+        'Task', 'count', 'errors', 'mean ms', 'p50 ms', 'p90 ms', 'p99 ms', 'cpu ms'
+    ))
+    for task_name, stats in sorted(report['tasks'].items(), key=lambda item: -item[1]['wall_total']):
+        task_percentiles = stats['percentiles']
+        out.write('{:<40} {:>8} {:>7} {:>10} {:>10} {:>10} {:>10} {:>10}\n'.format(
+            task_name[:40], stats['count'], stats['error_count'], _ms(stats['wall_mean']), _ms(task_percentiles.get('p50')),
+            _ms(task_percentiles.get('p90')), _ms(task_percentiles.get('p99')), _ms(stats['cpu_mean'])
+        ))
+
+
+def _write_result(out, index, result):
+    out.write(json.dumps(
+        {'index': index, 'result_obj': result.result_obj, 'is_error': result.is_error, 'err_msg': result.err_msg},
+        default=repr
+    ) + '\n')
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        prog='pytaskflow', description='Run a work flow over input Results and report throughput, latency and Task timings'
+    )
+    parser.add_argument('workflow', help='definition file (.json, .yaml, .yml) or import path of a WorkFlow or a factory '
+                                         'returning one, for example examples.example01.workflow_factory:get_workflow')
+    parser.add_argument('--input', '-i', help="JSON lines file with one result_obj per line, or '-' for stdin")
+    parser.add_argument('--count', '-n', type=int, default=1, help='number of runs with an empty input when there is no --input')
+    parser.add_argument('--repeat', type=int, default=1, help='number of times to run the --input lines')
+    parser.add_argument('--mode', '-m', choices=BATCH_MODES, default='serial')
+    parser.add_argument('--workers', '-w', type=int, help='number of worker threads or processes (default: number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=16, help='number of inputs sent to a worker at a time')
+    parser.add_argument('--output', '-o', help="write every Result as a JSON line to this file, or '-' for stdout")
+    parser.add_argument('--report', help='write the report as JSON to this file')
+    parser.add_argument('--cache-dir', help='directory to cache compiled definition files in (default: ~/.cache/pytaskflow/definitions)')
+    return parser
+
+
+def main(args=None):
+    """
+    :param args: list of str with the command line arguments (default: sys.argv[1:])
+    :return: int exit code
+    """
+    options = get_parser().parse_args(args)
+    workflow = get_workflow(options.workflow, cache_dir=options.cache_dir)
+    input_file = output_file = None
+    try:
+        if options.input is None:
+            inputs = empty_inputs(options.count)
+        elif options.input == '-':
+            inputs = read_inputs(sys.stdin, repeat=options.repeat)
+        else:
+            input_file = open(options.input)
+            inputs = read_inputs(input_file, repeat=options.repeat)
+        on_result = None
+        if options.output is not None:
+            output_file = sys.stdout if options.output == '-' else open(options.output, 'w')
+            on_result = lambda index, result: _write_result(output_file, index, result)
+        report = run(
+            workflow=workflow, inputs=inputs, mode=options.mode, workers=options.workers, chunk_size=options.chunk_size,
+            on_result=on_result
+        )
+    finally:
+        if input_file is not None:
+            input_file.close()
+        if output_file is not None and output_file is not sys.stdout:
+            output_file.close()
+    print_report(report, out=sys.stderr if options.output == '-' else sys.stdout)
+    if options.report is not None:
+        with open(options.report, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return 0
+
+
+# EOF
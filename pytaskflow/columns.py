@@ -0,0 +1,120 @@
+"""
+Columnar views of many Results for BatchFunctions. A BatchFunction with columns set gets a ResultColumns instead of
+a list of Results: one column per result_obj key, as a NumPy array when NumPy is installed, so a Task can do its
+work for a whole batch of records with a few vectorized operations.
+
+    class AddTax(BatchFunction):
+        columns = ('Price',)
+
+        def execute_batch(self, input_results, globals_dict={}):
+            return input_results.to_results({'Total': input_results['Price'] * 1.2})
+"""
+import collections.abc
+from pytaskflow.taskflow_engine import Result
+
+try:
+    import numpy
+except ImportError:     # NumPy is optional
+    numpy = None
+
+
+def to_column(values, use_numpy=True):
+    """
+    Turn the values of one field into a column
+    :param values: list with the value of every record
+    :param use_numpy: bool. If False, the list is returned as it is
+    :return: NumPy array when NumPy is installed and the values form a numeric, bool or str array (lists of equal
+    length give a 2-D array), otherwise the list
+    """
+    if not use_numpy or numpy is None:
+        return values
+    try:
+        array = numpy.asarray(values)
+    except ValueError:      # lists of different lengths
+        return values
+    if array.dtype == object:
+        return values
+    return array
+
+
+def _is_column(value):
+    return isinstance(value, (list, tuple)) or (numpy is not None and isinstance(value, numpy.ndarray))
+
+
+def _to_list(column):
+    if numpy is not None and isinstance(column, numpy.ndarray):
+        # Plain Python values, so the Results can be encoded with any codec
+        return column.tolist()
+    return column
+
+
+class ResultColumns:
+    """
+    The result_obj fields of a list of Results as columns, built on first access. Any Mapping result_obj is read
+    (dict, FrozenDict, CopyOnWriteDict). Records whose result_obj does not have a field get None in its column.
+    """
+    def __init__(self, results, names, use_numpy=True):
+        """
+        :param results: list of Result
+        :param names: tuple of str with the result_obj keys that can be read as columns
+        :param use_numpy: bool. If False, columns are always lists
+        """
+        self.results = results
+        self.names = tuple(names)
+        self.use_numpy = use_numpy and numpy is not None
+        self._columns = {}
+
+    def __len__(self):
+        return len(self.results)
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def __getitem__(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            if name not in self.names:
+                raise KeyError(name)
+            values = [
+                result.result_obj.get(name) if isinstance(result.result_obj, collections.abc.Mapping) else None for result in self.results
+            ]
+            column = self._columns[name] = to_column(values, use_numpy=self.use_numpy)
+        return column
+
+    def keys(self):
+        """
+        :return: tuple of str with the column names
+        """
+        return self.names
+
+    def to_results(self, columns, keep_fields=True, is_error=None, err_msg=None):
+        """
+        Build the Result of every record from output columns
+        :param columns: dict of name: column. A column is a list, tuple or NumPy array with a value for every record -
+        any other value is used for every record
+        :param keep_fields: bool. If True, the new fields are added to a copy of the input result_obj of every record
+        (always a plain dict), otherwise the result_obj only has the new fields
+        :param is_error: column of bool marking the records whose Result is an error (optional)
+        :param err_msg: str, or column of str, with the error message of the error Results (optional)
+        :return: list of Result in record order
+        """
+        columns = dict((name, _to_list(column)) for name, column in columns.items())
+        for name, column in columns.items():
+            if _is_column(column) and len(column) != len(self.results):
+                raise Exception("column {} has {} values for {} records".format(name, len(column), len(self.results)))
+        is_error = _to_list(is_error)
+        err_msg = _to_list(err_msg)
+        results = []
+        for index, input_result in enumerate(self.results):
+            result_obj = {}
+            if keep_fields and isinstance(input_result.result_obj, collections.abc.Mapping):
+                result_obj.update(input_result.result_obj)
+            for name, column in columns.items():
+                result_obj[name] = column[index] if _is_column(column) else column
+            record_is_error = bool(is_error[index]) if is_error is not None else False
+            record_err_msg = err_msg[index] if _is_column(err_msg) else err_msg
+            results.append(Result(result_obj=result_obj, is_error=record_is_error, err_msg=record_err_msg if record_is_error else None))
+        return results
+
+
+# EOF
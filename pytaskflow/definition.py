@@ -0,0 +1,265 @@
+"""
+Declarative WorkFlow definitions. A definition is a JSON (or, with PyYAML installed, YAML) document like:
+
+    {
+        "workflow_name": "Example Workflow",
+        "starter_task": "generate",
+        "tasks": {
+            "generate": {
+                "task_name": "Task 1: Generated List of Numbers",
+                "function": "examples.example01.functions:GenerateRandomNumberAndAddToList",
+                "success_task": "sum",
+                "err_task": "error",
+                "globals": {"GenerateRandomNumberAndAddToListTask": {"$task": "generate"}}
+            },
+            ...
+        }
+    }
+
+* function is the import path of a Function class ("package.module:Class" or "package.module.Class"). It is created
+  with the keyword arguments in function_args, if any
+* success_task and err_task name other entries of tasks
+* In globals, {"$task": "name"} refers to a Task and {"$import": "package.module:name"} to any importable object;
+  everything else is passed as is
+* policy holds the keyword arguments of a pytaskflow.policy.TaskPolicy; its circuit_breaker those of a CircuitBreaker
+* Instead of a function, a task can name a registered WorkFlow in workflow - it becomes a
+  pytaskflow.subworkflow.SubWorkFlowTask running that WorkFlow as one step
+* allow_cycles (default true) is passed to WorkFlow.compile()
+
+load_workflow() builds and compiles the WorkFlow and caches the result on disk, keyed by the hash of the definition
+file, so the next process that loads the same file skips parsing, resolving and validating it.
+"""
+import hashlib, importlib, json, os, stat, sys, traceback, warnings
+from pytaskflow.taskflow_engine import Task, WorkFlow, WorkFlowCompileError
+from pytaskflow.session_store import FileSessionStore
+
+try:
+    import yaml
+except ImportError:     # PyYAML is optional
+    yaml = None
+
+
+# Part of the cache key - change it when the way a definition is built, or the pickled DispatchEntry, changes
+DEFINITION_CACHE_VERSION = 3
+
+# Per user, so no other user can plant a pickle where it is loaded from
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'pytaskflow', 'definitions'
+)
+
+
+def import_object(path):
+    """
+    Import an object by its path
+    :param path: str, either "package.module:name" or "package.module.name"
+    :return: object
+    """
+    if ':' in path:
+        module_name, _, attribute_path = path.partition(':')
+    else:
+        module_name, _, attribute_path = path.rpartition('.')
+    if module_name == '' or attribute_path == '':
+        raise Exception("{} is not a valid import path".format(path))
+    obj = importlib.import_module(module_name)
+    for attribute in attribute_path.split('.'):
+        obj = getattr(obj, attribute)
+    return obj
+
+
+def parse_definition(data, file_format='json'):
+    """
+    :param data: str or bytes with the definition
+    :param file_format: str, either 'json' or 'yaml'
+    :return: dict with the definition
+    """
+    if isinstance(data, bytes):
+        data = data.decode('utf-8')
+    if file_format == 'yaml':
+        if yaml is None:
+            raise Exception("YAML definitions require PyYAML - pip install pyyaml")
+        return yaml.safe_load(data)
+    if file_format != 'json':
+        raise Exception("file_format must be either 'json' or 'yaml'")
+    return json.loads(data)
+
+
+def file_format_for(path):
+    """
+    :param path: str with the path of a definition file
+    :return: str, 'yaml' for .yaml and .yml files, otherwise 'json'
+    """
+    return 'yaml' if os.path.splitext(path)[1].lower() in ('.yaml', '.yml') else 'json'
+
+
+class _Builder:
+    """
+    Builds the Tasks of a definition, collecting every problem instead of stopping at the first one
+    """
+    def __init__(self, definition):
+        self.definition = definition
+        self.workflow_name = definition.get('workflow_name', 'WorkFlow')
+        self.task_definitions = definition.get('tasks') or {}
+        self.tasks = {}
+        self.problems = []
+
+    def _import(self, path, what):
+        try:
+            return import_object(path)
+        except Exception as e:
+            self.problems.append('{}: can not import {}: {}: {}'.format(what, path, type(e).__name__, e))
+            return None
+
+    def _task(self, name, what):
+        if name is None:
+            return None
+        task = self.tasks.get(name)
+        if task is None:
+            self.problems.append('{}: there is no task named {}'.format(what, name))
+        return task
+
+    def _resolve_global(self, value, what):
+        if isinstance(value, dict) and len(value) == 1:
+            if '$task' in value:
+                return self._task(value['$task'], what)
+            if '$import' in value:
+                return self._import(value['$import'], what)
+        return value
+
+    def _policy(self, policy_definition, what):
+        from pytaskflow.policy import TaskPolicy, CircuitBreaker
+        try:
+            options = dict(policy_definition)
+            if options.get('circuit_breaker') is not None:
+                options['circuit_breaker'] = CircuitBreaker(**options['circuit_breaker'])
+            if 'retry_on' in options:
+                options['retry_on'] = tuple(import_object(path) for path in options['retry_on'])
+            return TaskPolicy(**options)
+        except Exception as e:
+            self.problems.append('{}: invalid policy: {}'.format(what, e))
+            return None
+
+    def build(self):
+        """
+        :return: WorkFlow, not compiled yet
+        :raises WorkFlowCompileError: if the definition is not valid
+        """
+        if not isinstance(self.task_definitions, dict) or len(self.task_definitions) == 0:
+            raise WorkFlowCompileError(workflow_name=self.workflow_name, problems=['The definition has no tasks'])
+        for name, task_definition in self.task_definitions.items():
+            if task_definition.get('workflow') is not None:
+                from pytaskflow.subworkflow import SubWorkFlowTask
+                self.tasks[name] = SubWorkFlowTask(task_name=task_definition.get('task_name', name), workflow_name=task_definition['workflow'])
+            else:
+                self.tasks[name] = Task(task_name=task_definition.get('task_name', name))
+        for name, task_definition in self.task_definitions.items():
+            what = 'Task {}'.format(name)
+            task = self.tasks[name]
+            success_task = self._task(task_definition.get('success_task'), what)
+            err_task = self._task(task_definition.get('err_task'), what)
+            globals_dict = dict(
+                (key, self._resolve_global(value, '{} global {}'.format(what, key)))
+                for key, value in (task_definition.get('globals') or {}).items()
+            )
+            if task_definition.get('policy') is not None:
+                task.set_policy(self._policy(task_definition['policy'], what))
+            if task_definition.get('workflow') is not None:
+                task.register_subworkflow(success_task=success_task, err_task=err_task, globals_dict=globals_dict)
+                continue
+            function_class = self._import(task_definition.get('function', ''), what)
+            if function_class is None:
+                continue
+            try:
+                function = function_class(**(task_definition.get('function_args') or {}))
+                task.register_function(function=function, success_task=success_task, err_task=err_task, globals_dict=globals_dict)
+            except Exception as e:
+                self.problems.append('{}: {}'.format(what, e))
+        if self.definition.get('starter_task') is None:
+            self.problems.append('The definition has no starter_task')
+        starter_task = self._task(self.definition.get('starter_task'), 'starter_task')
+        if len(self.problems) > 0:
+            raise WorkFlowCompileError(workflow_name=self.workflow_name, problems=self.problems)
+        return WorkFlow(workflow_name=self.workflow_name, starter_task=starter_task)
+
+
+def build_workflow(definition):
+    """
+    Build and compile the WorkFlow of a definition
+    :param definition: dict with the definition (see the module documentation)
+    :return: compiled WorkFlow
+    :raises WorkFlowCompileError: if the definition is not valid
+    """
+    builder = _Builder(definition)
+    workflow = builder.build()
+    workflow.compile(tasks=list(builder.tasks.values()), allow_cycles=definition.get('allow_cycles', True))
+    return workflow
+
+
+def definition_cache_key(data):
+    """
+    :param data: bytes with the contents of a definition file
+    :return: str with the key the compiled WorkFlow is cached under
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    return '{}-py{}.{}-v{}'.format(digest, sys.version_info[0], sys.version_info[1], DEFINITION_CACHE_VERSION)
+
+
+def check_cache_dir(cache_dir):
+    """
+    Create the definition cache directory with mode 0700, or check an existing one. Cached WorkFlows are unpickled,
+    so the directory must not be writable by anyone else.
+    :param cache_dir: str with the cache directory
+    :raises Exception: if the directory is not owned by the current user or other users can access it
+    """
+    os.makedirs(cache_dir, mode=0o700, exist_ok=True)
+    if not hasattr(os, 'getuid'):
+        return
+    info = os.stat(cache_dir)
+    if info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise Exception(
+            "the definition cache {} must be owned by the current user and have mode 0700 - not using it".format(cache_dir)
+        )
+
+
+def load_workflow(path, cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Load a WorkFlow from a definition file. The compiled WorkFlow is cached in cache_dir under the hash of the file,
+    so loading the same file again - from any process - only unpickles it. A changed file gets a new hash and is built
+    again.
+
+    The cached WorkFlow holds the pickled Function instances, with the state their __init__ set when the file was
+    first loaded. After changing the Function classes a definition uses, clear the cache (delete cache_dir) or pass
+    cache_dir=None. The cache directory is only used if it belongs to the current user and has mode 0700 (see
+    check_cache_dir()), otherwise the WorkFlow is built without it.
+    :param path: str with the path of a .json, .yaml or .yml definition file
+    :param cache_dir: str with the cache directory (default: pytaskflow/definitions in the user's cache directory), or
+    None to always build the WorkFlow
+    :return: compiled WorkFlow
+    :raises WorkFlowCompileError: if the definition is not valid
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    store = None
+    if cache_dir is not None:
+        try:
+            check_cache_dir(cache_dir)
+            store = FileSessionStore(root_dir=cache_dir, compression=None, shard_depth=1)
+        except Exception:
+            warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+    if store is not None:
+        key = definition_cache_key(data)
+        try:
+            workflow = store.load(key)
+            if isinstance(workflow, WorkFlow):
+                return workflow
+        except Exception:
+            warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+    workflow = build_workflow(parse_definition(data, file_format=file_format_for(path)))
+    if store is not None:
+        try:
+            store.save(key, workflow)
+        except Exception:
+            warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+    return workflow
+
+
+# EOF
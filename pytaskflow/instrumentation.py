@@ -0,0 +1,225 @@
+import bisect, json, math, threading
+
+
+class TaskEvent:
+    """
+    What is known about one execution of a Task. The same event object is passed to before_task(), and then to
+    after_task() and on_error() once the timings are filled in. depth is 0 for a step of the run itself and 1 or more
+    for a step run inside another one, like a ParallelTask branch or a sub-workflow.
+    """
+    __slots__ = ('run_id', 'workflow_name', 'task_name', 'task_id', 'input_result', 'wall_time', 'cpu_time',
+                 'result_size', 'result', 'exception', 'depth')
+
+    def __init__(self, run_id, workflow_name, task_name, task_id, input_result=None, depth=0):
+        self.run_id = run_id
+        self.workflow_name = workflow_name
+        self.task_name = task_name
+        self.task_id = task_id
+        self.input_result = input_result
+        self.wall_time = None
+        self.cpu_time = None
+        self.result_size = None
+        self.result = None
+        self.exception = None
+        self.depth = depth
+
+    @property
+    def is_error(self):
+        return self.exception is not None or (self.result is not None and self.result.is_error)
+
+
+def percentile(sorted_values, fraction):
+    """
+    :param sorted_values: sorted sequence of numbers
+    :param fraction: float between 0 and 1
+    :return: the value at that fraction (nearest rank), or None without values
+    """
+    if len(sorted_values) == 0:
+        return None
+    rank = max(1, int(math.ceil(fraction * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Instrumentation:
+    """
+    Base class for instrumentation hooks. Add an instance to a WorkFlowExecutor with add_hook() and override the
+    methods you are interested in. The hooks are called on the thread that runs the Task, so implementations must be
+    thread-safe and fast.
+    """
+    def before_task(self, event):
+        """
+        Called just before a Task's Function is executed
+        :param event: TaskEvent with the input_result the Function is about to get (no timings yet)
+        """
+        pass
+
+    def after_task(self, event):
+        """
+        Called after a Task's Function completed, also when it returned an error Result or raised an exception
+        :param event: TaskEvent with wall_time and cpu_time in seconds, result_size (number of items in the
+        result_obj) and either result or exception set. cpu_time is the CPU time of the thread that ran the Task and is
+        None for Tasks run by run_workflow_async()
+        """
+        pass
+
+    def on_error(self, event):
+        """
+        Called after after_task() when the Function returned an error Result or raised an exception
+        :param event: TaskEvent
+        """
+        pass
+
+
+# Histogram bucket upper bounds in seconds: 1us doubling up to about 36 minutes
+HISTOGRAM_BOUNDS = [1e-6 * 2 ** i for i in range(32)]
+
+
+class _TaskStats:
+    __slots__ = ('count', 'error_count', 'wall_total', 'cpu_total', 'wall_min', 'wall_max', 'result_size_total', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.error_count = 0
+        self.wall_total = 0.0
+        self.cpu_total = 0.0
+        self.wall_min = None
+        self.wall_max = None
+        self.result_size_total = 0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+
+    def percentile(self, fraction):
+        if self.count == 0:
+            return None
+        wanted = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= wanted:
+                if index < len(HISTOGRAM_BOUNDS):
+                    return min(HISTOGRAM_BOUNDS[index], self.wall_max)
+                return self.wall_max
+        return self.wall_max
+
+    def merge(self, other):
+        self.count += other.count
+        self.error_count += other.error_count
+        self.wall_total += other.wall_total
+        self.cpu_total += other.cpu_total
+        self.result_size_total += other.result_size_total
+        if other.wall_min is not None and (self.wall_min is None or other.wall_min < self.wall_min):
+            self.wall_min = other.wall_min
+        if other.wall_max is not None and (self.wall_max is None or other.wall_max > self.wall_max):
+            self.wall_max = other.wall_max
+        self.buckets = [count + other_count for count, other_count in zip(self.buckets, other.buckets)]
+
+
+class TaskStatsAggregator(Instrumentation):
+    """
+    Keeps counts, error counts, total wall and CPU time and a log scale histogram of wall times per Task name.
+    Percentiles are read from the histogram, so they are accurate to within a factor of two (and never more than the
+    maximum seen) while recording stays O(1) in time and memory.
+    """
+    def __init__(self, percentiles=(0.5, 0.9, 0.99)):
+        """
+        :param percentiles: tuple of float with the percentiles to report in snapshot()
+        """
+        self.percentiles = percentiles
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def after_task(self, event):
+        wall_time = event.wall_time
+        bucket = bisect.bisect_left(HISTOGRAM_BOUNDS, wall_time)
+        with self._lock:
+            stats = self._stats.get(event.task_name)
+            if stats is None:
+                stats = self._stats[event.task_name] = _TaskStats()
+            stats.count += 1
+            if event.is_error:
+                stats.error_count += 1
+            stats.wall_total += wall_time
+            if event.cpu_time is not None:
+                stats.cpu_total += event.cpu_time
+            stats.result_size_total += event.result_size
+            if stats.wall_min is None or wall_time < stats.wall_min:
+                stats.wall_min = wall_time
+            if stats.wall_max is None or wall_time > stats.wall_max:
+                stats.wall_max = wall_time
+            stats.buckets[bucket] += 1
+
+    def snapshot(self):
+        """
+        Get the aggregated statistics
+        :return: dict keyed by Task name with count, error_count, wall/CPU totals and means, min, max and percentiles
+        (in seconds) and the mean result_size
+        """
+        with self._lock:
+            snapshot = {}
+            for task_name, stats in self._stats.items():
+                snapshot[task_name] = {
+                    'count': stats.count,
+                    'error_count': stats.error_count,
+                    'wall_total': stats.wall_total,
+                    'wall_mean': stats.wall_total / stats.count,
+                    'wall_min': stats.wall_min,
+                    'wall_max': stats.wall_max,
+                    'cpu_total': stats.cpu_total,
+                    'cpu_mean': stats.cpu_total / stats.count,
+                    'result_size_mean': stats.result_size_total / stats.count,
+                    'percentiles': dict(
+                        ('p{:g}'.format(fraction * 100), stats.percentile(fraction)) for fraction in self.percentiles
+                    ),
+                }
+            return snapshot
+
+    def dump(self, filename):
+        """
+        Write snapshot() as JSON
+        :param filename: str with the file to write
+        """
+        with open(filename, 'w') as f:
+            json.dump(self.snapshot(), f, indent=2, sort_keys=True)
+
+    def reset(self):
+        """
+        Forget everything recorded so far
+        """
+        with self._lock:
+            self._stats = {}
+
+    def drain(self):
+        """
+        Take everything recorded so far and reset, in one step - for example to send the statistics of a worker process
+        to the parent, which merge()s them
+        :return: TaskStatsAggregator with the statistics recorded so far
+        """
+        drained = TaskStatsAggregator(percentiles=self.percentiles)
+        with self._lock:
+            drained._stats, self._stats = self._stats, {}
+        return drained
+
+    def merge(self, other):
+        """
+        Add the statistics of another TaskStatsAggregator to this one. Percentiles stay as accurate as they are for a
+        single aggregator, because the histograms are added up.
+        :param other: TaskStatsAggregator
+        """
+        with other._lock:
+            other_stats = list(other._stats.items())
+        with self._lock:
+            for task_name, stats in other_stats:
+                if task_name not in self._stats:
+                    self._stats[task_name] = _TaskStats()
+                self._stats[task_name].merge(stats)
+
+
+# EOF
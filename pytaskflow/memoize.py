@@ -0,0 +1,270 @@
+import copy, functools, hashlib, pickle, threading, traceback, warnings
+from pytaskflow.taskflow_engine import Function, AsyncFunction, Result
+from pytaskflow.session_cache import SessionCache
+
+
+_MISSING = object()
+
+
+def default_key(result_obj):
+    """
+    Derive a cache key from the result_obj of an input Result: the SHA-256 of its pickle. Equal dicts built in a
+    different order pickle differently, which only costs a cache miss.
+    :param result_obj: object that can be pickled
+    :return: str
+    """
+    return hashlib.sha256(pickle.dumps(result_obj, pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+def copy_result(result):
+    """
+    Copy a Result deep enough that changing the copy's result_obj cannot change the original. The override Tasks are
+    shared, not copied.
+    :param result: Result
+    :return: Result
+    """
+    return Result(
+        result_obj=copy.deepcopy(result.result_obj), is_error=result.is_error, err_msg=result.err_msg, stop=result.stop,
+        override_success_task=result.override_success_task, override_err_task=result.override_err_task
+    )
+
+
+class MemoCache:
+    """
+    Caches the Results of a pure Function - one whose Result only depends on input_result.result_obj - by a key
+    derived from that result_obj.
+
+    * Results are kept in a bounded LRU SessionCache with an optional TTL
+    * With a persistence_factory, Results missing from memory are looked up in (and saved to) a SessionPersistence,
+      so processes sharing the same store share the cache. Results with an override Task are only kept in memory:
+      stores keep Results without their override Tasks, so a stored copy would be routed differently
+    * Results are copied when they are cached and again when they are returned, so a Task that changes the
+      result_obj it gets cannot corrupt the cache. With copy_results=False the result_obj is shared, but every caller
+      still gets its own Result - the executor clears the override Tasks of the Result it routes on
+    * Error Results are not cached unless cache_errors is set
+
+    Two threads missing the same key at the same time both execute the Function; the last Result wins. An input
+    whose key can not be derived (for example a result_obj that can not be pickled) is executed without the cache.
+    """
+    def __init__(self, max_entries=1024, ttl=None, key_func=None, persistence_factory=None, copy_results=True,
+                 cache_errors=False, namespace=None):
+        """
+        :param max_entries: int with the maximum number of Results kept in memory
+        :param ttl: int/float with the number of seconds a Result stays valid in memory (None: no expiry). Results in
+        the SessionPersistence expire as configured in its own store
+        :param key_func: callable(result_obj) returning a str key (default: default_key())
+        :param persistence_factory: callable(session_token, session_data) returning a SessionPersistence, for example
+        a SessionPersistence subclass (optional)
+        :param copy_results: bool. If False, the result_obj is not deep-copied - set it only if no Task changes the
+        result_obj it gets
+        :param cache_errors: bool. If True, error Results are cached too
+        :param namespace: str put in front of every key, so several Functions can share one SessionPersistence store
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.key_func = key_func if key_func is not None else default_key
+        self.persistence_factory = persistence_factory
+        self.copy_results = copy_results
+        self.cache_errors = cache_errors
+        self.namespace = namespace
+        self._init_state()
+
+    def _init_state(self):
+        self.cache = SessionCache(max_entries=self.max_entries, ttl=self.ttl)
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.uncached = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # The cached Results and counters stay behind, for example when a WorkFlow is sent to worker processes
+        state = self.__dict__.copy()
+        for name in ('cache', 'hits', 'persistent_hits', 'misses', 'uncached', '_lock'):
+            state.pop(name)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def key_for(self, input_result):
+        """
+        :param input_result: Result given to the Function
+        :return: str with the cache key
+        """
+        key = self.key_func(input_result.result_obj)
+        if self.namespace is not None:
+            key = '{}:{}'.format(self.namespace, key)
+        return key
+
+    def _copy(self, result):
+        if self.copy_results:
+            return copy_result(result)
+        return Result(
+            result_obj=result.result_obj, is_error=result.is_error, err_msg=result.err_msg, stop=result.stop,
+            override_success_task=result.override_success_task, override_err_task=result.override_err_task
+        )
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _load(self, key):
+        try:
+            result = self.persistence_factory(key, None).get_session_data()
+        except:
+            warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+            return None
+        return result if isinstance(result, Result) else None
+
+    def _save(self, key, result):
+        try:
+            self.persistence_factory(key, result).save_session_data()
+        except:
+            warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+
+    def call(self, execute, input_result):
+        """
+        Return the cached Result for input_result, or execute the Function and cache its Result
+        :param execute: callable(input_result) returning the Result of the Function
+        :param input_result: Result given to the Function
+        :return: Result
+        """
+        try:
+            key = self.key_for(input_result)
+        except Exception:
+            self._count('uncached')
+            return execute(input_result)
+        result = self.cache.get(key, default=_MISSING)
+        if result is not _MISSING:
+            self._count('hits')
+            return self._copy(result)
+        if self.persistence_factory is not None:
+            result = self._load(key)
+            if result is not None:
+                self._count('persistent_hits')
+                self.cache.put(key, result)
+                return self._copy(result)
+        self._count('misses')
+        result = execute(input_result)
+        if not isinstance(result, Result):
+            raise Exception("function result was not of type Result!")
+        if result.is_error and not self.cache_errors:
+            return result
+        cached = self._copy(result)
+        self.cache.put(key, cached)
+        has_overrides = result.override_success_task is not None or result.override_err_task is not None
+        if self.persistence_factory is not None and not has_overrides:
+            self._save(key, cached)
+        return result
+
+    def clear(self):
+        """
+        Drop every Result kept in memory and reset the statistics. Results in the SessionPersistence are kept.
+        """
+        self._init_state()
+
+    def stats(self):
+        """
+        :return: dict with the hits (including persistent_hits), persistent_hits, misses, hit_rate, the calls executed
+        without the cache because no key could be derived (uncached), and the entries, evictions and expirations of
+        the in memory cache
+        """
+        cache_stats = self.cache.stats()
+        with self._lock:
+            hits = self.hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                'hits': hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'hit_rate': hits / lookups if lookups > 0 else 0.0,
+                'uncached': self.uncached,
+                'entries': cache_stats['entries'],
+                'evictions': cache_stats['evictions'],
+                'expirations': cache_stats['expirations'],
+            }
+
+
+def _check_function_class(function_class):
+    if issubclass(function_class, AsyncFunction):
+        raise Exception("AsyncFunction implementations can not be memoized")
+
+
+class MemoizedFunction(Function):
+    """
+    Wraps a Function instance and caches its Results in a MemoCache. Register the MemoizedFunction with the Task
+    instead of the Function:
+
+        task.register_function(function=MemoizedFunction(LookupPrice(), max_entries=10000, ttl=60), ...)
+    """
+    def __init__(self, function, memo=None, **memo_options):
+        """
+        :param function: Function to wrap. Its Result must only depend on input_result.result_obj
+        :param memo: MemoCache (optional, created from memo_options if not supplied)
+        :param memo_options: keyword arguments for MemoCache, see MemoCache.__init__()
+        """
+        super(MemoizedFunction, self).__init__()
+        if not isinstance(function, Function):
+            raise Exception("function must be of type Function")
+        _check_function_class(type(function))
+        if memo is None:
+            memo_options.setdefault('namespace', '{}.{}'.format(type(function).__module__, type(function).__qualname__))
+            memo = MemoCache(**memo_options)
+        self.function = function
+        self.memo = memo
+
+    def _execute_function(self, input_result, globals_dict):
+        result = self.function.execute(input_result=input_result, globals_dict=globals_dict)
+        if result is None:
+            result = self.function.result
+        return result
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return self.memo.call(lambda input_result: self._execute_function(input_result, globals_dict), input_result)
+
+    def stats(self):
+        """
+        :return: dict, see MemoCache.stats()
+        """
+        return self.memo.stats()
+
+
+def memoize(**memo_options):
+    """
+    Class decorator that caches the Results of every instance of a Function subclass in one MemoCache, available as
+    the class attribute memo:
+
+        @memoize(max_entries=10000, ttl=60)
+        class LookupPrice(Function):
+            ...
+
+        LookupPrice.memo.stats()
+
+    :param memo_options: keyword arguments for MemoCache, see MemoCache.__init__()
+    :return: the decorator
+    """
+    def decorator(function_class):
+        _check_function_class(function_class)
+        memo_options.setdefault('namespace', '{}.{}'.format(function_class.__module__, function_class.__qualname__))
+        memo = MemoCache(**memo_options)
+        execute = function_class.execute
+
+        def execute_function(function, input_result, globals_dict):
+            result = execute(function, input_result=input_result, globals_dict=globals_dict)
+            if result is None:
+                result = function.result
+            return result
+
+        @functools.wraps(execute)
+        def memoized_execute(self, input_result=Result(result_obj={}), globals_dict={}):
+            return memo.call(lambda input_result: execute_function(self, input_result, globals_dict), input_result)
+
+        function_class.execute = memoized_execute
+        function_class.memo = memo
+        return function_class
+    return decorator
+
+
+# EOF
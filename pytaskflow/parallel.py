@@ -0,0 +1,246 @@
+import traceback, threading, asyncio, collections.abc
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pytaskflow.taskflow_engine import Result, Task, WorkFlowExecutor, CopyOnWriteDict
+
+
+FAIL_FAST = 'fail_fast'
+COLLECT_ALL = 'collect_all'
+
+# Number of concurrent runs the thread pool a ParallelTask creates for itself has room for
+DEFAULT_CONCURRENT_RUNS = 8
+
+
+def merge_update(input_result, branch_results):
+    """
+    Merge policy that starts with the input result_obj and updates it with every branch's result_obj in branch order,
+    so later branches win when keys clash
+    :param input_result: Result that was passed to the ParallelTask
+    :param branch_results: list of (task_name, Result) tuples in branch order
+    :return: dict with the merged result_obj
+    """
+    merged = {}
+    if isinstance(input_result.result_obj, collections.abc.Mapping):
+        merged.update(input_result.result_obj)
+    for task_name, result in branch_results:
+        if isinstance(result.result_obj, collections.abc.Mapping):
+            merged.update(result.result_obj)
+    return merged
+
+
+def merge_by_branch(input_result, branch_results):
+    """
+    Merge policy that keeps every branch's result_obj under the name of the branch's first Task
+    :param input_result: Result that was passed to the ParallelTask
+    :param branch_results: list of (task_name, Result) tuples in branch order
+    :return: dict with the merged result_obj
+    """
+    return dict((task_name, result.result_obj) for task_name, result in branch_results)
+
+
+def _run_branch(branch_task, input_result, run, context):
+    try:
+        if run is None:
+            return WorkFlowExecutor().run(starter_task=branch_task, input_result=input_result)
+        return run.executor.run(starter_task=branch_task, input_result=input_result, context=context, graph=run.graph)
+    except Exception:
+        return Result(result_obj={}, is_error=True, err_msg=traceback.format_exc())
+
+
+async def _run_branch_async(branch_task, input_result, loop_executor, run, context):
+    try:
+        if run is None:
+            return await WorkFlowExecutor().run_async(starter_task=branch_task, input_result=input_result, loop_executor=loop_executor)
+        return await run.executor.run_async(
+            starter_task=branch_task, input_result=input_result, context=context, loop_executor=loop_executor, graph=run.graph
+        )
+    except Exception:
+        return Result(result_obj={}, is_error=True, err_msg=traceback.format_exc())
+
+
+class ParallelTask(Task):
+    """
+    A Task that runs several branch Tasks concurrently and joins their Results into one Result before moving on to
+    the success_task (or the err_task if a branch failed).
+
+    Every branch receives its own shallow copy of the input result_obj and runs its whole chain of Tasks. The joined
+    result_obj is built by the merge policy. With the 'fail_fast' error policy the first failing branch decides the
+    Result and branches that have not started yet are cancelled (branches that are already running finish in the
+    background). With 'collect_all' every branch is waited for and all errors are reported together.
+
+    The branches are part of the run of the ParallelTask: they run on its executor, so its hooks and the compiled
+    Task policies apply, and every branch records its steps in a child of the run's ExecutionContext that is merged
+    into the run, in branch order, once the branches are joined. Checkpoints are not saved inside a branch.
+    """
+    takes_run = True
+
+    def __init__(self, task_name, merge_policy=merge_update, error_policy=FAIL_FAST, executor=None, max_workers=None):
+        """
+        Initializes the task
+        :param task_name: str with the Task name
+        :param merge_policy: callable(input_result, branch_results) returning the joined result_obj
+        :param error_policy: str, either 'fail_fast' or 'collect_all'
+        :param executor: concurrent.futures.Executor to run the branches on (optional). Every run of the Task keeps one
+        thread busy per branch, so size it for the number of concurrent runs - runs wait for each other otherwise
+        :param max_workers: int with the number of threads of the pool created on first use when no executor is
+        supplied (default: one per branch for DEFAULT_CONCURRENT_RUNS concurrent runs). Release it with close()
+        """
+        super(ParallelTask, self).__init__(task_name)
+        if error_policy not in (FAIL_FAST, COLLECT_ALL):
+            raise Exception("error_policy must be either '{}' or '{}'".format(FAIL_FAST, COLLECT_ALL))
+        self.merge_policy = merge_policy
+        self.error_policy = error_policy
+        self.executor = executor
+        self.max_workers = max_workers
+        self.branch_tasks = []
+        self._own_executor = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_own_executor'] = None
+        state['_lock'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def register_branches(self, branch_tasks, success_task, err_task, globals_dict={}):
+        """
+        Registers the branch Tasks together with the Task to execute after the join
+        :param branch_tasks: list of Task, each the first Task of a branch
+        :param success_task: Task to execute if no branch failed
+        :param err_task: Task to execute if a branch failed
+        :param globals_dict: dict with named global variables/classes/methods
+        """
+        if branch_tasks is None or len(branch_tasks) == 0:
+            raise Exception("branch_tasks must be supplied")
+        for branch_task in branch_tasks:
+            if not isinstance(branch_task, Task):
+                raise Exception("branch_tasks must all be of type Task")
+        if success_task is not None and not isinstance(success_task, Task):
+            raise Exception("success_task must be of type Task")
+        if err_task is not None and not isinstance(err_task, Task):
+            raise Exception("err_task must be of type Task")
+        self.branch_tasks = list(branch_tasks)
+        self.success_task = success_task
+        self.err_task = err_task
+        self.globals_dict = globals_dict
+
+    def get_child_tasks(self):
+        """
+        List the Tasks this Task can statically move on to, including the first Task of every branch
+        :return: list of Task
+        """
+        return list(self.branch_tasks) + super(ParallelTask, self).get_child_tasks()
+
+    def _get_executor(self):
+        if self.executor is not None:
+            return self.executor
+        with self._lock:
+            if self._own_executor is None:
+                max_workers = self.max_workers
+                if max_workers is None:
+                    max_workers = len(self.branch_tasks) * DEFAULT_CONCURRENT_RUNS
+                self._own_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=self.task_name)
+            return self._own_executor
+
+    def close(self):
+        """
+        Shut down the thread pool created by this Task (a supplied executor is left alone). A later run creates a new
+        one.
+        """
+        with self._lock:
+            pool, self._own_executor = self._own_executor, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _branch_contexts(self, run):
+        if run is None or run.context is None:
+            return [None] * len(self.branch_tasks)
+        return [run.context.new_child() for _ in self.branch_tasks]
+
+    def _merge_contexts(self, run, contexts, branches):
+        # Only finished branches: a branch still running after a fail_fast join keeps its steps to itself
+        for context, branch in zip(contexts, branches):
+            if context is not None and branch.done() and not branch.cancelled():
+                run.context.merge_child(context)
+
+    def _branch_input(self, input_result):
+        result_obj = input_result.result_obj
+        # A FrozenDict can not be changed by a branch, so every branch shares it
+        if isinstance(result_obj, dict):
+            result_obj = dict(result_obj)
+        elif isinstance(result_obj, CopyOnWriteDict):
+            result_obj = result_obj.copy()
+        return Result(result_obj=result_obj)
+
+    def _join(self, input_result, results):
+        branch_results = [(branch_task.task_name, result) for branch_task, result in zip(self.branch_tasks, results)]
+        errors = [(task_name, result) for task_name, result in branch_results if result.is_error]
+        if len(errors) > 0:
+            if self.error_policy == FAIL_FAST:
+                return errors[0][1]
+            return Result(
+                result_obj={'Errors': dict((task_name, result.err_msg) for task_name, result in errors)},
+                is_error=True,
+                err_msg='{} of {} branches of {} failed'.format(len(errors), len(self.branch_tasks), self.task_name)
+            )
+        return Result(result_obj=self.merge_policy(input_result, branch_results))
+
+    def execute_function(self, input_result, run=None):
+        """
+        Runs all branches concurrently and joins their Results
+        :param input_result: Result containing the input parameters
+        :param run: RunState of the run (optional). Without it every branch runs on its own WorkFlowExecutor
+        :return: Result with the joined result_obj, or an error Result if a branch failed
+        """
+        executor = self._get_executor()
+        contexts = self._branch_contexts(run)
+        futures = [
+            executor.submit(_run_branch, branch_task, self._branch_input(input_result), run, context)
+            for branch_task, context in zip(self.branch_tasks, contexts)
+        ]
+        try:
+            if self.error_policy == FAIL_FAST:
+                pending = set(futures)
+                while len(pending) > 0:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    failed = [future.result() for future in done if future.result().is_error]
+                    if len(failed) > 0:
+                        for future in pending:
+                            future.cancel()
+                        return failed[0]
+            return self._join(input_result=input_result, results=[future.result() for future in futures])
+        finally:
+            self._merge_contexts(run, contexts, futures)
+
+    async def execute_function_async(self, input_result, loop_executor=None, run=None):
+        """
+        Runs all branches concurrently on the running event loop and joins their Results
+        :param input_result: Result containing the input parameters
+        :param loop_executor: concurrent.futures.Executor for normal Functions (optional)
+        :param run: RunState of the run (optional). Without it every branch runs on its own WorkFlowExecutor
+        :return: Result with the joined result_obj, or an error Result if a branch failed
+        """
+        contexts = self._branch_contexts(run)
+        branches = [
+            asyncio.ensure_future(_run_branch_async(branch_task, self._branch_input(input_result), loop_executor, run, context))
+            for branch_task, context in zip(self.branch_tasks, contexts)
+        ]
+        try:
+            if self.error_policy == FAIL_FAST:
+                pending = set(branches)
+                while len(pending) > 0:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    failed = [branch.result() for branch in done if branch.result().is_error]
+                    if len(failed) > 0:
+                        for branch in pending:
+                            branch.cancel()
+                        return failed[0]
+            return self._join(input_result=input_result, results=[branch.result() for branch in branches])
+        finally:
+            self._merge_contexts(run, contexts, branches)
+
+
+# EOF
@@ -0,0 +1,401 @@
+import asyncio, copy, functools, random, threading, time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from pytaskflow.taskflow_engine import Result, DispatchEntry, CopyOnWriteDict
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class TaskTimeoutError(Exception):
+    """
+    Raised (and handled by the TaskPolicy) when a Function does not finish within the policy's timeout
+    """
+    def __init__(self, task_name, timeout):
+        self.task_name = task_name
+        self.timeout = timeout
+        super(TaskTimeoutError, self).__init__('Task {} timed out after {}s'.format(task_name, timeout))
+
+
+class TaskPoolSaturatedError(Exception):
+    """
+    Raised (and handled by the TaskPolicy) when an attempt with a timeout can not start because every one of the
+    policy's timeout_workers threads is still busy
+    """
+    def __init__(self, task_name, timeout_workers):
+        self.task_name = task_name
+        self.timeout_workers = timeout_workers
+        super(TaskPoolSaturatedError, self).__init__(
+            'Task {} not run: all {} timeout_workers are busy'.format(task_name, timeout_workers)
+        )
+
+
+class CircuitBreaker:
+    """
+    Stops calling a Function that keeps failing. After failure_threshold failed attempts in a row the circuit opens
+    and every call is short-circuited to the error Task. Once reset_timeout seconds have passed, one trial call is let
+    through (half open): if it succeeds the circuit closes again, otherwise it stays open for another reset_timeout.
+
+    A CircuitBreaker is thread-safe and can be shared by the policies of several Tasks that use the same dependency.
+    """
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        :param failure_threshold: int with the number of failed attempts in a row that opens the circuit
+        :param reset_timeout: float with the seconds the circuit stays open before a trial call is let through
+        """
+        if failure_threshold < 1:
+            raise Exception("failure_threshold must be at least 1")
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._init_state()
+
+    def _init_state(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.open_count = 0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # A copy in another process starts closed
+        return {'failure_threshold': self.failure_threshold, 'reset_timeout': self.reset_timeout}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def allow(self):
+        """
+        :return: bool True if a call may go ahead
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_running = False
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.open_count += 1
+
+
+class TaskPolicy:
+    """
+    Timeout, retries and circuit breaking for a Task, enforced by the WorkFlowExecutor in run(), run_async() and in
+    every thread that runs the WorkFlow. Set it with Task.set_policy().
+
+    * Every attempt that raises an exception listed in retry_on, or that takes longer than timeout seconds, is retried
+      up to max_retries times, sleeping backoff * backoff_factor ** attempt seconds (at most max_backoff, reduced by
+      up to jitter of itself at random so that retries from many runs do not line up)
+    * When the last attempt fails, the Task produces an error Result - with the input result_obj and a message
+      explaining what went wrong - which routes to the err_task instead of raising
+    * With a CircuitBreaker, calls are short-circuited to the err_task the same way while the circuit is open
+
+    Python can not stop a thread, so with a timeout every attempt runs on a pool of timeout_workers threads owned by
+    the policy and a Function that hangs keeps one of those threads busy - but never the thread running the WorkFlow.
+    AsyncFunctions are cancelled when they time out.
+
+    * An attempt that times out may still be running, so every attempt with a timeout gets its own shallow copy of
+      the result_obj (FrozenDicts are shared, CopyOnWriteDicts are copied in O(1)): a late change made by it is never
+      seen by the retries or by the err_task
+    * When all timeout_workers threads are busy, an attempt is not queued behind them: it fails at once with a
+      TaskPoolSaturatedError, which is retried like any other failure but counted as saturated, not as a timeout
+
+    Functions are retried with the same input Result, so a Function that changes its input in place before failing
+    should be given a FrozenDict or CopyOnWriteDict result_obj.
+    """
+    def __init__(self, timeout=None, max_retries=0, backoff=0.1, backoff_factor=2.0, max_backoff=30.0, jitter=0.5,
+                 retry_on=(Exception,), retry_error_results=False, circuit_breaker=None, timeout_workers=8):
+        """
+        :param timeout: float with the seconds one attempt may take (None: no timeout)
+        :param max_retries: int with the number of retries after the first attempt
+        :param backoff: float with the seconds to wait before the first retry
+        :param backoff_factor: float the wait is multiplied with for every further retry
+        :param max_backoff: float with the longest wait between retries
+        :param jitter: float between 0 and 1 with the largest fraction of the wait that is randomly left out
+        :param retry_on: tuple of exception classes that are retried. TaskTimeoutError is retried if it is a subclass
+        of one of them (it is with the default)
+        :param retry_error_results: bool. If True, an error Result returned by the Function is retried (and counts as
+        a failure for the circuit breaker) too
+        :param circuit_breaker: CircuitBreaker (optional)
+        :param timeout_workers: int with the number of threads attempts with a timeout run on
+        """
+        if max_retries < 0:
+            raise Exception("max_retries can not be negative")
+        if not 0 <= jitter <= 1:
+            raise Exception("jitter must be between 0 and 1")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_on = tuple(retry_on)
+        self.retry_error_results = retry_error_results
+        self.circuit_breaker = circuit_breaker
+        self.timeout_workers = timeout_workers
+        self._init_state()
+
+    def _init_state(self):
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.saturated = 0
+        self.failures = 0
+        self.short_circuits = 0
+        self._pool = None
+        self._busy = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for name in ('calls', 'retries', 'timeouts', 'saturated', 'failures', 'short_circuits', '_pool', '_busy', '_lock'):
+            state.pop(name)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def new_entry(self, task_id, task):
+        """
+        Called when a WorkFlow is compiled (or run) to create the DispatchEntry of a Task with this policy
+        :return: PolicyDispatchEntry
+        """
+        return PolicyDispatchEntry(task_id=task_id, task=task, policy=self)
+
+    def backoff_delay(self, attempt):
+        """
+        :param attempt: int with the number of the attempt that failed, starting at 0
+        :return: float with the seconds to wait before the next attempt
+        """
+        delay = min(self.max_backoff, self.backoff * self.backoff_factor ** attempt)
+        return delay * (1.0 - self.jitter * random.random())
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(max_workers=self.timeout_workers, thread_name_prefix='TaskPolicy')
+        return self._pool
+
+    def _submit(self, entry, input_result, run):
+        # Starts an attempt on a free thread of the pool, never queues it behind hung ones
+        pool = self._get_pool()
+        with self._lock:
+            if self._busy >= self.timeout_workers:
+                raise TaskPoolSaturatedError(task_name=entry.task_name, timeout_workers=self.timeout_workers)
+            self._busy += 1
+        try:
+            future = pool.submit(DispatchEntry.execute, entry, input_result, run)
+        except BaseException:
+            self._release(pool)
+            raise
+        future.add_done_callback(lambda future: self._release(pool))
+        return future
+
+    def _release(self, pool):
+        with self._lock:
+            # Threads of a pool dropped by close() no longer count
+            if pool is self._pool:
+                self._busy -= 1
+
+    @staticmethod
+    def _own_input(input_result):
+        """
+        :return: Result like input_result with a shallow copy of its result_obj, for an attempt that may outlive its
+        timeout
+        """
+        result_obj = input_result.result_obj
+        if isinstance(result_obj, CopyOnWriteDict):
+            result_obj = result_obj.copy()
+        else:
+            result_obj = copy.copy(result_obj)
+        return Result(
+            result_obj=result_obj, is_error=input_result.is_error, err_msg=input_result.err_msg,
+            stop=input_result.stop, override_success_task=input_result.override_success_task,
+            override_err_task=input_result.override_err_task
+        )
+
+    def _error_result(self, input_result, err_msg):
+        return Result(result_obj=input_result.result_obj, is_error=True, err_msg=err_msg)
+
+    def _allow(self, entry, input_result):
+        # Returns None if the attempt can go ahead, otherwise the short-circuit Result
+        if self.circuit_breaker is None or self.circuit_breaker.allow():
+            return None
+        self._count('short_circuits')
+        return self._error_result(input_result, 'Task {} short-circuited: circuit is open'.format(entry.task_name))
+
+    def _settle(self, entry, input_result, attempt, result, exception):
+        """
+        Account for one attempt
+        :return: the Result of the call, or None if the attempt must be retried
+        """
+        if exception is None and not (result.is_error and self.retry_error_results):
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success()
+            return result
+        self._count('failures')
+        if isinstance(exception, TaskTimeoutError):
+            self._count('timeouts')
+        elif isinstance(exception, TaskPoolSaturatedError):
+            self._count('saturated')
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_failure()
+        retryable = exception is None or isinstance(exception, self.retry_on)
+        if retryable and attempt < self.max_retries:
+            self._count('retries')
+            return None
+        if exception is None:
+            return result
+        return self._error_result(input_result, 'Task {} failed after {} attempt(s): {}: {}'.format(
+            entry.task_name, attempt + 1, type(exception).__name__, exception
+        ))
+
+    def _attempt(self, entry, input_result, run):
+        if self.timeout is None:
+            return DispatchEntry.execute(entry, input_result, run=run)
+        future = self._submit(entry, self._own_input(input_result), run)
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TaskTimeoutError(task_name=entry.task_name, timeout=self.timeout)
+
+    def call(self, entry, input_result, run=None):
+        """
+        Execute a Task's Function under this policy
+        :param entry: DispatchEntry of the Task
+        :param input_result: Result containing the input parameters
+        :param run: RunState of the run (optional, see DispatchEntry.execute())
+        :return: Result
+        """
+        self._count('calls')
+        attempt = 0
+        while True:
+            short_circuit = self._allow(entry, input_result)
+            if short_circuit is not None:
+                return short_circuit
+            result = exception = None
+            try:
+                result = self._attempt(entry, input_result, run)
+            except Exception as e:
+                exception = e
+            settled = self._settle(entry, input_result, attempt, result, exception)
+            if settled is not None:
+                return settled
+            time.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    async def _attempt_async(self, entry, input_result, loop_executor, run):
+        if self.timeout is not None:
+            input_result = self._own_input(input_result)
+        if entry.uses_task_call:
+            awaitable = DispatchEntry.execute_async(entry, input_result, loop_executor=loop_executor, run=run)
+        else:
+            awaitable = asyncio.get_running_loop().run_in_executor(
+                loop_executor, functools.partial(DispatchEntry.execute, entry, input_result)
+            )
+        if self.timeout is None:
+            return await awaitable
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            raise TaskTimeoutError(task_name=entry.task_name, timeout=self.timeout)
+
+    async def call_async(self, entry, input_result, loop_executor=None, run=None):
+        """
+        Coroutine version of call()
+        :param entry: DispatchEntry of the Task
+        :param input_result: Result containing the input parameters
+        :param loop_executor: concurrent.futures.Executor for normal Functions (optional)
+        :param run: RunState of the run (optional)
+        :return: Result
+        """
+        self._count('calls')
+        attempt = 0
+        while True:
+            short_circuit = self._allow(entry, input_result)
+            if short_circuit is not None:
+                return short_circuit
+            result = exception = None
+            try:
+                result = await self._attempt_async(entry, input_result, loop_executor, run)
+            except Exception as e:
+                exception = e
+            settled = self._settle(entry, input_result, attempt, result, exception)
+            if settled is not None:
+                return settled
+            await asyncio.sleep(self.backoff_delay(attempt))
+            attempt += 1
+
+    def stats(self):
+        """
+        :return: dict with the calls, retries, timeouts, saturated (attempts refused because every timeout_workers
+        thread was busy), failures (failed attempts) and short_circuits so far, and the circuit state (None without a
+        CircuitBreaker)
+        """
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'retries': self.retries,
+                'timeouts': self.timeouts,
+                'saturated': self.saturated,
+                'failures': self.failures,
+                'short_circuits': self.short_circuits,
+                'circuit': self.circuit_breaker.state if self.circuit_breaker is not None else None,
+            }
+
+    def close(self):
+        """
+        Stop the threads used for timeouts. Threads still running a hung Function finish in the background.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+            self._busy = 0
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+class PolicyDispatchEntry(DispatchEntry):
+    """
+    DispatchEntry for a Task with a TaskPolicy. Tasks without a policy keep the plain DispatchEntry, so they pay
+    nothing for this.
+    """
+    __slots__ = ('policy',)
+
+    def __init__(self, task_id, task, policy):
+        super(PolicyDispatchEntry, self).__init__(task_id=task_id, task=task)
+        self.policy = policy
+
+    def execute(self, input_result, run=None):
+        return self.policy.call(self, input_result, run=run)
+
+    async def execute_async(self, input_result, loop_executor=None, run=None):
+        return await self.policy.call_async(self, input_result, loop_executor=loop_executor, run=run)
+
+
+# EOF
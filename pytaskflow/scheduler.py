@@ -0,0 +1,272 @@
+"""
+A scheduler that runs WorkFlows on a fixed pool of worker threads, so the number of runs executing at once is bounded
+no matter how many callers submit work. Waiting runs are ordered by priority, then deadline, then submission order;
+a full queue either rejects new runs or makes the caller wait (backpressure).
+
+    scheduler = WorkFlowScheduler(workers=8, max_queue=500)
+    future = scheduler.submit(checkout_workflow, Result(result_obj={...}), priority=0, deadline=2.0)
+    report_future = scheduler.submit(report_workflow, Result(result_obj={...}), priority=10)
+    result = future.result()
+    print(scheduler.stats()['wait_time']['p99'])
+"""
+import collections, heapq, itertools, threading, time
+from concurrent.futures import Future
+from pytaskflow.instrumentation import percentile
+
+
+REJECT = 'reject'
+BLOCK = 'block'
+OVERFLOW_POLICIES = (REJECT, BLOCK)
+
+
+class SchedulerFullError(Exception):
+    """
+    Raised by WorkFlowScheduler.submit() when the queue is full and the run was not accepted
+    """
+    def __init__(self, max_queue):
+        self.max_queue = max_queue
+        super(SchedulerFullError, self).__init__('The scheduler queue is full ({} runs waiting)'.format(max_queue))
+
+
+class DeadlineExceededError(Exception):
+    """
+    Set on the Future of a run that could not start before its deadline. The run was not executed.
+    """
+    def __init__(self, waited):
+        self.waited = waited
+        super(DeadlineExceededError, self).__init__('The run waited {:.3f}s and missed its deadline'.format(waited))
+
+
+class _ScheduledRun:
+    __slots__ = ('workflow', 'input_result', 'context', 'priority', 'deadline_at', 'submitted_at', 'future')
+
+    def __init__(self, workflow, input_result, context, priority, deadline_at, submitted_at, future):
+        self.workflow = workflow
+        self.input_result = input_result
+        self.context = context
+        self.priority = priority
+        self.deadline_at = deadline_at
+        self.submitted_at = submitted_at
+        self.future = future
+
+
+class WorkFlowScheduler:
+    """
+    Runs WorkFlows with WorkFlow.run_workflow() on a fixed number of worker threads. Existing WorkFlows work
+    unchanged - the scheduler only decides when a run starts.
+
+    * Runs with a lower priority value start first; runs with the same priority start in order of their deadline and
+      then in the order they were submitted
+    * A run that has not started deadline seconds after it was submitted is not executed; its Future gets a
+      DeadlineExceededError, so a latency sensitive caller that already gave up does not take up a worker
+    * At most max_queue runs wait at a time. With overflow 'reject' submit() raises SchedulerFullError when the queue
+      is full, with 'block' it waits (up to its timeout) for room
+    * stats() reports the queue depth, running runs, counters and the time runs waited before starting
+    """
+    def __init__(self, workers=4, max_queue=1000, overflow=REJECT, wait_time_samples=10000, name='WorkFlowScheduler'):
+        """
+        :param workers: int with the number of runs executed at the same time
+        :param max_queue: int with the number of runs that may wait to be started
+        :param overflow: str, 'reject' or 'block', what submit() does when the queue is full
+        :param wait_time_samples: int with the number of most recent wait times kept for stats()
+        :param name: str used to name the worker threads
+        """
+        if workers < 1:
+            raise Exception("workers must be at least 1")
+        if max_queue < 1:
+            raise Exception("max_queue must be at least 1")
+        if overflow not in OVERFLOW_POLICIES:
+            raise Exception("overflow must be one of {}".format(', '.join(OVERFLOW_POLICIES)))
+        self.workers = workers
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self._heap = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._shutdown = False
+        self._wait_times = collections.deque(maxlen=wait_time_samples)
+        self.max_queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.expired = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.failed = 0
+        self._threads = [
+            threading.Thread(target=self._work, name='{}-{}'.format(name, i), daemon=True) for i in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.shutdown(wait=True)
+
+    def _wait_for_room(self, timeout):
+        # Called with the lock held
+        end = None if timeout is None else time.monotonic() + timeout
+        while len(self._heap) >= self.max_queue and not self._shutdown:
+            remaining = None if end is None else end - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._not_full.wait(remaining)
+        return not self._shutdown
+
+    def submit(self, workflow, input_result=None, priority=0, deadline=None, context=None, timeout=None):
+        """
+        Queue a run of a WorkFlow
+        :param workflow: WorkFlow to run
+        :param input_result: Result containing the input parameters (optional)
+        :param priority: int/float - runs with a lower value start first
+        :param deadline: float with the seconds from now the run must have started by (optional)
+        :param context: ExecutionContext to record the run in (optional)
+        :param timeout: float with the seconds to wait for room in a full queue with overflow 'block' (None: no limit)
+        :return: concurrent.futures.Future with the Result of the run, or the exception it raised
+        :raises SchedulerFullError: if the queue is full and the run could not be queued
+        """
+        now = time.monotonic()
+        future = Future()
+        run = _ScheduledRun(
+            workflow=workflow, input_result=input_result, context=context, priority=priority,
+            deadline_at=now + deadline if deadline is not None else None, submitted_at=now, future=future
+        )
+        with self._lock:
+            if self._shutdown:
+                raise Exception("the scheduler was shut down")
+            if len(self._heap) >= self.max_queue:
+                if self.overflow == REJECT or not self._wait_for_room(timeout):
+                    if self._shutdown:
+                        raise Exception("the scheduler was shut down")
+                    self.rejected += 1
+                    raise SchedulerFullError(self.max_queue)
+            deadline_key = run.deadline_at if run.deadline_at is not None else float('inf')
+            heapq.heappush(self._heap, (priority, deadline_key, next(self._sequence), run))
+            self.submitted += 1
+            self.max_queued = max(self.max_queued, len(self._heap))
+            self._not_empty.notify()
+        return future
+
+    def run(self, workflow, input_result=None, priority=0, deadline=None, context=None, timeout=None):
+        """
+        Submit a run and wait for its Result, see submit()
+        :return: Result of the run
+        """
+        return self.submit(
+            workflow, input_result=input_result, priority=priority, deadline=deadline, context=context, timeout=timeout
+        ).result()
+
+    def _next_run(self):
+        with self._lock:
+            while len(self._heap) == 0 and not self._shutdown:
+                self._not_empty.wait()
+            if len(self._heap) == 0:
+                return None
+            run = heapq.heappop(self._heap)[3]
+            self._not_full.notify()
+            self.running += 1
+            return run
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _execute(self, run):
+        started = time.monotonic()
+        waited = started - run.submitted_at
+        if not run.future.set_running_or_notify_cancel():
+            self._count('cancelled')
+            return
+        if run.deadline_at is not None and started > run.deadline_at:
+            self._count('expired')
+            run.future.set_exception(DeadlineExceededError(waited))
+            return
+        with self._lock:
+            self._wait_times.append((run.priority, waited))
+        try:
+            result = run.workflow.run_workflow(input_result=run.input_result, context=run.context)
+        except Exception as e:
+            self._count('failed')
+            run.future.set_exception(e)
+        else:
+            self._count('completed')
+            run.future.set_result(result)
+
+    def _work(self):
+        while True:
+            run = self._next_run()
+            if run is None:
+                return
+            try:
+                self._execute(run)
+            finally:
+                with self._lock:
+                    self.running -= 1
+
+    @staticmethod
+    def _summarize(wait_times):
+        wait_times = sorted(wait_times)
+        return {
+            'count': len(wait_times),
+            'mean': sum(wait_times) / len(wait_times) if len(wait_times) > 0 else None,
+            'max': wait_times[-1] if len(wait_times) > 0 else None,
+            'p50': percentile(wait_times, 0.5),
+            'p90': percentile(wait_times, 0.9),
+            'p99': percentile(wait_times, 0.99),
+        }
+
+    def stats(self):
+        """
+        :return: dict with the workers, the runs queued now (in total and per priority), the most runs queued at once,
+        the runs running now, the submitted, rejected, expired (missed their deadline), cancelled, completed and
+        failed (raised an exception) counts, and the wait time in seconds of the most recent started runs (count,
+        mean, max, p50, p90, p99) in total and per priority
+        """
+        with self._lock:
+            queued_by_priority = collections.Counter(item[0] for item in self._heap)
+            wait_times = list(self._wait_times)
+            stats = {
+                'workers': self.workers,
+                'queued': len(self._heap),
+                'queued_by_priority': dict(queued_by_priority),
+                'max_queued': self.max_queued,
+                'running': self.running,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'expired': self.expired,
+                'cancelled': self.cancelled,
+                'completed': self.completed,
+                'failed': self.failed,
+            }
+        by_priority = collections.defaultdict(list)
+        for priority, wait_time in wait_times:
+            by_priority[priority].append(wait_time)
+        stats['wait_time'] = self._summarize(wait_time for _, wait_time in wait_times)
+        stats['wait_time_by_priority'] = dict((priority, self._summarize(values)) for priority, values in by_priority.items())
+        return stats
+
+    def shutdown(self, wait=True, cancel_pending=False):
+        """
+        Stop accepting runs. Queued runs are still executed unless cancel_pending is set.
+        :param wait: bool. If True, wait until the worker threads finished
+        :param cancel_pending: bool. If True, cancel the Futures of the runs that did not start yet
+        """
+        with self._lock:
+            self._shutdown = True
+            if cancel_pending:
+                for _, _, _, run in self._heap:
+                    if run.future.cancel():
+                        self.cancelled += 1
+                self._heap = []
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+# EOF
@@ -0,0 +1,226 @@
+"""
+Codecs used to serialize session data. Every codec has a one byte tag which is written in front of the encoded data
+by encode_tagged(), so data can always be decoded with decode_tagged() no matter which codec wrote it.
+
+Results are serialized in a lean wire form - result_obj, is_error, err_msg and stop - without the override Task
+references, which would otherwise drag whole Task graphs (and their Functions) along.
+"""
+import collections.abc, io, json, marshal, pickle
+from pytaskflow.taskflow_engine import Result
+
+
+_RESULT_MARKER = '__pytaskflow_result__'
+
+# First byte of MarshalCodec data: marshalled as is, a top level Result, or walked to replace nested Results
+_MARSHAL_PLAIN = b'0'
+_MARSHAL_RESULT = b'1'
+_MARSHAL_WALKED = b'2'
+
+
+def result_to_wire(result):
+    """
+    :param result: Result
+    :return: tuple with the lean wire form of the Result
+    """
+    return (result.result_obj, result.is_error, result.err_msg, result.stop)
+
+
+def result_from_wire(wire):
+    """
+    :param wire: tuple (or list) returned by result_to_wire()
+    :return: Result
+    """
+    result_obj, is_error, err_msg, stop = wire
+    return Result(result_obj=result_obj, is_error=is_error, err_msg=err_msg, stop=stop)
+
+
+def _reduce_result(result):
+    return (result_from_wire, (result_to_wire(result),))
+
+
+class Codec:
+    """
+    Base class for codecs
+    """
+    name = None
+    tag = None
+
+    def encode(self, obj):
+        """
+        :param obj: object to serialize
+        :return: bytes
+        """
+        raise Exception("Your codec implementation must override this method.")
+
+    def decode(self, data):
+        """
+        :param data: bytes returned by encode()
+        :return: object
+        """
+        raise Exception("Your codec implementation must override this method.")
+
+
+class PickleCodec(Codec):
+    """
+    Pickles with the highest protocol. Handles any picklable object; Results are pickled in their lean wire form.
+    """
+    name = 'pickle'
+    tag = b'p'
+
+    def __init__(self, protocol=pickle.HIGHEST_PROTOCOL):
+        self.protocol = protocol
+        self.dispatch_table = {Result: _reduce_result}
+
+    def encode(self, obj):
+        f = io.BytesIO()
+        pickler = pickle.Pickler(f, self.protocol)
+        pickler.dispatch_table = self.dispatch_table
+        pickler.dump(obj)
+        return f.getvalue()
+
+    def decode(self, data):
+        return pickle.loads(data)
+
+
+class JsonCodec(Codec):
+    """
+    UTF-8 JSON. Portable and readable, but only for JSON types (tuples come back as lists) and Results.
+    """
+    name = 'json'
+    tag = b'j'
+
+    def _default(self, obj):
+        if isinstance(obj, Result):
+            return {_RESULT_MARKER: list(result_to_wire(obj))}
+        if isinstance(obj, collections.abc.Mapping):
+            # FrozenDict and CopyOnWriteDict come back as dicts
+            return dict(obj)
+        raise TypeError("Object of type {} is not JSON serializable".format(type(obj).__name__))
+
+    def _object_hook(self, obj):
+        if len(obj) == 1 and _RESULT_MARKER in obj:
+            return result_from_wire(obj[_RESULT_MARKER])
+        return obj
+
+    def encode(self, obj):
+        return json.dumps(obj, default=self._default, separators=(',', ':')).encode('utf-8')
+
+    def decode(self, data):
+        return json.loads(data.decode('utf-8'), object_hook=self._object_hook)
+
+
+class MarshalCodec(Codec):
+    """
+    Compact and fast binary encoding with the standard library marshal module, for the built in types (dict, list,
+    tuple, set, str, bytes, numbers, bool, None) and Results. The marshal format can change between Python versions,
+    so only use it for data read back by the same Python version.
+    """
+    name = 'marshal'
+    tag = b'm'
+
+    def _to_marshal(self, obj):
+        if isinstance(obj, Result):
+            return (_RESULT_MARKER, self._to_marshal(obj.result_obj), obj.is_error, obj.err_msg, obj.stop)
+        if isinstance(obj, collections.abc.Mapping):
+            return dict((key, self._to_marshal(value)) for key, value in obj.items())
+        if isinstance(obj, list):
+            return [self._to_marshal(value) for value in obj]
+        if isinstance(obj, tuple):
+            return tuple(self._to_marshal(value) for value in obj)
+        return obj
+
+    def _from_marshal(self, obj):
+        if isinstance(obj, dict):
+            return dict((key, self._from_marshal(value)) for key, value in obj.items())
+        if isinstance(obj, list):
+            return [self._from_marshal(value) for value in obj]
+        if isinstance(obj, tuple):
+            if len(obj) == 5 and obj[0] == _RESULT_MARKER:
+                return result_from_wire((self._from_marshal(obj[1]),) + obj[2:])
+            return tuple(self._from_marshal(value) for value in obj)
+        return obj
+
+    def encode(self, obj):
+        # Most data has no Results below the top level, so try to marshal it as is before walking it
+        if isinstance(obj, Result):
+            try:
+                return _MARSHAL_RESULT + marshal.dumps(result_to_wire(obj))
+            except ValueError:
+                pass
+        else:
+            try:
+                return _MARSHAL_PLAIN + marshal.dumps(obj)
+            except ValueError:
+                pass
+        return _MARSHAL_WALKED + marshal.dumps(self._to_marshal(obj))
+
+    def decode(self, data):
+        kind, payload = data[:1], data[1:]
+        if kind == _MARSHAL_PLAIN:
+            return marshal.loads(payload)
+        if kind == _MARSHAL_RESULT:
+            return result_from_wire(marshal.loads(payload))
+        return self._from_marshal(marshal.loads(payload))
+
+
+_codecs_by_name = {}
+_codecs_by_tag = {}
+
+
+def register_codec(codec):
+    """
+    Register a codec so that it can be found by name and by tag
+    :param codec: Codec with a unique name and one byte tag
+    """
+    if not isinstance(codec.tag, bytes) or len(codec.tag) != 1:
+        raise Exception("codec tag must be a single byte")
+    existing = _codecs_by_tag.get(codec.tag)
+    if existing is not None and existing.name != codec.name:
+        raise Exception("codec tag {!r} is already used by the {} codec".format(codec.tag, existing.name))
+    _codecs_by_name[codec.name] = codec
+    _codecs_by_tag[codec.tag] = codec
+
+
+def get_codec(codec):
+    """
+    :param codec: str with the name of a registered codec, a Codec, or None for the default pickle codec
+    :return: Codec
+    """
+    if codec is None:
+        return _codecs_by_name['pickle']
+    if isinstance(codec, Codec):
+        return codec
+    if codec not in _codecs_by_name:
+        raise Exception("unknown codec {}".format(codec))
+    return _codecs_by_name[codec]
+
+
+def encode_tagged(obj, codec=None):
+    """
+    Encode an object and put the codec's tag in front
+    :param obj: object
+    :param codec: Codec or codec name (default: pickle)
+    :return: bytes
+    """
+    codec = get_codec(codec)
+    return codec.tag + codec.encode(obj)
+
+
+def decode_tagged(data):
+    """
+    Decode data written by encode_tagged(), with the codec named by its tag
+    :param data: bytes
+    :return: object
+    """
+    codec = _codecs_by_tag.get(data[:1])
+    if codec is None:
+        raise Exception("no codec registered for tag {!r}".format(data[:1]))
+    return codec.decode(data[1:])
+
+
+register_codec(PickleCodec())
+register_codec(JsonCodec())
+register_codec(MarshalCodec())
+
+
+# EOF
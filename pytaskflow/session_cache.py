@@ -0,0 +1,364 @@
+import collections, pickle, threading, time, traceback, warnings
+from pytaskflow.taskflow_engine import SessionPersistence, FileBasedSessionPersistence
+
+
+WRITE_THROUGH = 'write_through'
+WRITE_BEHIND = 'write_behind'
+
+_MISSING = object()
+
+# Number of locks the writes to the backing SessionPersistence are spread over, by session token
+_WRITE_LOCKS = 32
+
+
+class _CacheEntry:
+    __slots__ = ('session_data', 'expires_at', 'size', 'dirty', 'backend_factory')
+
+    def __init__(self, session_data, expires_at, size):
+        self.session_data = session_data
+        self.expires_at = expires_at
+        self.size = size
+        self.dirty = False
+        self.backend_factory = None
+
+
+class _Fill:
+    __slots__ = ('count', 'stale')
+
+    def __init__(self):
+        self.count = 0
+        self.stale = False
+
+
+class SessionCache:
+    """
+    A bounded, thread-safe, in memory LRU cache of session data shared by CachedSessionPersistence instances.
+
+    Entries are evicted least recently used first when there are more than max_entries, or when the total size is
+    above max_bytes. Entries older than ttl seconds are treated as missing. In write_behind mode saved sessions are
+    only written to the backing SessionPersistence by flush(), which runs every flush_interval seconds on a background
+    thread (and for an entry that is about to be evicted). An evicted session stays readable until it is written, and
+    one whose write failed is kept and written again by the next flush(). Writes of the same session never overlap,
+    and a session that was saved again, or invalidated, since is not written, so older data never replaces newer
+    data. Once close() was called saves are no longer cached as dirty: CachedSessionPersistence writes them through.
+    A session read from the backing store on a miss is only cached with fill() when it was not saved or invalidated
+    while it was read.
+
+    Cached objects are returned as is, so callers must not mutate session data they did not save again.
+    """
+    def __init__(self, max_entries=10000, max_bytes=None, ttl=None, write_mode=WRITE_THROUGH, flush_interval=1.0, sizer=None):
+        """
+        :param max_entries: int with the maximum number of cached sessions
+        :param max_bytes: int with the maximum total size of the cached sessions (None: no limit)
+        :param ttl: int/float with the number of seconds an entry stays valid (None: no expiry)
+        :param write_mode: str, either 'write_through' or 'write_behind'
+        :param flush_interval: float with the seconds between background flushes in write_behind mode
+        :param sizer: callable(session_data) returning the size of an entry. Defaults to the pickled size when
+        max_bytes is set
+        """
+        if write_mode not in (WRITE_THROUGH, WRITE_BEHIND):
+            raise Exception("write_mode must be either '{}' or '{}'".format(WRITE_THROUGH, WRITE_BEHIND))
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.write_mode = write_mode
+        self.flush_interval = flush_interval
+        self.sizer = sizer
+        if self.sizer is None and max_bytes is not None:
+            self.sizer = lambda session_data: len(pickle.dumps(session_data, pickle.HIGHEST_PROTOCOL))
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.writes = 0
+        self._entries = collections.OrderedDict()
+        # Dirty entries taken out of _entries by eviction that are not written yet
+        self._pending = {}
+        # session_token -> _Fill of the backend reads in progress, see begin_fill()
+        self._fills = {}
+        self._lock = threading.Lock()
+        self._write_locks = [threading.Lock() for _ in range(_WRITE_LOCKS)]
+        self._flusher = None
+        self._closed = threading.Event()
+
+    def get(self, session_token, default=None):
+        """
+        Get a cached session
+        :param session_token: str
+        :param default: object returned when the session is not cached
+        :return: the cached session data, or default
+        """
+        with self._lock:
+            entry = self._entries.get(session_token)
+            if entry is not None and entry.expires_at is not None and entry.expires_at < time.monotonic() and not entry.dirty:
+                self._remove(session_token, entry)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                entry = self._pending.get(session_token)
+                if entry is not None:
+                    self.hits += 1
+                    return entry.session_data
+                self.misses += 1
+                return default
+            self._entries.move_to_end(session_token)
+            self.hits += 1
+            return entry.session_data
+
+    def put(self, session_token, session_data, backend_factory=None):
+        """
+        Cache a session
+        :param session_token: str
+        :param session_data: object
+        :param backend_factory: callable(session_token, session_data) returning the SessionPersistence to write the
+        session to later. Only used in write_behind mode - the entry is marked dirty until it is flushed. Raises an
+        Exception once the cache is closed
+        """
+        size = self.sizer(session_data) if self.sizer is not None else 0
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if backend_factory is not None and self._closed.is_set():
+                raise Exception("the SessionCache is closed, {} can not be written behind".format(session_token))
+            old_entry = self._entries.get(session_token)
+            if old_entry is not None:
+                self._remove(session_token, old_entry)
+            self._pending.pop(session_token, None)
+            self._mark_stale(session_token)
+            entry = _CacheEntry(session_data=session_data, expires_at=expires_at, size=size)
+            if backend_factory is not None:
+                entry.dirty = True
+                entry.backend_factory = backend_factory
+            self._entries[session_token] = entry
+            self.total_bytes += size
+            evicted = self._evict()
+        for evicted_token, evicted_entry in evicted:
+            self._write_back(evicted_token, evicted_entry)
+        if backend_factory is not None:
+            self._start_flusher()
+
+    def invalidate(self, session_token):
+        """
+        Drop a session from the cache without writing it back
+        :param session_token: str
+        """
+        with self._lock:
+            entry = self._entries.get(session_token)
+            if entry is not None:
+                self._remove(session_token, entry)
+            self._pending.pop(session_token, None)
+            self._mark_stale(session_token)
+
+    def _mark_stale(self, session_token):
+        fill = self._fills.get(session_token)
+        if fill is not None:
+            fill.stale = True
+
+    def begin_fill(self, session_token):
+        """
+        Start reading a session that is not cached from the backing SessionPersistence. Pass the returned object to
+        fill() once the read is done.
+        :param session_token: str
+        :return: object identifying the read
+        """
+        with self._lock:
+            fill = self._fills.get(session_token)
+            if fill is None or fill.stale:
+                # Reads started after a save are not held back by the saves that came before them
+                fill = self._fills[session_token] = _Fill()
+            fill.count += 1
+            return fill
+
+    def fill(self, session_token, session_data, fill):
+        """
+        Cache a session read from the backing SessionPersistence - unless it was saved or invalidated since
+        begin_fill(), or is cached already, so a read that started before a save never replaces the saved data
+        :param session_token: str
+        :param session_data: object read, or None if there was nothing to read (or the read failed)
+        :param fill: object returned by begin_fill()
+        :return: bool True if the session was cached
+        """
+        size = self.sizer(session_data) if self.sizer is not None and session_data is not None else 0
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            fill.count -= 1
+            if fill.count == 0 and self._fills.get(session_token) is fill:
+                del self._fills[session_token]
+            if session_data is None or fill.stale or session_token in self._entries or session_token in self._pending:
+                return False
+            self._entries[session_token] = _CacheEntry(session_data=session_data, expires_at=expires_at, size=size)
+            self.total_bytes += size
+            evicted = self._evict()
+        for evicted_token, evicted_entry in evicted:
+            self._write_back(evicted_token, evicted_entry)
+        return True
+
+    @property
+    def closed(self):
+        """
+        :return: bool, True once close() was called
+        """
+        return self._closed.is_set()
+
+    def _remove(self, session_token, entry):
+        del self._entries[session_token]
+        self.total_bytes -= entry.size
+
+    def _evict(self):
+        evicted = []
+        while len(self._entries) > 1 and (
+            len(self._entries) > self.max_entries or (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            session_token, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry.size
+            self.evictions += 1
+            if entry.dirty:
+                self._pending[session_token] = entry
+                evicted.append((session_token, entry))
+        return evicted
+
+    def count_write(self):
+        """
+        Count a session written to the backing SessionPersistence
+        """
+        with self._lock:
+            self.writes += 1
+
+    def _is_current(self, session_token, entry):
+        return self._entries.get(session_token, self._pending.get(session_token)) is entry
+
+    def _write_back(self, session_token, entry):
+        # Called without self._lock. The write lock of the token keeps writes of one session in order, and an entry
+        # replaced or invalidated in the meantime is skipped: its data is older than what is saved now
+        with self._write_locks[hash(session_token) % _WRITE_LOCKS]:
+            with self._lock:
+                if not entry.dirty or not self._is_current(session_token, entry):
+                    return False
+            try:
+                saved = entry.backend_factory(session_token, entry.session_data).save_session_data()
+            except:
+                warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+                saved = False
+            if not saved:
+                # Stays dirty (and pending when it was evicted) for the next flush()
+                return False
+            with self._lock:
+                self.writes += 1
+                entry.dirty = False
+                if self._pending.get(session_token) is entry:
+                    del self._pending[session_token]
+            return True
+
+    def flush(self):
+        """
+        Write every dirty session, cached or evicted, to its backing SessionPersistence
+        :return: int with the number of sessions written
+        """
+        # A save replaces the entry object, so an entry saved again while it is being written stays dirty
+        with self._lock:
+            dirty = [(token, entry) for token, entry in self._entries.items() if entry.dirty]
+            dirty.extend(self._pending.items())
+        written = 0
+        for session_token, entry in dirty:
+            if self._write_back(session_token, entry):
+                written += 1
+        return written
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name='SessionCacheFlusher', daemon=True)
+                self._flusher.start()
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """
+        Stop the background flusher and write every dirty session. Later write_behind saves are written through
+        """
+        with self._lock:
+            # A put() that got the lock first is flushed below, any later one is refused
+            self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    def stats(self):
+        """
+        :return: dict with the entries, bytes, hits, misses, hit_rate, evictions, expirations, writes and pending (the
+        evicted sessions that are not written yet)
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups > 0 else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'writes': self.writes,
+                'pending': len(self._pending),
+            }
+
+
+class CachedSessionPersistence(SessionPersistence):
+    """
+    A SessionPersistence that puts a SessionCache in front of any other SessionPersistence implementation. Create the
+    SessionCache once and pass it to every instance.
+    """
+    def __init__(self, session_token, session_data=None, cache=None, backend_factory=FileBasedSessionPersistence):
+        """
+        :param session_token: str (see SessionPersistence)
+        :param session_data: object (see SessionPersistence)
+        :param cache: SessionCache shared between instances
+        :param backend_factory: callable(session_token, session_data) returning the SessionPersistence that is cached,
+        for example a SessionPersistence subclass or a lambda that adds extra arguments
+        """
+        if cache is None:
+            raise Exception("cache must be supplied")
+        super(CachedSessionPersistence, self).__init__(session_token, session_data)
+        self.cache = cache
+        self.backend_factory = backend_factory
+
+    def get_session_data(self):
+        if self.session_token is None:
+            return None
+        session_data = self.cache.get(self.session_token, default=_MISSING)
+        if session_data is not _MISSING:
+            return session_data
+        fill = self.cache.begin_fill(self.session_token)
+        session_data = None
+        try:
+            session_data = self.backend_factory(self.session_token, None).get_session_data()
+        finally:
+            self.cache.fill(self.session_token, session_data, fill)
+        return session_data
+
+    def save_session_data(self):
+        if self.session_data is None or self.session_token is None:
+            return False
+        if self.cache.write_mode == WRITE_BEHIND and not self.cache.closed:
+            self.cache.put(self.session_token, self.session_data, backend_factory=self.backend_factory)
+            return True
+        saved = self.backend_factory(self.session_token, self.session_data).save_session_data()
+        if saved:
+            self.cache.put(self.session_token, self.session_data)
+            self.cache.count_write()
+        else:
+            self.cache.invalidate(self.session_token)
+        return saved
+
+    def delete_session_data(self):
+        if self.session_token is None:
+            return False
+        self.cache.invalidate(self.session_token)
+        return self.backend_factory(self.session_token, None).delete_session_data()
+
+
+# EOF
@@ -0,0 +1,201 @@
+import hashlib, os, tempfile, time, zlib
+from pytaskflow.serialization import encode_tagged, decode_tagged, get_codec
+
+try:
+    import lzma
+except ImportError:     # Python builds without liblzma
+    lzma = None
+
+
+SESSION_FILE_SUFFIX = '.session'
+
+# First byte of every session file, telling how the rest of the file is compressed. The rest of the file is written
+# by pytaskflow.serialization.encode_tagged()
+_FORMAT_PLAIN = b'P'
+_FORMAT_ZLIB = b'Z'
+_FORMAT_LZMA = b'L'
+
+
+class FileSessionStore:
+    """
+    Stores serialized session data in files, one per session token.
+
+    * Files are written to a temporary file in the same directory and renamed into place, so a crash mid-write never
+      leaves a torn session behind
+    * Data is serialized with a codec from pytaskflow.serialization (pickle with the highest protocol by default)
+      and, when it is larger than compress_threshold bytes, compressed with zlib or lzma
+    * Files are spread over shard_depth levels of sub directories named after the hash of the token, which keeps
+      directories small with millions of sessions and makes any token (even one containing a path separator) safe
+    * Sessions older than ttl seconds are treated as missing and can be removed in bulk with sweep_expired()
+
+    A FileSessionStore holds no open files and can be shared between threads.
+    """
+    def __init__(self, root_dir=None, ttl=None, compression='zlib', compress_threshold=4096, shard_depth=2, fsync=False,
+                 codec=None):
+        """
+        :param root_dir: str with the directory to keep sessions in (default: pytaskflow-sessions in the temp dir)
+        :param ttl: int/float with the number of seconds after the last save that a session expires (None: never)
+        :param compression: str, one of 'zlib', 'lzma' or None
+        :param compress_threshold: int with the serialized size in bytes above which data is compressed
+        :param shard_depth: int with the number of sub directory levels (each level has up to 256 directories)
+        :param fsync: bool. If True, files are flushed to disk before they are renamed into place
+        :param codec: str with the name of a codec in pytaskflow.serialization, or a Codec (default: pickle). Sessions
+        written with another codec can still be read
+        """
+        if compression not in ('zlib', 'lzma', None):
+            raise Exception("compression must be one of 'zlib', 'lzma' or None")
+        if compression == 'lzma' and lzma is None:
+            raise Exception("lzma compression is not available in this Python build")
+        if root_dir is None:
+            root_dir = os.path.join(tempfile.gettempdir(), 'pytaskflow-sessions')
+        self.root_dir = root_dir
+        self.ttl = ttl
+        self.compression = compression
+        self.compress_threshold = compress_threshold
+        self.shard_depth = shard_depth
+        self.fsync = fsync
+        self.codec = get_codec(codec)
+
+    def path_for(self, session_token):
+        """
+        Get the file a session is stored in
+        :param session_token: str with the session token
+        :return: str with the full path of the file
+        """
+        digest = hashlib.sha256(session_token.encode('utf-8')).hexdigest()
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.shard_depth)]
+        return os.path.join(self.root_dir, *(shards + [digest + SESSION_FILE_SUFFIX]))
+
+    def encode(self, session_data):
+        """
+        Serialize (and possibly compress) session data
+        :param session_data: object the codec can serialize
+        :return: bytes
+        """
+        data = encode_tagged(session_data, self.codec)
+        if self.compression is None or len(data) <= self.compress_threshold:
+            return _FORMAT_PLAIN + data
+        if self.compression == 'lzma':
+            return _FORMAT_LZMA + lzma.compress(data)
+        return _FORMAT_ZLIB + zlib.compress(data)
+
+    def decode(self, data):
+        """
+        Reverse of encode()
+        :param data: bytes
+        :return: object
+        """
+        data_format, payload = data[:1], data[1:]
+        if data_format == _FORMAT_ZLIB:
+            payload = zlib.decompress(payload)
+        elif data_format == _FORMAT_LZMA:
+            if lzma is None:
+                raise Exception("session data is lzma compressed but lzma is not available in this Python build")
+            payload = lzma.decompress(payload)
+        elif data_format != _FORMAT_PLAIN:
+            raise Exception("unknown session data format {!r}".format(data_format))
+        return decode_tagged(payload)
+
+    def save(self, session_token, session_data):
+        """
+        Atomically save session data
+        :param session_token: str with the session token
+        :param session_data: object the codec can serialize
+        """
+        self.write_bytes(session_token, self.encode(session_data))
+
+    def write_bytes(self, session_token, data):
+        """
+        Atomically write an already encoded session
+        :param session_token: str with the session token
+        :param data: bytes
+        """
+        path = self.path_for(session_token)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.partial')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def load(self, session_token, default=None):
+        """
+        Load session data
+        :param session_token: str with the session token
+        :param default: object returned when there is no (unexpired) session
+        :return: object that was saved, or default
+        """
+        data = self.read_bytes(session_token)
+        if data is None:
+            return default
+        return self.decode(data)
+
+    def read_bytes(self, session_token):
+        """
+        Read an encoded session
+        :param session_token: str with the session token
+        :return: bytes, or None when there is no (unexpired) session
+        """
+        path = self.path_for(session_token)
+        try:
+            with open(path, 'rb') as f:
+                if self.ttl is not None and os.fstat(f.fileno()).st_mtime + self.ttl < time.time():
+                    expired = True
+                else:
+                    return f.read()
+        except FileNotFoundError:
+            return None
+        if expired:
+            self._remove(path)
+        return None
+
+    def delete(self, session_token):
+        """
+        Delete a session
+        :param session_token: str with the session token
+        :return: bool True if a session was deleted
+        """
+        return self._remove(self.path_for(session_token))
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def sweep_expired(self, now=None):
+        """
+        Remove every expired session, as well as temporary files left behind by writes that crashed
+        :param now: float with the current time (optional, for testing)
+        :return: int with the number of sessions removed
+        """
+        if now is None:
+            now = time.time()
+        removed = 0
+        for directory, _, filenames in os.walk(self.root_dir):
+            for filename in filenames:
+                path = os.path.join(directory, filename)
+                try:
+                    mtime = os.stat(path).st_mtime
+                except FileNotFoundError:
+                    continue
+                if filename.endswith(SESSION_FILE_SUFFIX):
+                    if self.ttl is not None and mtime + self.ttl < now and self._remove(path):
+                        removed += 1
+                elif filename.startswith('.tmp-') and mtime + 3600 < now:
+                    self._remove(path)
+        return removed
+
+
+# EOF
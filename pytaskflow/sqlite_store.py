@@ -0,0 +1,228 @@
+import itertools, sqlite3, threading, time, traceback, warnings, weakref
+from pytaskflow.taskflow_engine import SessionPersistence
+from pytaskflow.serialization import encode_tagged, decode_tagged, get_codec
+
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS sessions (token TEXT PRIMARY KEY, data BLOB NOT NULL, updated_at REAL NOT NULL, expires_at REAL)',
+    'CREATE INDEX IF NOT EXISTS sessions_expires_at ON sessions (expires_at)',
+)
+_SAVE_SQL = 'INSERT OR REPLACE INTO sessions (token, data, updated_at, expires_at) VALUES (?, ?, ?, ?)'
+_LOAD_SQL = 'SELECT data FROM sessions WHERE token = ? AND (expires_at IS NULL OR expires_at >= ?)'
+_DELETE_SQL = 'DELETE FROM sessions WHERE token = ?'
+_SWEEP_SQL = 'DELETE FROM sessions WHERE expires_at < ?'
+
+# SQLite allows at least 999 parameters per statement, leave room for the expiry parameter
+_LOAD_MANY_CHUNK_SIZE = 900
+
+
+class _ConnectionHolder:
+    # Only referenced by the thread-local data of its thread, so it is dropped when the thread ends
+    __slots__ = ('connection', '__weakref__')
+
+    def __init__(self, connection):
+        self.connection = connection
+
+
+def _close_connection(connections, lock, key):
+    with lock:
+        connection = connections.pop(key, None)
+    if connection is not None:
+        connection.close()
+
+
+class SqliteSessionStore:
+    """
+    Stores sessions in one SQLite database file.
+
+    * The database runs in WAL mode so readers do not block the writer
+    * Every thread gets its own connection, opened on first use and then reused; the SQL statements are constant so
+      sqlite3's statement cache keeps them prepared. The connection is closed when its thread ends, so a thread per
+      request server does not pile up connections
+    * save_many() and load_many() handle many sessions in one transaction or query
+    * Expiry times are indexed, so sweep_expired() stays cheap with millions of sessions
+
+    Use a file path for database - with ':memory:' every thread would get its own, empty, database.
+    """
+    def __init__(self, database, ttl=None, timeout=30.0, synchronous='NORMAL', codec=None):
+        """
+        :param database: str with the path of the SQLite database file (created if it does not exist)
+        :param ttl: int/float with the number of seconds after the last save that a session expires (None: never)
+        :param timeout: float with the seconds to wait for a lock held by another connection
+        :param synchronous: str with the SQLite synchronous setting. NORMAL is safe in WAL mode; use FULL to also
+        survive power loss
+        :param codec: str with the name of a codec in pytaskflow.serialization, or a Codec (default: pickle). Sessions
+        written with another codec can still be read
+        """
+        self.database = database
+        self.ttl = ttl
+        self.timeout = timeout
+        self.synchronous = synchronous
+        self.codec = get_codec(codec)
+        self._local = threading.local()
+        # key -> connection of every thread that is still running
+        self._connections = {}
+        self._keys = itertools.count()
+        self._lock = threading.Lock()
+        with self._connection() as connection:
+            for statement in _SCHEMA:
+                connection.execute(statement)
+
+    def _connection(self):
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            connection = sqlite3.connect(self.database, timeout=self.timeout, cached_statements=128, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous={}'.format(self.synchronous))
+            holder = _ConnectionHolder(connection)
+            with self._lock:
+                key = next(self._keys)
+                self._connections[key] = connection
+            weakref.finalize(holder, _close_connection, self._connections, self._lock, key)
+            self._local.holder = holder
+        return holder.connection
+
+    def _expires_at(self, now):
+        if self.ttl is None:
+            return None
+        return now + self.ttl
+
+    def save(self, session_token, session_data):
+        """
+        Save session data
+        :param session_token: str with the session token
+        :param session_data: object the codec can serialize
+        """
+        now = time.time()
+        data = encode_tagged(session_data, self.codec)
+        with self._connection() as connection:
+            connection.execute(_SAVE_SQL, (session_token, data, now, self._expires_at(now)))
+
+    def save_many(self, sessions):
+        """
+        Save many sessions in one transaction
+        :param sessions: iterable of (session_token, session_data) tuples, or a dict
+        :return: int with the number of sessions saved
+        """
+        if isinstance(sessions, dict):
+            sessions = sessions.items()
+        now = time.time()
+        expires_at = self._expires_at(now)
+        rows = [(token, encode_tagged(session_data, self.codec), now, expires_at) for token, session_data in sessions]
+        with self._connection() as connection:
+            connection.executemany(_SAVE_SQL, rows)
+        return len(rows)
+
+    def load(self, session_token, default=None):
+        """
+        Load session data
+        :param session_token: str with the session token
+        :param default: object returned when there is no (unexpired) session
+        :return: object that was saved, or default
+        """
+        row = self._connection().execute(_LOAD_SQL, (session_token, time.time())).fetchone()
+        if row is None:
+            return default
+        return decode_tagged(row[0])
+
+    def load_many(self, session_tokens):
+        """
+        Load many sessions with as few queries as possible
+        :param session_tokens: iterable of str
+        :return: dict of session_token to session data, without the tokens that have no (unexpired) session
+        """
+        session_tokens = list(session_tokens)
+        now = time.time()
+        connection = self._connection()
+        sessions = {}
+        for start in range(0, len(session_tokens), _LOAD_MANY_CHUNK_SIZE):
+            chunk = session_tokens[start:start + _LOAD_MANY_CHUNK_SIZE]
+            sql = 'SELECT token, data FROM sessions WHERE token IN ({}) AND (expires_at IS NULL OR expires_at >= ?)'.format(
+                ', '.join('?' * len(chunk))
+            )
+            for token, data in connection.execute(sql, chunk + [now]):
+                sessions[token] = decode_tagged(data)
+        return sessions
+
+    def delete(self, session_token):
+        """
+        Delete a session
+        :param session_token: str with the session token
+        :return: bool True if a session was deleted
+        """
+        with self._connection() as connection:
+            return connection.execute(_DELETE_SQL, (session_token,)).rowcount > 0
+
+    def sweep_expired(self, now=None):
+        """
+        Remove every expired session
+        :param now: float with the current time (optional, for testing)
+        :return: int with the number of sessions removed
+        """
+        if now is None:
+            now = time.time()
+        with self._connection() as connection:
+            return connection.execute(_SWEEP_SQL, (now,)).rowcount
+
+    def count(self):
+        """
+        :return: int with the number of stored sessions, including expired sessions that were not swept yet
+        """
+        return self._connection().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+
+    def close(self):
+        """
+        Close the connections of all threads. The store can still be used afterwards - threads simply open a new
+        connection.
+        """
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+
+class SqliteSessionPersistence(SessionPersistence):
+    """
+    A SessionPersistence implementation backed by a SqliteSessionStore. Create the store once and pass it to every
+    instance.
+    """
+    def __init__(self, session_token, session_data=None, store=None):
+        """
+        :param session_token: str (see SessionPersistence)
+        :param session_data: object (see SessionPersistence)
+        :param store: SqliteSessionStore
+        """
+        if store is None:
+            raise Exception("store must be supplied")
+        super(SqliteSessionPersistence, self).__init__(session_token, session_data)
+        self.store = store
+
+    def get_session_data(self):
+        try:
+            if self.session_token is not None:
+                return self.store.load(self.session_token)
+        except:
+            warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+        return None
+
+    def save_session_data(self):
+        if self.session_data is not None and self.session_token is not None:
+            try:
+                self.store.save(self.session_token, self.session_data)
+                return True
+            except:
+                warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+        return False
+
+    def delete_session_data(self):
+        if self.session_token is not None:
+            try:
+                return self.store.delete(self.session_token)
+            except:
+                warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+        return False
+
+
+# EOF
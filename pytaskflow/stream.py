@@ -0,0 +1,209 @@
+import itertools, queue, threading, traceback
+from pytaskflow.taskflow_engine import Result, CompiledWorkFlow
+from pytaskflow.batch import run_one
+
+
+# Seconds a stage waits on a full or empty queue before checking whether the stream was closed
+_POLL_INTERVAL = 0.1
+
+_END = object()
+_FAILED = object()
+
+
+class _Pipeline:
+    """
+    The threads and queues of one pipelined stream: a feeder thread pulling inputs, one thread per Task of the
+    compiled graph with a bounded queue in front of it, and a bounded output queue read by the consuming generator.
+
+    A stage thread only queues a record for a Task with a higher ID than its own Task. Moving to a Task with a lower
+    or equal ID (a loop, or an override back to an earlier Task) or to a Task outside the graph is executed by the
+    same stage thread, so the stage threads never wait on each other in a circle and bounded queues can not deadlock.
+    """
+    def __init__(self, workflow, graph, queue_size, max_in_flight, batch_size):
+        self.workflow = workflow
+        self.batch_size = batch_size
+        self.graph = graph
+        self.executor = workflow.executor
+        self.closed = threading.Event()
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in graph.entries]
+        self.output = queue.Queue(maxsize=queue_size)
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.threads = []
+
+    def _put(self, target_queue, item):
+        while not self.closed.is_set():
+            try:
+                target_queue.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _get(self, source_queue):
+        while not self.closed.is_set():
+            try:
+                return source_queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                pass
+        return None
+
+    def start(self, inputs):
+        for entry in self.graph.entries:
+            self.threads.append(threading.Thread(
+                target=self._run_stage, args=(entry,), name='WorkFlowStage-{}'.format(entry.task_name), daemon=True
+            ))
+        self.threads.append(threading.Thread(target=self._feed, args=(inputs,), name='WorkFlowFeeder', daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def _feed(self, inputs):
+        index = 0
+        try:
+            for input_result in inputs:
+                while not self.in_flight.acquire(timeout=_POLL_INTERVAL):
+                    if self.closed.is_set():
+                        return
+                context = self.workflow.new_context()
+                if not self._put(self.queues[self.graph.starter.task_id], (index, context, input_result)):
+                    return
+                index += 1
+        except Exception as e:
+            self._put(self.output, (_FAILED, e))
+            return
+        self._put(self.output, (_END, index))
+
+    def _run_stage(self, stage_entry):
+        stage_queue = self.queues[stage_entry.task_id]
+        while True:
+            item = self._get(stage_queue)
+            if item is None:
+                return
+            if not stage_entry.is_batch:
+                index, context, result = item
+                if not self._advance(stage_entry, index, context, result, stage_entry):
+                    return
+                continue
+            # A BatchFunction gets every record that is already waiting, up to batch_size, in one call
+            items = [item]
+            while len(items) < self.batch_size:
+                try:
+                    items.append(stage_queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                steps = self.executor.execute_batch_step(
+                    stage_entry, [result for index, context, result in items], [context for index, context, result in items],
+                    self.graph
+                )
+            except Exception:
+                err_msg = traceback.format_exc()
+                steps = [(Result(result_obj={}, is_error=True, err_msg=err_msg), None) for _ in items]
+            for (index, context, input_result), (result, entry) in zip(items, steps):
+                if not self._advance(stage_entry, index, context, result, entry):
+                    return
+
+    def _advance(self, stage_entry, index, context, result, entry):
+        # Run the record on this stage until it moves on to a later stage or finishes, then hand it on
+        try:
+            checkpointer = self.executor._get_checkpointer(context)
+            while entry is not None and entry.task_id <= stage_entry.task_id:
+                result, entry = self.executor.execute_step(entry, result, context, self.graph, checkpointer)
+        except Exception:
+            result = Result(result_obj={}, is_error=True, err_msg=traceback.format_exc())
+            entry = None
+        if entry is None:
+            return self._put(self.output, (index, result))
+        return self._put(self.queues[entry.task_id], (index, context, result))
+
+    def close(self):
+        self.closed.set()
+        for thread in self.threads:
+            thread.join()
+
+
+def _pipeline_stream(workflow, graph, inputs, queue_size, ordered, max_in_flight, batch_size):
+    pipeline = _Pipeline(
+        workflow=workflow, graph=graph, queue_size=queue_size, max_in_flight=max_in_flight, batch_size=batch_size
+    )
+    pipeline.start(inputs)
+    try:
+        total = None
+        yielded = 0
+        next_index = 0
+        waiting = {}
+        while total is None or yielded < total:
+            index, result = pipeline.output.get()
+            if index is _FAILED:
+                raise result
+            if index is _END:
+                total = result
+                continue
+            if not ordered:
+                yielded += 1
+                pipeline.in_flight.release()
+                yield (index, result)
+                continue
+            waiting[index] = result
+            while next_index in waiting:
+                yielded += 1
+                pipeline.in_flight.release()
+                yield waiting.pop(next_index)
+                next_index += 1
+    finally:
+        pipeline.close()
+
+
+def stream(workflow, inputs, pipeline=False, queue_size=16, ordered=True, max_in_flight=None, batch_size=64):
+    """
+    Run a WorkFlow over an iterable of inputs, pulling the inputs lazily and yielding Results as they finish. Memory
+    use does not depend on the number of inputs.
+
+    Without pipeline, inputs are run one after the other on the calling thread. With pipeline, every Task of the
+    (compiled) WorkFlow runs on its own thread with a bounded queue of queue_size records in front of it, so different
+    Tasks work on different records at the same time - which pays off when Tasks wait on I/O or release the GIL. An
+    exception raised while running an input is reported as an error Result for that input.
+
+    A Task with a BatchFunction gets up to batch_size records per call: without pipeline, inputs are pulled and run
+    batch_size at a time with WorkFlow.run_workflow_batch(); with pipeline, its stage takes every record already
+    waiting in its queue.
+
+    :param workflow: WorkFlow to run. It is compiled for the stream if it was not compiled before
+    :param inputs: iterable of Result objects
+    :param pipeline: bool. If True, run the Tasks as concurrent stages
+    :param queue_size: int with the number of records each stage queue (and the output queue) holds
+    :param ordered: bool. If True, Results are yielded in input order. If False, (index, Result) tuples are yielded as
+    soon as they finish
+    :param max_in_flight: int with the number of records that may be inside the pipeline at the same time (defaults
+    to queue_size times the number of stages). This also bounds the records held back to restore the input order
+    :param batch_size: int with the largest number of records a BatchFunction gets per call
+    :return: generator of Result (ordered) or (index, Result) tuples (not ordered)
+    """
+    if batch_size < 1:
+        raise Exception("batch_size must be at least 1")
+    if not pipeline and workflow.uses_batch_functions():
+        inputs = iter(inputs)
+        index = 0
+        while True:
+            batch = list(itertools.islice(inputs, batch_size))
+            if len(batch) == 0:
+                return
+            for result in workflow.run_workflow_batch(input_results=batch):
+                yield result if ordered else (index, result)
+                index += 1
+    if not pipeline:
+        for index, input_result in enumerate(inputs):
+            result = run_one(workflow=workflow, input_result=input_result)
+            yield result if ordered else (index, result)
+        return
+    if queue_size < 1:
+        raise Exception("queue_size must be at least 1")
+    graph = workflow.compiled
+    if graph is None:
+        graph = CompiledWorkFlow(workflow_name=workflow.workflow_name, starter_task=workflow.starter_task)
+    if max_in_flight is None:
+        max_in_flight = queue_size * len(graph.entries)
+    for item in _pipeline_stream(workflow, graph, inputs, queue_size, ordered, max_in_flight, batch_size):
+        yield item
+
+
+# EOF
@@ -0,0 +1,261 @@
+"""
+Sub-workflows: a SubWorkFlowTask runs another WorkFlow as a single step of its parent. Sub-workflows are registered
+by name in a WorkFlowRegistry and built and compiled the first time a run needs them, so one compiled copy is shared
+by every parent WorkFlow and every run, and sub-workflows that are never used are never built.
+
+    register_workflow('error_handler', 'myapp.workflows:get_error_workflow')
+    register_workflow('checkout', 'workflows/checkout.json')
+
+    t_checkout = SubWorkFlowTask(task_name='Checkout', workflow_name='checkout')
+    t_checkout.register_subworkflow(success_task=t_confirm, err_task=SubWorkFlowTask('Errors', 'error_handler'))
+"""
+import os, threading
+from pytaskflow.taskflow_engine import ExecutionContext, Result, Task, WorkFlow
+
+
+DEFINITION_SUFFIXES = ('.json', '.yaml', '.yml')
+
+
+class WorkFlowRegistry:
+    """
+    Named WorkFlows, built and compiled lazily on first use. A WorkFlow can be registered as
+
+    * a WorkFlow object
+    * a callable without arguments returning a WorkFlow (a factory)
+    * a str with the import path of a WorkFlow or a factory ("package.module:get_workflow")
+    * a str with the path of a .json, .yaml or .yml definition file (see pytaskflow.definition)
+
+    Every WorkFlow is built once per process, even when many threads ask for it at the same time. When a registry is
+    pickled (for example with a WorkFlow sent to worker processes) the built WorkFlows stay behind and every process
+    builds its own on first use, so factories and Function classes must be importable there.
+    """
+    def __init__(self):
+        self._sources = {}
+        self._init_state()
+
+    def _init_state(self):
+        self._workflows = {}
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        return {'_sources': self._sources}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def register(self, name, source, replace=False):
+        """
+        Register a WorkFlow under a name. Nothing is built until get() is called.
+        :param name: str with the name sub-workflows refer to
+        :param source: WorkFlow, factory, import path or definition file path (see the class documentation)
+        :param replace: bool. If True, replace a WorkFlow registered under the same name (and drop it if it was built)
+        """
+        if not (isinstance(source, (WorkFlow, str)) or callable(source)):
+            raise Exception("source must be a WorkFlow, a callable returning one, an import path or a definition file")
+        with self._lock:
+            if name in self._sources and not replace:
+                raise Exception("a WorkFlow is already registered as {}".format(name))
+            self._sources[name] = source
+            self._workflows.pop(name, None)
+
+    def unload(self, name):
+        """
+        Drop the built WorkFlow registered under a name. It is built again the next time it is needed.
+        :param name: str with the registered name
+        """
+        with self._lock:
+            self._workflows.pop(name, None)
+
+    def names(self):
+        """
+        :return: list of str with the registered names
+        """
+        with self._lock:
+            return sorted(self._sources)
+
+    def is_loaded(self, name):
+        """
+        :param name: str with the registered name
+        :return: bool True if the WorkFlow has been built
+        """
+        with self._lock:
+            return name in self._workflows
+
+    def _build(self, name, source):
+        if isinstance(source, str):
+            if os.path.splitext(source)[1].lower() in DEFINITION_SUFFIXES:
+                from pytaskflow.definition import load_workflow
+                return load_workflow(source)
+            from pytaskflow.definition import import_object
+            source = import_object(source)
+        workflow = source
+        if not isinstance(workflow, WorkFlow) and callable(workflow):
+            workflow = workflow()
+        if not isinstance(workflow, WorkFlow):
+            raise Exception("the source registered as {} did not produce a WorkFlow".format(name))
+        if workflow.compiled is None:
+            workflow.compile()
+        return workflow
+
+    def get(self, name):
+        """
+        Get a WorkFlow, building and compiling it if this is the first time it is needed
+        :param name: str with the registered name
+        :return: compiled WorkFlow
+        """
+        workflow = self._workflows.get(name)
+        if workflow is not None:
+            return workflow
+        with self._lock:
+            workflow = self._workflows.get(name)
+            if workflow is not None:
+                return workflow
+            if name not in self._sources:
+                raise Exception("no WorkFlow is registered as {}".format(name))
+            source = self._sources[name]
+            loading = self._loading.get(name)
+            if loading is None:
+                loading = self._loading[name] = threading.Lock()
+        # Build outside the registry lock, so building one WorkFlow does not hold up the others
+        with loading:
+            workflow = self._workflows.get(name)
+            if workflow is not None:
+                return workflow
+            workflow = self._build(name, source)
+            with self._lock:
+                if self._sources.get(name) is source:
+                    self._workflows[name] = workflow
+                self._loading.pop(name, None)
+            return workflow
+
+
+default_registry = WorkFlowRegistry()
+
+
+def register_workflow(name, source, replace=False):
+    """
+    Register a WorkFlow in the default registry, see WorkFlowRegistry.register(). Register at import time of a module
+    the worker processes import as well, so sub-workflows can be found there in process mode.
+    """
+    default_registry.register(name, source, replace=replace)
+
+
+def _step_result(result):
+    # The sub-workflow ends here, not the parent: drop stop and any override pointing into the sub-workflow
+    return Result(result_obj=result.result_obj, is_error=result.is_error, err_msg=result.err_msg)
+
+
+class SubWorkFlowTask(Task):
+    """
+    A Task that runs a registered WorkFlow as one step. The sub-workflow gets the input Result of this Task and its
+    last Result becomes the Result of this Task, which moves on to the success_task, or the err_task if the Result is
+    an error. A Result that stops the sub-workflow does not stop the parent.
+
+    The sub-workflow is looked up (and on first use built) in the registry every time the Task runs and is executed by
+    its own executor, so its instrumentation hooks and Task policies apply. It is part of the run of its parent: its
+    steps are recorded in a child of the parent's ExecutionContext (same run ID) and added to the parent's trace,
+    results and step count when it ends. Checkpoints are only saved between the steps of the parent.
+
+    A sub-workflow that runs itself again, directly or through other sub-workflows, raises an Exception instead of
+    recursing until the Python recursion limit.
+    """
+    takes_run = True
+
+    def __init__(self, task_name, workflow_name, registry=None):
+        """
+        Initializes the task
+        :param task_name: str with the Task name
+        :param workflow_name: str with the name of the registered WorkFlow to run
+        :param registry: WorkFlowRegistry to look it up in (default: the default registry of this module)
+        """
+        super(SubWorkFlowTask, self).__init__(task_name)
+        self.workflow_name = workflow_name
+        self.registry = registry
+
+    def register_subworkflow(self, success_task, err_task, globals_dict={}):
+        """
+        Registers the Tasks to execute after the sub-workflow
+        :param success_task: Task to execute if the sub-workflow does not end with an error Result
+        :param err_task: Task to execute if it does
+        :param globals_dict: dict with named global variables/classes/methods
+        """
+        if success_task is not None and not isinstance(success_task, Task):
+            raise Exception("success_task must be of type Task")
+        if err_task is not None and not isinstance(err_task, Task):
+            raise Exception("err_task must be of type Task")
+        self.success_task = success_task
+        self.err_task = err_task
+        self.globals_dict = globals_dict
+
+    def _get_registry(self):
+        return self.registry if self.registry is not None else default_registry
+
+    def get_workflow(self):
+        """
+        :return: the compiled sub-workflow
+        """
+        return self._get_registry().get(self.workflow_name)
+
+    def _new_context(self, workflow, run):
+        # Sub-workflows are told apart by registry and registered name: WorkFlow names do not have to be unique
+        source = (self._get_registry(), self.workflow_name)
+        parent = run.context if run is not None else None
+        if parent is None:
+            context = ExecutionContext(workflow_name=workflow.workflow_name)
+            context.source = source
+            return context
+        names = []
+        runs_itself = False
+        context = parent
+        while context is not None:
+            names.append(context.workflow_name)
+            runs_itself = runs_itself or context.source == source
+            context = context.parent
+        if runs_itself:
+            raise Exception("sub-workflow {} runs itself: {}".format(
+                self.workflow_name, ' -> '.join(reversed([workflow.workflow_name] + names))
+            ))
+        return parent.new_child(workflow_name=workflow.workflow_name, source=source)
+
+    def execute_function(self, input_result, run=None):
+        """
+        Runs the sub-workflow
+        :param input_result: Result containing the input parameters
+        :param run: RunState of the parent run (optional)
+        :return: Result of the last Task of the sub-workflow
+        """
+        workflow = self.get_workflow()
+        context = self._new_context(workflow, run)
+        try:
+            result = workflow.executor.run(
+                starter_task=workflow.starter_task, input_result=input_result, context=context, graph=workflow.compiled
+            )
+        finally:
+            if context.parent is not None:
+                context.parent.merge_child(context)
+        return _step_result(result)
+
+    async def execute_function_async(self, input_result, loop_executor=None, run=None):
+        """
+        Runs the sub-workflow on the running event loop
+        :param input_result: Result containing the input parameters
+        :param loop_executor: concurrent.futures.Executor for normal Functions (optional)
+        :param run: RunState of the parent run (optional)
+        :return: Result of the last Task of the sub-workflow
+        """
+        workflow = self.get_workflow()
+        context = self._new_context(workflow, run)
+        try:
+            result = await workflow.executor.run_async(
+                starter_task=workflow.starter_task, input_result=input_result, context=context,
+                loop_executor=loop_executor, graph=workflow.compiled
+            )
+        finally:
+            if context.parent is not None:
+                context.parent.merge_child(context)
+        return _step_result(result)
+
+
+# EOF
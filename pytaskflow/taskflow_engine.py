@@ -1,25 +1,293 @@
-import pickle, traceback, tempfile, os, warnings, inspect
+import traceback, tempfile, os, warnings, threading, uuid, collections, collections.abc, asyncio, functools, time, logging
+from pytaskflow.instrumentation import TaskEvent
 
 
 TEMP_DIR = tempfile.gettempdir()
 
+LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'warn': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL,
+}
+
+
+def _level_number(level):
+    if isinstance(level, int):
+        return level
+    level_no = LOG_LEVELS.get(level)
+    if level_no is None:
+        level_no = LOG_LEVELS.get(str(level).lower(), logging.INFO)
+    return level_no
+
 
 class LoggingHandler:
     """
-    Default log class. You can safely override this class with your own implementation.
+    Default log class. Messages are passed to the standard logging module (the "pytaskflow" logger unless another
+    logger is given), so they end up wherever the application's logging configuration sends them. Add a
+    pytaskflow.async_logging.QueueLogHandler to that logger to keep formatting and writing off the threads running
+    work flows. You can safely override this class with your own implementation.
+
+    As long as logging is not configured - the logger and its ancestors have no handlers - messages are printed to
+    stdout, as this class always did.
+
+    Messages below max_level are dropped before anything is formatted: a disabled call costs a dict lookup and an
+    integer comparison (see benchmarks.bench_logging), so log calls can stay in hot Functions.
     """
-    def __init__(self, max_level="info"):
+    def __init__(self, max_level="info", logger=None):
+        """
+        :param max_level: str with the most verbose level that is logged ('debug', 'info', 'warning', 'error' or
+        'critical'), or a logging level number
+        :param logger: logging.Logger to log to (default: the "pytaskflow" logger)
+        """
+        self.logger = logger if logger is not None else logging.getLogger('pytaskflow')
         self.maxLevel = max_level
 
-    def log(self, level="info", message=None):
-        print("[NOT overridden] [%s] %s" % (level, message))
+    @property
+    def maxLevel(self):
+        return self._max_level
+
+    @maxLevel.setter
+    def maxLevel(self, max_level):
+        self._max_level = max_level
+        self._level_no = _level_number(max_level)
+
+    def is_enabled(self, level="info"):
+        """
+        :param level: str with the level name, or a logging level number
+        :return: bool True if a message with this level would be logged
+        """
+        level_no = _level_number(level)
+        return level_no >= self._level_no and (self.logger.isEnabledFor(level_no) or not self.logger.hasHandlers())
+
+    def log(self, level="info", message=None, *args):
+        """
+        Log a message. Formatting is deferred until the message is actually written:
+
+            log_handler.log("debug", "Task %s got %d items", task_name, len(items))
+            log_handler.log("debug", lambda: expensive_summary(result))
+
+        :param level: str with the level name, or a logging level number
+        :param message: str, with %-style placeholders for args, or a callable without arguments returning the message
+        (only called if the level is enabled)
+        :param args: values for the placeholders in message
+        """
+        level_no = LOG_LEVELS.get(level)
+        if level_no is None:
+            level_no = _level_number(level)
+        if level_no < self._level_no:
+            return
+        if not self.logger.hasHandlers():
+            if callable(message):
+                message = message()
+            print("[NOT overridden] [%s] %s" % (level, message % args if args else message))
+            return
+        if not self.logger.isEnabledFor(level_no):
+            return
+        if callable(message):
+            message = message()
+        self.logger.log(level_no, message, *args)
+
+
+def freeze(obj):
+    """
+    Make an immutable copy of an object: dicts (and other mappings) become FrozenDicts, lists and tuples become tuples
+    and sets become frozensets, all the way down. Other objects are kept as they are.
+    :param obj: object
+    :return: the immutable object
+    """
+    if isinstance(obj, FrozenDict):
+        return obj
+    if isinstance(obj, collections.abc.Mapping):
+        return FrozenDict(obj)
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(value) for value in obj)
+    if isinstance(obj, (set, frozenset)):
+        return frozenset(freeze(value) for value in obj)
+    return obj
+
+
+class FrozenDict(collections.abc.Mapping):
+    """
+    An immutable dict for result_obj. Its values are frozen with freeze(), so a FrozenDict can be handed from step to
+    step, or to several Tasks at once, without ever being copied. Use set(), merge() and delete() to derive a changed
+    FrozenDict (the keys are copied, the values are shared) and thaw() to get a normal dict back.
+    """
+    __slots__ = ('_data', '_hash')
+
+    def __init__(self, data=None, **kwargs):
+        """
+        :param data: mapping or iterable of (key, value) pairs (optional)
+        :param kwargs: more keys and values
+        """
+        items = dict(data) if data is not None else {}
+        items.update(kwargs)
+        self._data = dict((key, freeze(value)) for key, value in items.items())
+        self._hash = None
+
+    @classmethod
+    def _wrap(cls, data):
+        # data is a dict owned by the new FrozenDict with values that are already frozen
+        frozen = cls.__new__(cls)
+        frozen._data = data
+        frozen._hash = None
+        return frozen
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._data.items()))
+        return self._hash
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (FrozenDict, (self._data,))
+
+    def __repr__(self):
+        return 'FrozenDict({!r})'.format(self._data)
+
+    def set(self, key, value):
+        """
+        :return: FrozenDict with key set to value
+        """
+        data = dict(self._data)
+        data[key] = freeze(value)
+        return FrozenDict._wrap(data)
+
+    def merge(self, mapping=None, **kwargs):
+        """
+        :return: FrozenDict updated with the keys and values of mapping and kwargs
+        """
+        data = dict(self._data)
+        for key, value in dict(mapping if mapping is not None else {}, **kwargs).items():
+            data[key] = freeze(value)
+        return FrozenDict._wrap(data)
+
+    def delete(self, key):
+        """
+        :return: FrozenDict without key
+        """
+        data = dict(self._data)
+        del data[key]
+        return FrozenDict._wrap(data)
+
+    def thaw(self):
+        """
+        :return: dict with the same keys and values (nested values stay frozen)
+        """
+        return dict(self._data)
+
+
+class CopyOnWriteDict(collections.abc.MutableMapping):
+    """
+    A dict for result_obj that shares the data of another mapping until it is changed. Wrapping is O(1); the first
+    change makes a shallow copy, so only the keys set or deleted are private - nested lists and dicts are still shared
+    and must be replaced rather than changed in place.
+
+    A Function that changes input_result.result_obj in place (for example to count loop iterations) can be given a
+    CopyOnWriteDict instead of a defensive copy of the dict. The wrapped dict itself must not be changed afterwards.
+    """
+    __slots__ = ('_data', '_owned')
+
+    def __init__(self, data=None):
+        """
+        :param data: mapping to share (optional). A CopyOnWriteDict or FrozenDict shares its data without copying
+        """
+        if isinstance(data, CopyOnWriteDict):
+            # Both now share the same dict, so both must copy before their next change
+            data._owned = False
+            self._data = data._data
+            self._owned = False
+        elif isinstance(data, FrozenDict):
+            self._data = data._data
+            self._owned = False
+        elif isinstance(data, dict):
+            self._data = data
+            self._owned = False
+        else:
+            self._data = dict(data) if data is not None else {}
+            self._owned = True
+
+    def _own(self):
+        self._data = dict(self._data)
+        self._owned = True
+
+    def __getitem__(self, key):
+        return self._data[key]
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def __setitem__(self, key, value):
+        if not self._owned:
+            self._own()
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        if not self._owned:
+            self._own()
+        del self._data[key]
+
+    def __reduce__(self):
+        return (CopyOnWriteDict, (dict(self._data),))
+
+    def __repr__(self):
+        return 'CopyOnWriteDict({!r})'.format(self._data)
+
+    def copy(self):
+        """
+        :return: CopyOnWriteDict sharing this one's data, in O(1)
+        """
+        return CopyOnWriteDict(self)
+
+    @property
+    def copied(self):
+        """
+        True once this CopyOnWriteDict stopped sharing its data
+        """
+        return self._owned
 
 
 class Result:
     """
     This is the standard Result object that must be generated by every Function and that will also be passed as a
     parameter into every other Function that will be executed as part of a WorkFlow
+
+    Results have no __dict__, which makes them smaller and faster to create. To let steps share a result_obj without
+    copying it, use a FrozenDict (see freeze()) or a CopyOnWriteDict.
     """
+    __slots__ = ('result_obj', 'is_error', 'err_msg', 'stop', 'override_success_task', 'override_err_task')
+
     def __init__(self, result_obj, is_error=False, err_msg=None, stop=False, override_success_task=None, override_err_task=None):
         """
         Initialize the Result
@@ -28,18 +296,18 @@ class Result:
         :param err_msg: str containing the error message
         :param stop: bool used by Task to determine if the next Task must be called
         """
+        if result_obj is None:
+            result_obj = {}
         self.result_obj = result_obj
         self.is_error = is_error
         self.err_msg = err_msg
-        if self.result_obj is None:
-            self.result_obj = {}
         self.stop = stop
         self.override_success_task = override_success_task
         self.override_err_task = override_err_task
 
     def _get_string(self):
         ds = "\n"
-        if isinstance(self.result_obj, dict):
+        if isinstance(self.result_obj, collections.abc.Mapping):
             for key, value in self.result_obj.items():
                 ds += "\t\t%s=%s\n" % (key, value)
         str = "DUMP\n----\n\tself.resultObj=%s\n\tself.isError=%s\n\tself.errMsg=%s\n\tself.resultObj DATA:%s" % (type(self.result_obj), self.is_error, self.err_msg, ds)
@@ -51,6 +319,24 @@ class Result:
     def __repr__(self):
         return self._get_string()
 
+    def freeze(self):
+        """
+        :return: Result with the same fields and the result_obj frozen with freeze()
+        """
+        return Result(
+            result_obj=freeze(self.result_obj), is_error=self.is_error, err_msg=self.err_msg, stop=self.stop,
+            override_success_task=self.override_success_task, override_err_task=self.override_err_task
+        )
+
+    def copy_on_write(self):
+        """
+        :return: Result with the same fields and a CopyOnWriteDict sharing the data of the result_obj
+        """
+        return Result(
+            result_obj=CopyOnWriteDict(self.result_obj), is_error=self.is_error, err_msg=self.err_msg, stop=self.stop,
+            override_success_task=self.override_success_task, override_err_task=self.override_err_task
+        )
+
 
 class SessionPersistence:
     """
@@ -79,27 +365,42 @@ class SessionPersistence:
         """
         raise Exception("Your session persistance implementation must override this method.")
 
+    def delete_session_data(self):
+        """
+        Delete the saved session for the session_token that was set during initialisation
+        :return: bool True if a session was deleted
+        """
+        raise Exception("Your session persistance implementation must override this method.")
+
 
 class FileBasedSessionPersistence(SessionPersistence):
     """
-    A generic file based SessionPersistence implementation
+    A generic file based SessionPersistence implementation. The files are managed by a FileSessionStore (see
+    pytaskflow.session_store): writes are atomic, data is pickled with the highest protocol and compressed when large,
+    and files are sharded over sub directories of the store's root directory.
     """
-    def __init__(self, session_token, session_data=None):
+    def __init__(self, session_token, session_data=None, store=None):
         """
         Initialise the SessionPersistence object.
         :param session_token: str (see SessionPersistence)
         :param session_data: object (see SessionPersistence)
+        :param store: FileSessionStore to use (optional). By default all instances share one store in TEMP_DIR
         """
         self.can_persist = True
         if session_token is None:
             self.can_persist = False
-        filename = TEMP_DIR + os.sep + session_token + ".pickle"
-        super(FileBasedSessionPersistence, self).__init__(filename, session_data)
+        if store is None:
+            store = get_default_file_session_store()
+        self.store = store
+        self.filename = None
+        if self.can_persist:
+            self.filename = store.path_for(session_token)
+        super(FileBasedSessionPersistence, self).__init__(session_token, session_data)
 
     def get_session_data(self):
         try:
             if self.can_persist:
-                return pickle.load(open(self.session_token, "rb"))
+                return self.store.load(self.session_token)
         except:
             warnings.warn("EXCEPTION: %s" % traceback.format_exc())
         return None
@@ -107,36 +408,157 @@ class FileBasedSessionPersistence(SessionPersistence):
     def save_session_data(self):
         if self.session_data is not None and self.can_persist:
             try:
-                pickle.dump(self.session_data, open(self.session_token, "wb"))
+                self.store.save(self.session_token, self.session_data)
                 return True
             except:
                 warnings.warn("EXCEPTION: %s" % traceback.format_exc())
         return False
 
+    def delete_session_data(self):
+        if self.can_persist:
+            try:
+                return self.store.delete(self.session_token)
+            except:
+                warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+        return False
+
+
+_default_file_session_store = None
+
+
+def get_default_file_session_store():
+    """
+    Get the FileSessionStore used by FileBasedSessionPersistence when no store is given, in TEMP_DIR
+    :return: FileSessionStore
+    """
+    global _default_file_session_store
+    if _default_file_session_store is None:
+        from pytaskflow.session_store import FileSessionStore
+        _default_file_session_store = FileSessionStore(root_dir=os.path.join(TEMP_DIR, 'pytaskflow-sessions'))
+    return _default_file_session_store
+
 
 class Function:
     """
-    Base class for Function implementation. You need to override the execute() method and set self.result
+    Base class for Function implementation. You need to override the execute() method and either return the Result
+    or set self.result
+
+    self.result is kept per thread, so the same Function instance can be executed by several threads at the same time
+    without their results bleeding into each other.
     """
     def __init__(self):
         self.result = Result(result_obj={})
 
+    @property
+    def result(self):
+        """
+        The Result set by the last call to execute() on the current thread
+        """
+        return getattr(self._get_thread_state(), 'result', None)
+
+    @result.setter
+    def result(self, value):
+        self._get_thread_state().result = value
+
+    def _get_thread_state(self):
+        state = self.__dict__.get('_thread_state')
+        if state is None:
+            state = self.__dict__.setdefault('_thread_state', threading.local())
+        return state
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_thread_state', None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
     def execute(self, input_result=Result(result_obj={}), globals_dict={}):
         """
         Method you need to override.
         :param input_result: Result containing input parameters
         :param globals_dict: dict containing named global variables/classes/methods
-        :return: nothing is returned by this method - you need to set self.result
+        :return: Result, or None if the implementation set self.result instead
         """
         self.result = Result(result_obj={})
         raise Exception("This must be overriden by your implementation")
 
 
+class AsyncFunction(Function):
+    """
+    Base class for Function implementations that wait on I/O. Override the coroutine execute() and return the Result.
+
+    Several runs of the same AsyncFunction can be active on one event loop at the same time, so the Result must be
+    returned - self.result is not used.
+    """
+    async def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        """
+        Coroutine you need to override.
+        :param input_result: Result containing input parameters
+        :param globals_dict: dict containing named global variables/classes/methods
+        :return: Result
+        """
+        raise Exception("This must be overriden by your implementation")
+
+
+class BatchFunction(Function):
+    """
+    Base class for Function implementations that process many records per call, for example with NumPy. Override
+    execute_batch(): it gets the input Results of the records that reached the Task together and returns one Result
+    per record, in the same order.
+
+    Set columns to a tuple of result_obj keys to get a pytaskflow.columns.ResultColumns view of the inputs instead of
+    the list of Results - one column per key, a NumPy array when NumPy is installed.
+
+    WorkFlow.run_workflow_batch(), run_many() and stream() group the records waiting at a Task with a BatchFunction
+    and call execute_batch() once per group. Every record still moves on according to its own Result. Other runs call
+    execute_batch() with a single record.
+    """
+    columns = None
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return self.run_batch(input_results=[input_result], globals_dict=globals_dict)[0]
+
+    def execute_batch(self, input_results, globals_dict={}):
+        """
+        Method you need to override.
+        :param input_results: list of Result containing input parameters, or a ResultColumns if columns is set
+        :param globals_dict: dict containing named global variables/classes/methods
+        :return: list with a Result for every input, in input order
+        """
+        raise Exception("This must be overriden by your implementation")
+
+    def run_batch(self, input_results, globals_dict={}):
+        """
+        Call execute_batch() for a list of input Results and check what it returned
+        :param input_results: list of Result
+        :param globals_dict: dict containing named global variables/classes/methods
+        :return: list of Result in input order
+        """
+        batch = input_results
+        if self.columns is not None:
+            from pytaskflow.columns import ResultColumns
+            batch = ResultColumns(results=input_results, names=self.columns)
+        results = self.execute_batch(input_results=batch, globals_dict=globals_dict)
+        if results is None or len(results) != len(input_results):
+            raise Exception("execute_batch() must return one Result per input")
+        for result in results:
+            if not isinstance(result, Result):
+                raise Exception("function result was not of type Result!")
+        return list(results)
+
+
 class Task:
     """
     A Task contains a function to execute as well as the next Task to move to after the Function is successfully
     executed. You can also set an error Task to execute should the function set the Result as an error.
+
+    A subclass that overrides execute_function() and sets takes_run to True is called with a run keyword argument:
+    the RunState of the run it is executed in (None when it is called outside of a WorkFlowExecutor).
     """
+    takes_run = False
+
     def __init__(self, task_name):
         """
         Initializes the task
@@ -147,6 +569,8 @@ class Task:
         self.success_task = None
         self.err_task = None
         self.task_result = None
+        self.globals_dict = {}
+        self.policy = None
 
     def register_function(self, function, success_task, err_task, globals_dict={}):
         """
@@ -178,50 +602,817 @@ class Task:
 
         self.globals_dict = globals_dict
 
+    def set_policy(self, policy):
+        """
+        Set the TaskPolicy (see pytaskflow.policy) the executor enforces for this Task: timeout, retries and circuit
+        breaking. Set it before the WorkFlow is compiled.
+        :param policy: TaskPolicy, or None to remove the policy
+        """
+        self.policy = policy
+
     def run_task(self, input_result=Result(result_obj={})):
         """
-        Executes the Function and optionally run the Task set on success or failure of the Function
+        Executes the Function and optionally run the Task set on success or failure of the Function. The chain of
+        Tasks that follows is driven by a WorkFlowExecutor, so the length of the chain is not bound by the Python
+        recursion limit.
         :param input_result: Result containing the input parameters
         :return: nothing is returned, but rather self.task_result is set
         """
-        self.function.execute(input_result=input_result, globals_dict=self.globals_dict)
-        if not isinstance(self.function.result, Result):
+        self.task_result = WorkFlowExecutor().run(starter_task=self, input_result=input_result)
+
+    def execute_function(self, input_result):
+        """
+        Executes only the Function registered with this Task, without moving on to any next Task
+        :param input_result: Result containing the input parameters
+        :return: Result produced by the Function. Raises an Exception for an AsyncFunction when called from a thread
+        that is running an event loop
+        """
+        if isinstance(self.function, AsyncFunction):
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # Outside of run_workflow_async() an AsyncFunction gets its own short lived event loop
+                return asyncio.run(self.execute_function_async(input_result=input_result))
+            raise Exception(
+                "Task {} has an AsyncFunction and was run synchronously from a running event loop - use "
+                "run_workflow_async() there".format(self.task_name)
+            )
+        result = self.function.execute(input_result=input_result, globals_dict=self.globals_dict)
+        if result is None:
+            result = self.function.result
+        if not isinstance(result, Result):
+            raise Exception("function result was not of type Result!")
+        return result
+
+    async def execute_function_async(self, input_result, loop_executor=None):
+        """
+        Executes only the Function registered with this Task from a coroutine. An AsyncFunction is awaited directly
+        while a normal Function is offloaded to loop_executor so that it does not block the event loop.
+        :param input_result: Result containing the input parameters
+        :param loop_executor: concurrent.futures.Executor for normal Functions (optional, the loop default is used if
+        not supplied)
+        :return: Result produced by the Function
+        """
+        if not isinstance(self.function, AsyncFunction):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(loop_executor, functools.partial(self.execute_function, input_result))
+        result = await self.function.execute(input_result=input_result, globals_dict=self.globals_dict)
+        if not isinstance(result, Result):
+            raise Exception("function result was not of type Result!")
+        return result
+
+    def get_child_tasks(self):
+        """
+        List the Tasks this Task can statically move on to: the success_task, the err_task and any Task in the
+        globals_dict (those are typically used as override targets)
+        :return: list of Task
+        """
+        child_tasks = [self.success_task, self.err_task]
+        if isinstance(self.globals_dict, dict):
+            child_tasks += [value for value in self.globals_dict.values() if isinstance(value, Task)]
+        return [task for task in child_tasks if task is not None]
+
+    def select_next_task(self, result):
+        """
+        Determine the Task to execute after this Task produced the given Result. Overrides set in the Result take
+        precedence over the registered success_task and err_task and are cleared once the next Task is selected.
+        :param result: Result produced by this Task's Function
+        :return: Task to execute next, or None if the chain ends here
+        """
+        if result.is_error:
+            next_task = self.err_task
+            if isinstance(result.override_err_task, Task):
+                next_task = result.override_err_task
+            if next_task is None:
+                return None
+        else:
+            if result.stop:
+                return None
+            next_task = self.success_task
+            if isinstance(result.override_success_task, Task):
+                next_task = result.override_success_task
+        result.override_err_task = None
+        result.override_success_task = None
+        return next_task
+
+
+class WorkFlowCompileError(Exception):
+    """
+    Raised by WorkFlow.compile() when the Task graph is not valid
+    """
+    def __init__(self, workflow_name, problems):
+        """
+        :param workflow_name: str with the WorkFlow name
+        :param problems: list of str describing every problem that was found
+        """
+        self.workflow_name = workflow_name
+        self.problems = problems
+        super(WorkFlowCompileError, self).__init__(
+            'WorkFlow {} failed to compile:\n\t{}'.format(workflow_name, '\n\t'.join(problems))
+        )
+
+
+class DispatchEntry:
+    """
+    Everything the executor needs to run a Task, worked out once. A Task that overrides execute_function() (like a
+    ParallelTask) is called through that method, otherwise the Function's execute() is called directly.
+
+    is_batch is True when the Task's BatchFunction can be called for several records at once with execute_batch().
+    takes_run is True when the Task gets the RunState of the run (see Task.takes_run).
+    rank is the position of the Task in a topological order of its CompiledWorkFlow (None for a Task outside the graph).
+    """
+    __slots__ = ('task_id', 'task', 'task_name', 'success_task', 'err_task', 'success_entry', 'err_entry', 'function',
+                 'is_async', 'uses_task_call', 'takes_run', 'is_batch', 'rank', '_function_execute', '_globals_dict')
+
+    def __init__(self, task_id, task):
+        """
+        :param task_id: int with the ID of the Task in its CompiledWorkFlow (-1 for a Task outside the graph)
+        :param task: Task
+        """
+        self.task_id = task_id
+        self.task = task
+        self.task_name = task.task_name
+        self.rank = None
+        self.success_task = task.success_task
+        self.err_task = task.err_task
+        self.success_entry = None
+        self.err_entry = None
+        self.function = task.function
+        self.is_async = isinstance(task.function, AsyncFunction)
+        self.uses_task_call = type(task).execute_function is not Task.execute_function or self.is_async
+        self.takes_run = self.uses_task_call and getattr(task, 'takes_run', False)
+        self._function_execute = None
+        if not self.uses_task_call:
+            self._function_execute = task.function.execute
+        self._globals_dict = task.globals_dict
+        # Entries that wrap execute() (like the entry of a Task with a policy) run every record on its own
+        self.is_batch = (
+            isinstance(task.function, BatchFunction) and not self.uses_task_call and type(self).execute is DispatchEntry.execute
+        )
+
+    def execute(self, input_result, run=None):
+        """
+        Execute the Task's Function
+        :param input_result: Result containing the input parameters
+        :param run: RunState of the run, passed on to a Task that takes it (optional)
+        :return: Result produced by the Function
+        """
+        if self.uses_task_call:
+            if self.takes_run:
+                return self.task.execute_function(input_result=input_result, run=run)
+            return self.task.execute_function(input_result=input_result)
+        result = self._function_execute(input_result=input_result, globals_dict=self._globals_dict)
+        if result is None:
+            result = self.function.result
+        if result.__class__ is not Result and not isinstance(result, Result):
             raise Exception("function result was not of type Result!")
-        if self.function.result.is_error:
-            err_task_to_exec = None
-            if self.err_task is not None:
-                err_task_to_exec = self.err_task
-            if self.function.result.override_err_task is not None:
-                if isinstance(self.function.result.override_err_task, Task):
-                    err_task_to_exec = self.function.result.override_err_task
-            if err_task_to_exec is not None:
-                res = self.function.result
-                res.override_err_task = None
-                res.override_success_task = None
-                err_task_to_exec.run_task(input_result=res)
-                if not isinstance(err_task_to_exec.task_result, Result):
-                    self.task_result = Result(result_obj={}, is_error=True, err_msg='Task {} produced an error by the error task {} did not set a valid Result'.format(self.task_name, err_task_to_exec.task_name))
+        return result
+
+    def execute_batch(self, input_results):
+        """
+        Execute the Task's BatchFunction for several records with one call. Only for entries where is_batch is True.
+        :param input_results: list of Result containing the input parameters of every record
+        :return: list of Result in input order
+        """
+        return self.function.run_batch(input_results=input_results, globals_dict=self._globals_dict)
+
+    async def execute_async(self, input_result, loop_executor=None, run=None):
+        """
+        Coroutine version of execute(). Normal Functions are offloaded to loop_executor.
+        :param input_result: Result containing the input parameters
+        :param loop_executor: concurrent.futures.Executor for normal Functions (optional)
+        :param run: RunState of the run, passed on to a Task that takes it (optional)
+        :return: Result produced by the Function
+        """
+        if self.uses_task_call:
+            if self.takes_run:
+                return await self.task.execute_function_async(input_result=input_result, loop_executor=loop_executor, run=run)
+            return await self.task.execute_function_async(input_result=input_result, loop_executor=loop_executor)
+        return await asyncio.get_running_loop().run_in_executor(loop_executor, self.execute, input_result)
+
+
+def new_dispatch_entry(task_id, task):
+    """
+    Create the DispatchEntry for a Task - a Task with a policy gets the entry its policy provides
+    :param task_id: int with the ID of the Task in its CompiledWorkFlow (-1 for a Task outside the graph)
+    :param task: Task
+    :return: DispatchEntry
+    """
+    policy = getattr(task, 'policy', None)
+    if policy is not None:
+        return policy.new_entry(task_id=task_id, task=task)
+    return DispatchEntry(task_id=task_id, task=task)
+
+
+class CompiledWorkFlow:
+    """
+    A validated, flattened view of a WorkFlow's Task graph. Every reachable Task gets an integer ID and a DispatchEntry
+    and the executor routes from entry to entry with a single dictionary lookup per step.
+
+    Tasks that are not part of the graph (for example a Task created inside a Function and set as override target)
+    still work - they get a DispatchEntry on the fly.
+    """
+    def __init__(self, workflow_name, starter_task, tasks=None, allow_cycles=True):
+        """
+        Walk and validate the graph
+        :param workflow_name: str with the WorkFlow name
+        :param starter_task: Task to start the WorkFlow, or None for an empty graph that only dispatches on the fly
+        :param tasks: list of Task that are expected to be reachable from the starter_task (optional)
+        :param allow_cycles: bool. If False, any cycle through success_task/err_task edges is a compile error
+        """
+        self.workflow_name = workflow_name
+        self.entries = ()
+        self.cycles = []
+        self._entries_by_task_id = {}
+        self.starter = None
+        if starter_task is None:
+            return
+        problems = []
+        ordered_tasks = self._walk(starter_task=starter_task, problems=problems)
+        for task in ordered_tasks:
+            problems += self._validate_task(task)
+        if tasks is not None:
+            reachable = set(id(task) for task in ordered_tasks)
+            for task in tasks:
+                if id(task) not in reachable:
+                    problems.append('Task {} is not reachable from the starter Task'.format(task.task_name))
+        self.cycles = self._find_cycles(ordered_tasks)
+        if not allow_cycles:
+            for cycle in self.cycles:
+                problems.append('Cycle detected: {}'.format(' -> '.join(task.task_name for task in cycle)))
+        if len(problems) > 0:
+            raise WorkFlowCompileError(workflow_name=workflow_name, problems=problems)
+        self.entries = tuple(new_dispatch_entry(task_id=task_id, task=task) for task_id, task in enumerate(ordered_tasks))
+        self._entries_by_task_id = dict((id(entry.task), entry) for entry in self.entries)
+        ranks = self._rank(starter_task)
+        for entry in self.entries:
+            entry.rank = ranks[id(entry.task)]
+            if entry.success_task is not None:
+                entry.success_entry = self._entries_by_task_id[id(entry.success_task)]
+            if entry.err_task is not None:
+                entry.err_entry = self._entries_by_task_id[id(entry.err_task)]
+        self.starter = self.entries[0]
+
+    def __getstate__(self):
+        # Entries are looked up by id(task), which is different once unpickled
+        state = self.__dict__.copy()
+        state.pop('_entries_by_task_id')
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._entries_by_task_id = dict((id(entry.task), entry) for entry in self.entries)
+
+    def _walk(self, starter_task, problems):
+        ordered_tasks = []
+        seen = set()
+        to_visit = [starter_task]
+        while len(to_visit) > 0:
+            task = to_visit.pop()
+            if id(task) in seen:
+                continue
+            seen.add(id(task))
+            ordered_tasks.append(task)
+            for attribute in ('success_task', 'err_task'):
+                child_task = getattr(task, attribute)
+                if child_task is not None and not isinstance(child_task, Task):
+                    problems.append('{} of Task {} is not of type Task'.format(attribute, task.task_name))
+            child_tasks = [child_task for child_task in task.get_child_tasks() if isinstance(child_task, Task)]
+            to_visit += reversed(child_tasks)
+        return ordered_tasks
+
+    def _rank(self, starter_task):
+        """
+        Reverse postorder of a depth-first walk over every Task a Result can move on to - a topological order when the
+        graph has no loops, so a Task comes after every Task that can lead to it. Used to group records in
+        WorkFlowExecutor.run_batch()
+        :return: dict of id(task): rank
+        """
+        postorder = []
+        seen = set([id(starter_task)])
+        work = [(starter_task, iter(starter_task.get_child_tasks()))]
+        while len(work) > 0:
+            task, child_tasks = work[-1]
+            child_task = next(child_tasks, None)
+            if child_task is None:
+                work.pop()
+                postorder.append(task)
+            elif isinstance(child_task, Task) and id(child_task) not in seen:
+                seen.add(id(child_task))
+                work.append((child_task, iter(child_task.get_child_tasks())))
+        return dict((id(task), rank) for rank, task in enumerate(reversed(postorder)))
+
+    def _validate_task(self, task):
+        if type(task).execute_function is not Task.execute_function:
+            return []
+        if task.function is None:
+            return ['Task {} has no Function registered'.format(task.task_name)]
+        if not isinstance(task.function, Function):
+            return ['The function of Task {} is not of type Function'.format(task.task_name)]
+        return []
+
+    def _find_cycles(self, ordered_tasks):
+        """
+        Tarjan's strongly connected components over the success_task and err_task edges, without recursion
+        """
+        index_of = {}
+        low_link = {}
+        on_stack = set()
+        stack = []
+        cycles = []
+        counter = 0
+        for root in ordered_tasks:
+            if id(root) in index_of:
+                continue
+            work = [(root, iter(self._static_edges(root)))]
+            index_of[id(root)] = low_link[id(root)] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(id(root))
+            while len(work) > 0:
+                task, edges = work[-1]
+                child_task = next(edges, None)
+                if child_task is not None:
+                    if id(child_task) not in index_of:
+                        index_of[id(child_task)] = low_link[id(child_task)] = counter
+                        counter += 1
+                        stack.append(child_task)
+                        on_stack.add(id(child_task))
+                        work.append((child_task, iter(self._static_edges(child_task))))
+                    elif id(child_task) in on_stack:
+                        low_link[id(task)] = min(low_link[id(task)], index_of[id(child_task)])
+                    continue
+                work.pop()
+                if len(work) > 0:
+                    parent = work[-1][0]
+                    low_link[id(parent)] = min(low_link[id(parent)], low_link[id(task)])
+                if low_link[id(task)] == index_of[id(task)]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(id(member))
+                        component.append(member)
+                        if member is task:
+                            break
+                    if len(component) > 1 or task in self._static_edges(task):
+                        cycles.append(list(reversed(component)))
+        return cycles
+
+    def _static_edges(self, task):
+        return [child_task for child_task in (task.success_task, task.err_task) if isinstance(child_task, Task)]
+
+    def entry_for(self, task):
+        """
+        Get the DispatchEntry for a Task, creating one on the fly for a Task that is not part of the graph
+        :param task: Task
+        :return: DispatchEntry
+        """
+        entry = self._entries_by_task_id.get(id(task))
+        if entry is None:
+            entry = new_dispatch_entry(task_id=-1, task=task)
+        return entry
+
+    def next_entry(self, entry, result):
+        """
+        Determine the DispatchEntry to execute after entry produced the given Result, with the same rules as
+        Task.select_next_task()
+        :param entry: DispatchEntry that was executed
+        :param result: Result it produced
+        :return: DispatchEntry, or None if the chain ends here
+        """
+        if result.is_error:
+            override = result.override_err_task
+            next_task = entry.err_task
+            next_entry = entry.err_entry
+        else:
+            if result.stop:
+                return None
+            override = result.override_success_task
+            next_task = entry.success_task
+            next_entry = entry.success_entry
+        if override is not None:
+            override_entry = self._entries_by_task_id.get(id(override))
+            if override_entry is not None:
+                next_entry = override_entry
+            elif isinstance(override, Task):
+                next_entry = self.entry_for(override)
+        if next_entry is None:
+            if next_task is None:
+                if not result.is_error:
+                    result.override_err_task = None
+                    result.override_success_task = None
+                return None
+            next_entry = self._successor_entry(entry, next_task, result.is_error)
+        result.override_err_task = None
+        result.override_success_task = None
+        return next_entry
+
+    def _successor_entry(self, entry, next_task, is_error):
+        # The DispatchEntry of a success_task or err_task that is not linked to entry
+        return self.entry_for(next_task)
+
+
+class _RunLocalGraph(CompiledWorkFlow):
+    """
+    Dispatch for a WorkFlow that was not compiled: DispatchEntries are created on first use and linked to the entry
+    that led to them, so for the rest of the run a step is dispatched like in a compiled WorkFlow
+    """
+    MAX_ENTRIES = 1024
+
+    def __init__(self):
+        super(_RunLocalGraph, self).__init__(workflow_name=None, starter_task=None)
+
+    def entry_for(self, task):
+        entry = self._entries_by_task_id.get(id(task))
+        if entry is None:
+            if len(self._entries_by_task_id) >= self.MAX_ENTRIES:
+                self._entries_by_task_id.clear()
+            entry = new_dispatch_entry(task_id=-1, task=task)
+            self._entries_by_task_id[id(task)] = entry
+        return entry
+
+    def _successor_entry(self, entry, next_task, is_error):
+        next_entry = self.entry_for(next_task)
+        if is_error:
+            entry.err_entry = next_entry
+        else:
+            entry.success_entry = next_entry
+        return next_entry
+
+
+class ExecutionContext:
+    """
+    Holds the state of a single WorkFlow run. Every run gets its own context, so nothing about a run is stored on the
+    (shared) Task and Function objects and one WorkFlow can serve many concurrent runs.
+    """
+    def __init__(self, workflow_name=None, run_id=None, max_trace_length=1000, session_token=None):
+        """
+        Initialize the ExecutionContext
+        :param workflow_name: str with the name of the WorkFlow being run (optional)
+        :param run_id: str that uniquely identifies the run. A random ID is generated if not supplied
+        :param max_trace_length: int with the number of most recent Task names to keep in the trace
+        :param session_token: str to save checkpoints of the run under (optional, see pytaskflow.checkpoint)
+        """
+        self.workflow_name = workflow_name
+        self.session_token = session_token
+        self.run_id = run_id
+        if self.run_id is None:
+            self.run_id = uuid.uuid4().hex
+        self.results = {}
+        self.trace = collections.deque(maxlen=max_trace_length)
+        self.step_count = 0
+        self.result = None
+        self.parent = None
+        # Number of parents: 0 for the context of a run, 1 or more for the context of a part of a run
+        self.depth = 0
+        # Identifies what a child context runs, for example the registry and name of a sub-workflow
+        self.source = None
+
+    def new_child(self, workflow_name=None, source=None):
+        """
+        Create the context of a part of this run that is executed on its own, like a parallel branch or a
+        sub-workflow. It shares the run ID, but not the session_token: checkpoints are only saved between the steps of
+        the run itself. Merge it back with merge_child() when the part finished.
+        :param workflow_name: str with the name of the WorkFlow the part runs (default: the name of this context)
+        :param source: hashable identifying what the part runs (optional)
+        :return: ExecutionContext whose parent is this context
+        """
+        child = ExecutionContext(
+            workflow_name=workflow_name if workflow_name is not None else self.workflow_name, run_id=self.run_id,
+            max_trace_length=self.trace.maxlen
+        )
+        child.parent = self
+        child.depth = self.depth + 1
+        child.source = source
+        return child
+
+    def merge_child(self, child):
+        """
+        Add the steps recorded in a context created with new_child() to this run
+        :param child: ExecutionContext
+        """
+        self.step_count += child.step_count
+        self.trace.extend(child.trace)
+        self.results.update(child.results)
+
+    def record_step(self, task, result):
+        """
+        Record the Result produced by a Task during this run
+        :param task: Task that was executed
+        :param result: Result the Task produced
+        """
+        self.step_count += 1
+        self.trace.append(task.task_name)
+        self.results[task.task_name] = result
+        self.result = result
+
+
+class RunState:
+    """
+    The run a Task is executed in, handed to Tasks that set takes_run (like a ParallelTask or a SubWorkFlowTask) so
+    the Tasks they run themselves are part of the same run
+    """
+    __slots__ = ('executor', 'context', 'graph')
+
+    def __init__(self, executor, context, graph):
+        """
+        :param executor: WorkFlowExecutor running the Task
+        :param context: ExecutionContext of the run (None if the run is not recorded)
+        :param graph: CompiledWorkFlow the run dispatches with
+        """
+        self.executor = executor
+        self.context = context
+        self.graph = graph
+
+
+class WorkFlowExecutor:
+    """
+    Drives a chain of Tasks with an explicit loop instead of recursion. Only the current Task and Result are held
+    while running, so a WorkFlow runs in constant stack depth and memory regardless of the number of steps.
+
+    The executor itself holds no run state - that lives in the ExecutionContext - so one executor can be used by many
+    threads at the same time.
+
+    Instrumentation hooks (see pytaskflow.instrumentation) added with add_hook() are called around every Task. Without
+    hooks the only cost is one check per step.
+    """
+    def __init__(self):
+        self.hooks = []
+        self.checkpointer = None
+
+    def add_hook(self, hook):
+        """
+        Add an instrumentation hook. Safe to call while runs are in progress - they pick up the change on the next run.
+        :param hook: Instrumentation
+        """
+        self.hooks = self.hooks + [hook]
+
+    def remove_hook(self, hook):
+        """
+        Remove an instrumentation hook added with add_hook()
+        :param hook: Instrumentation
+        """
+        self.hooks = [existing for existing in self.hooks if existing is not hook]
+
+    def _get_checkpointer(self, context):
+        if self.checkpointer is None or context is None or context.session_token is None:
+            return None
+        return self.checkpointer
+
+    def _call_hooks(self, hooks, method_name, event):
+        for hook in hooks:
+            try:
+                getattr(hook, method_name)(event)
+            except Exception:
+                warnings.warn("EXCEPTION in instrumentation hook: %s" % traceback.format_exc())
+
+    def _new_event(self, entry, context, input_result):
+        if context is None:
+            return TaskEvent(run_id=None, workflow_name=None, task_name=entry.task_name, task_id=entry.task_id,
+                             input_result=input_result)
+        return TaskEvent(run_id=context.run_id, workflow_name=context.workflow_name, task_name=entry.task_name,
+                         task_id=entry.task_id, input_result=input_result, depth=context.depth)
+
+    def _finish_event(self, hooks, event, result, exception):
+        event.result = result
+        event.exception = exception
+        event.result_size = 0
+        if result is not None and hasattr(result.result_obj, '__len__'):
+            event.result_size = len(result.result_obj)
+        self._call_hooks(hooks, 'after_task', event)
+        if event.is_error:
+            self._call_hooks(hooks, 'on_error', event)
+
+    def _execute_instrumented(self, hooks, entry, input_result, context, graph):
+        event = self._new_event(entry, context, input_result)
+        self._call_hooks(hooks, 'before_task', event)
+        wall_started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            if entry.takes_run:
+                result = entry.execute(input_result, run=RunState(self, context, graph))
+            else:
+                result = entry.execute(input_result)
+        except Exception as e:
+            event.wall_time = time.perf_counter() - wall_started
+            event.cpu_time = time.thread_time() - cpu_started
+            self._finish_event(hooks, event, result=None, exception=e)
+            raise
+        event.wall_time = time.perf_counter() - wall_started
+        event.cpu_time = time.thread_time() - cpu_started
+        self._finish_event(hooks, event, result=result, exception=None)
+        return result
+
+    async def _execute_instrumented_async(self, hooks, entry, input_result, context, loop_executor, graph):
+        event = self._new_event(entry, context, input_result)
+        self._call_hooks(hooks, 'before_task', event)
+        wall_started = time.perf_counter()
+        try:
+            if entry.takes_run:
+                result = await entry.execute_async(input_result, loop_executor=loop_executor, run=RunState(self, context, graph))
+            else:
+                result = await entry.execute_async(input_result, loop_executor=loop_executor)
+        except Exception as e:
+            event.wall_time = time.perf_counter() - wall_started
+            self._finish_event(hooks, event, result=None, exception=e)
+            raise
+        event.wall_time = time.perf_counter() - wall_started
+        self._finish_event(hooks, event, result=result, exception=None)
+        return result
+
+    def _execute_batch_instrumented(self, hooks, entry, input_results, contexts):
+        # Every record gets its own event, with an equal share of the time of the batch call
+        events = [self._new_event(entry, context, input_result) for input_result, context in zip(input_results, contexts)]
+        for event in events:
+            self._call_hooks(hooks, 'before_task', event)
+        wall_started = time.perf_counter()
+        cpu_started = time.thread_time()
+        try:
+            results = entry.execute_batch(input_results)
+        except Exception as e:
+            results = None
+            exception = e
+        else:
+            exception = None
+        wall_time = (time.perf_counter() - wall_started) / len(events)
+        cpu_time = (time.thread_time() - cpu_started) / len(events)
+        for index, event in enumerate(events):
+            event.wall_time = wall_time
+            event.cpu_time = cpu_time
+            self._finish_event(hooks, event, result=None if results is None else results[index], exception=exception)
+        if exception is not None:
+            raise exception
+        return results
+
+    def execute_batch_step(self, entry, input_results, contexts, graph):
+        """
+        Execute one Task with a BatchFunction for several records with a single execute_batch() call and work out
+        where each record goes next, exactly like execute_step() does for one record
+        :param entry: DispatchEntry to execute (is_batch must be True)
+        :param input_results: list of Result with the input of every record
+        :param contexts: list with the ExecutionContext (or None) of every record
+        :param graph: CompiledWorkFlow the entry belongs to
+        :return: list of (Result, next DispatchEntry) tuples in input order
+        """
+        hooks = self.hooks
+        if hooks:
+            results = self._execute_batch_instrumented(hooks, entry, input_results, contexts)
+        else:
+            results = entry.execute_batch(input_results)
+        steps = []
+        for result, context in zip(results, contexts):
+            if context is not None:
+                context.record_step(task=entry.task, result=result)
+            next_entry = graph.next_entry(entry, result)
+            checkpointer = self._get_checkpointer(context)
+            if checkpointer is not None:
+                checkpointer.after_step(context, graph, next_entry, result)
+            steps.append((result, next_entry))
+        return steps
+
+    def run_batch(self, starter_task, input_results, contexts=None, graph=None):
+        """
+        Run Tasks for many records at once. The records move through the graph together: the records waiting at a
+        Task with a BatchFunction are executed with one execute_batch() call, other Tasks run record by record, and
+        every record follows its own Results exactly as in run(). Tasks are visited in graph order, so records that
+        take different paths meet again at the Tasks they share: the waiting records at the Task with the lowest rank
+        (see CompiledWorkFlow._rank()) run first, so without loops a Task runs once every record that can still reach
+        it got there.
+
+        An exception ends the run of the record that raised it with an error Result, like
+        pytaskflow.batch.run_one() - or of every record of the batch, when execute_batch() raised.
+        :param starter_task: Task to start with
+        :param input_results: list of Result with the input of every record
+        :param contexts: list with an ExecutionContext to record the run of every record in (optional)
+        :param graph: CompiledWorkFlow to dispatch with (optional)
+        :return: list with the Result of the last executed Task of every record, in input order
+        """
+        if graph is None:
+            graph = _RunLocalGraph()
+        results = list(input_results)
+        if contexts is None:
+            contexts = [None] * len(results)
+        if len(results) == 0:
+            return results
+        last_rank = len(graph.entries)
+        entry = graph.entry_for(starter_task)
+        # id(task) -> (DispatchEntry, indexes of the records waiting at it)
+        waiting = {id(entry.task): (entry, list(range(len(results))))}
+        while waiting:
+            key = min(waiting, key=lambda key: waiting[key][0].rank if waiting[key][0].rank is not None else last_rank)
+            entry, indexes = waiting.pop(key)
+            if entry.is_batch:
+                try:
+                    steps = self.execute_batch_step(
+                        entry, [results[index] for index in indexes], [contexts[index] for index in indexes], graph
+                    )
+                except Exception:
+                    err_msg = traceback.format_exc()
+                    steps = [(Result(result_obj={}, is_error=True, err_msg=err_msg), None) for _ in indexes]
+            else:
+                steps = []
+                for index in indexes:
+                    try:
+                        steps.append(self.execute_step(
+                            entry, results[index], contexts[index], graph, self._get_checkpointer(contexts[index])
+                        ))
+                    except Exception:
+                        steps.append((Result(result_obj={}, is_error=True, err_msg=traceback.format_exc()), None))
+            for index, (result, next_entry) in zip(indexes, steps):
+                results[index] = result
+                if next_entry is None:
+                    continue
+                group = waiting.get(id(next_entry.task))
+                if group is None:
+                    waiting[id(next_entry.task)] = (next_entry, [index])
                 else:
-                    self.task_result = err_task_to_exec.task_result
+                    group[1].append(index)
+        return results
+
+    def execute_step(self, entry, input_result, context, graph, checkpointer=None):
+        """
+        Execute one Task and work out where the run goes next, exactly like one turn of the loop in run(). Used by
+        code that drives runs itself, like WorkFlow.stream().
+        :param entry: DispatchEntry to execute
+        :param input_result: Result containing the input parameters
+        :param context: ExecutionContext of the run (optional)
+        :param graph: CompiledWorkFlow the entry belongs to
+        :param checkpointer: Checkpointer (optional, see _get_checkpointer())
+        :return: tuple with the Result and the DispatchEntry to execute next (None if the run finished)
+        """
+        hooks = self.hooks
+        if hooks:
+            result = self._execute_instrumented(hooks, entry, input_result, context, graph)
+        elif entry.takes_run:
+            result = entry.execute(input_result, run=RunState(self, context, graph))
         else:
-            if not self.function.result.stop:
-                task_to_exec = None
-                if self.success_task is not None:
-                    task_to_exec = self.success_task
-                if self.function.result.override_success_task is not None:
-                    if isinstance(self.function.result.override_success_task, Task):
-                        task_to_exec = self.function.result.override_success_task
-                res = self.function.result
-                res.override_err_task = None
-                res.override_success_task = None
-                if task_to_exec is not None:
-                    task_to_exec.run_task(input_result=res)
-                    if isinstance(task_to_exec.task_result, Result):
-                        self.task_result = task_to_exec.task_result
-                    else:
-                        self.task_result = self.function.result
-        if self.task_result is None:
-            self.task_result = self.function.result
+            result = entry.execute(input_result)
+        if context is not None:
+            context.record_step(task=entry.task, result=result)
+        next_entry = graph.next_entry(entry, result)
+        if checkpointer is not None:
+            checkpointer.after_step(context, graph, next_entry, result)
+        return result, next_entry
+
+    def run(self, starter_task, input_result, context=None, graph=None):
+        """
+        Run Tasks, starting with starter_task, until a Task stops the chain or has no next Task to execute
+        :param starter_task: Task to start with
+        :param input_result: Result containing the input parameters for the starter_task
+        :param context: ExecutionContext to record the run in (optional)
+        :param graph: CompiledWorkFlow to dispatch with (optional)
+        :return: Result of the last executed Task
+        """
+        if graph is None:
+            graph = _RunLocalGraph()
+        hooks = self.hooks
+        checkpointer = self._get_checkpointer(context)
+        entry = graph.entry_for(starter_task)
+        result = input_result
+        while entry is not None:
+            if hooks:
+                result = self._execute_instrumented(hooks, entry, result, context, graph)
+            elif entry.takes_run:
+                result = entry.execute(result, run=RunState(self, context, graph))
+            else:
+                result = entry.execute(result)
+            if context is not None:
+                context.record_step(task=entry.task, result=result)
+            entry = graph.next_entry(entry, result)
+            if checkpointer is not None:
+                checkpointer.after_step(context, graph, entry, result)
+        return result
+
+    async def run_async(self, starter_task, input_result, context=None, loop_executor=None, graph=None):
+        """
+        Coroutine version of run(). AsyncFunctions are awaited on the running event loop and normal Functions are
+        offloaded to loop_executor, so many runs can be multiplexed on one event loop.
+        :param starter_task: Task to start with
+        :param input_result: Result containing the input parameters for the starter_task
+        :param context: ExecutionContext to record the run in (optional)
+        :param loop_executor: concurrent.futures.Executor for normal Functions (optional)
+        :param graph: CompiledWorkFlow to dispatch with (optional)
+        :return: Result of the last executed Task
+        """
+        if graph is None:
+            graph = _RunLocalGraph()
+        hooks = self.hooks
+        checkpointer = self._get_checkpointer(context)
+        entry = graph.entry_for(starter_task)
+        result = input_result
+        while entry is not None:
+            if hooks:
+                result = await self._execute_instrumented_async(hooks, entry, result, context, loop_executor, graph)
+            elif entry.takes_run:
+                result = await entry.execute_async(result, loop_executor=loop_executor, run=RunState(self, context, graph))
+            else:
+                result = await entry.execute_async(result, loop_executor=loop_executor)
+            if context is not None:
+                context.record_step(task=entry.task, result=result)
+            entry = graph.next_entry(entry, result)
+            if checkpointer is not None:
+                checkpointer.after_step(context, graph, entry, result)
+        return result
 
 
 class WorkFlow:
@@ -239,15 +1430,175 @@ class WorkFlow:
             self.starter_task = starter_task
         else:
             raise Exception("starter_task must be of type Task")
+        self.executor = WorkFlowExecutor()
+        self.compiled = None
 
-    def run_workflow(self, input_result=Result(result_obj={})):
+    def compile(self, tasks=None, allow_cycles=True):
         """
-        Start the WorkFlow by running the starter Task
-        :param input_result: Result continaing the input parameters
+        Walk the Task graph once, validate it and build the dispatch table used by every following run. Call this
+        when the WorkFlow is built (at deploy time) so that a broken graph fails early rather than during a request.
+        Changes made to the Tasks after compiling require compile() to be called again.
+        :param tasks: list of every Task built for this WorkFlow. Any of them not reachable from the starter Task is
+        reported as a problem (optional)
+        :param allow_cycles: bool. Loops through success_task/err_task are allowed by default - set to False to
+        report them as problems
+        :return: CompiledWorkFlow, which is also kept in self.compiled
+        :raises WorkFlowCompileError: listing every problem found
+        """
+        self.compiled = CompiledWorkFlow(
+            workflow_name=self.workflow_name, starter_task=self.starter_task, tasks=tasks, allow_cycles=allow_cycles
+        )
+        return self.compiled
+
+    def new_context(self, run_id=None, session_token=None):
+        """
+        Create an ExecutionContext for a run of this WorkFlow
+        :param run_id: str with the run ID (optional)
+        :param session_token: str to save checkpoints of the run under (optional)
+        :return: ExecutionContext
+        """
+        return ExecutionContext(workflow_name=self.workflow_name, run_id=run_id, session_token=session_token)
+
+    def enable_checkpoints(self, checkpointer):
+        """
+        Save checkpoints of every run that has a session_token, so that it can be continued with resume(). The WorkFlow
+        must be compiled.
+        :param checkpointer: pytaskflow.checkpoint.Checkpointer, or None to disable checkpoints
+        """
+        if checkpointer is not None and self.compiled is None:
+            raise Exception("checkpoints require a compiled WorkFlow - call compile() first")
+        self.executor.checkpointer = checkpointer
+
+    def run_workflow(self, input_result=None, context=None, session_token=None):
+        """
+        Start the WorkFlow by running the starter Task. This method is safe to call from many threads at the same time.
+        :param input_result: Result continaing the input parameters. An empty Result is used if not supplied
+        :param context: ExecutionContext to record the run in. Pass your own to inspect the run ID, trace and per
+        Task results after the run (optional)
+        :param session_token: str to save checkpoints under when checkpoints are enabled (optional)
         :return: Result with the final result of the last executed Task
         """
-        self.starter_task.run_task(input_result=input_result)
-        return self.starter_task.task_result
+        if input_result is None:
+            input_result = Result(result_obj={})
+        if context is None:
+            context = self.new_context(session_token=session_token)
+        return self.executor.run(starter_task=self.starter_task, input_result=input_result, context=context, graph=self.compiled)
+
+    def resume(self, session_token, input_result=None, context=None):
+        """
+        Continue a run from its last checkpoint. Tasks that completed before the checkpoint are not executed again. A
+        run that already finished is not run again - its final Result is returned.
+        :param session_token: str the run was checkpointed under
+        :param input_result: Result to use as input of the next Task instead of the checkpointed Result (optional,
+        for example to pass in data of a new request)
+        :param context: ExecutionContext to continue the run in (optional). Its run ID and step count are restored
+        from the checkpoint
+        :return: Result with the final result of the last executed Task
+        """
+        checkpointer = self.executor.checkpointer
+        if checkpointer is None:
+            raise Exception("checkpoints are not enabled - call enable_checkpoints() first")
+        checkpoint = checkpointer.load(session_token)
+        if checkpoint is None:
+            raise Exception("no checkpoint found for session {}".format(session_token))
+        if checkpoint.finished:
+            return checkpoint.result
+        if checkpoint.task_id >= len(self.compiled.entries) or self.compiled.entries[checkpoint.task_id].task_name != checkpoint.task_name:
+            raise Exception("checkpoint of session {} does not match the compiled WorkFlow".format(session_token))
+        if context is None:
+            context = self.new_context(run_id=checkpoint.run_id)
+        context.run_id = checkpoint.run_id
+        context.session_token = session_token
+        context.step_count = checkpoint.step_count
+        if input_result is None:
+            input_result = checkpoint.result
+        return self.executor.run(
+            starter_task=self.compiled.entries[checkpoint.task_id].task, input_result=input_result, context=context,
+            graph=self.compiled
+        )
+
+    async def run_workflow_async(self, input_result=None, context=None, loop_executor=None):
+        """
+        Coroutine version of run_workflow(). Use it to run the WorkFlow from an asyncio event loop.
+        :param input_result: Result continaing the input parameters. An empty Result is used if not supplied
+        :param context: ExecutionContext to record the run in (optional)
+        :param loop_executor: concurrent.futures.Executor used for Functions that are not AsyncFunctions (optional,
+        the event loop's default executor is used if not supplied)
+        :return: Result with the final result of the last executed Task
+        """
+        if input_result is None:
+            input_result = Result(result_obj={})
+        if context is None:
+            context = self.new_context()
+        return await self.executor.run_async(
+            starter_task=self.starter_task, input_result=input_result, context=context, loop_executor=loop_executor,
+            graph=self.compiled
+        )
+
+    def run_workflow_batch(self, input_results, contexts=None):
+        """
+        Run the WorkFlow for a list of inputs at once. The records waiting at a Task with a BatchFunction are executed
+        with one call, while every record still follows its own Results. See WorkFlowExecutor.run_batch()
+        :param input_results: list of Result with the input parameters of every record
+        :param contexts: list with an ExecutionContext for every record (optional)
+        :return: list of Result in input order. An input that raised an exception gets an error Result
+        """
+        input_results = list(input_results)
+        if contexts is None:
+            contexts = [self.new_context() for _ in input_results]
+        graph = self.compiled
+        if graph is None:
+            # Records are grouped in graph order, so an uncompiled WorkFlow is compiled for the call
+            graph = CompiledWorkFlow(workflow_name=self.workflow_name, starter_task=self.starter_task)
+        return self.executor.run_batch(
+            starter_task=self.starter_task, input_results=input_results, contexts=contexts, graph=graph
+        )
+
+    def uses_batch_functions(self):
+        """
+        :return: bool True if a Task reachable from the starter Task has a BatchFunction, in which case run_many() and
+        stream() group records with run_workflow_batch()
+        """
+        graph = self.compiled
+        if graph is None:
+            try:
+                graph = CompiledWorkFlow(workflow_name=self.workflow_name, starter_task=self.starter_task)
+            except WorkFlowCompileError:
+                return False
+        return any(entry.is_batch for entry in graph.entries)
+
+    def run_many(self, inputs, workers=None, mode='thread', chunk_size=64, ordered=True):
+        """
+        Run the WorkFlow for many input Results on a pool of threads or processes. See pytaskflow.batch.run_many()
+        :param inputs: iterable of Result objects
+        :param workers: int with the number of workers (defaults to the number of CPUs)
+        :param mode: str, one of 'serial', 'thread' or 'process'
+        :param chunk_size: int with the number of inputs sent to a worker at a time - also the number of records a
+        BatchFunction gets per call
+        :param ordered: bool. If True, Results are yielded in input order, otherwise (index, Result) tuples are
+        yielded as they complete
+        :return: generator of Result or (index, Result) tuples. An input that raised an exception gets an error Result
+        """
+        from pytaskflow.batch import run_many
+        return run_many(workflow=self, inputs=inputs, workers=workers, mode=mode, chunk_size=chunk_size, ordered=ordered)
+
+    def stream(self, inputs, pipeline=False, queue_size=16, ordered=True, batch_size=64):
+        """
+        Run the WorkFlow over an iterable of inputs, pulling the inputs lazily and yielding Results as they finish, so
+        memory use does not depend on the number of inputs. See pytaskflow.stream.stream()
+        :param inputs: iterable of Result objects
+        :param pipeline: bool. If True, every Task runs on its own thread with a bounded queue in front of it, so
+        different Tasks work on different records at the same time
+        :param queue_size: int with the number of records each stage queue holds
+        :param ordered: bool. If True, Results are yielded in input order, otherwise (index, Result) tuples are
+        yielded as they finish
+        :param batch_size: int with the largest number of records a BatchFunction gets per call
+        :return: generator of Result or (index, Result) tuples. An input that raised an exception gets an error Result
+        """
+        from pytaskflow.stream import stream
+        return stream(
+            workflow=self, inputs=inputs, pipeline=pipeline, queue_size=queue_size, ordered=ordered, batch_size=batch_size
+        )
 
 
 
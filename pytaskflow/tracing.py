@@ -0,0 +1,319 @@
+"""
+Execution tracing. An ExecutionTracer is an instrumentation hook that records every Task a run executes - when, on
+which thread, for how long, whether it failed and whether its Result overrode the next Task - in a bounded ring
+buffer. For a sample of the runs it also keeps encoded snapshots of the Results going in and out of every Task, so
+those runs can be replayed step by step against the same WorkFlow with replay().
+
+    tracer = ExecutionTracer(capacity=100000, snapshot_rate=0.01)
+    workflow.executor.add_hook(tracer)
+    ...
+    tracer.export_chrome_trace('/tmp/trace.json')      # open in chrome://tracing or https://ui.perfetto.dev
+
+    for step in replay(workflow, tracer.records(run_id)):
+        print(step.task_name, step.recorded_wall_time, step.wall_time, step.matches)
+"""
+import collections, itertools, json, os, threading, time, traceback, warnings, zlib
+from pytaskflow.taskflow_engine import Result, Task, CompiledWorkFlow, RunState
+from pytaskflow.instrumentation import Instrumentation
+from pytaskflow.serialization import encode_tagged, decode_tagged, result_to_wire
+
+
+class TraceRecord:
+    """
+    One executed Task. started is in time.perf_counter() seconds; input_snapshot and output_snapshot are bytes written
+    by encode_tagged(), or None when the run was not sampled (or its Result could not be encoded). depth is 0 for a
+    step of the run itself and 1 or more for a step run inside another one (a ParallelTask branch or a sub-workflow).
+    """
+    __slots__ = ('step', 'run_id', 'workflow_name', 'task_name', 'task_id', 'thread_id', 'started', 'wall_time',
+                 'cpu_time', 'is_error', 'error', 'override', 'input_snapshot', 'output_snapshot', 'depth')
+
+    def __init__(self, step, run_id, workflow_name, task_name, task_id, thread_id, started, wall_time, cpu_time,
+                 is_error, error=None, override=None, input_snapshot=None, output_snapshot=None, depth=0):
+        self.step = step
+        self.run_id = run_id
+        self.workflow_name = workflow_name
+        self.task_name = task_name
+        self.task_id = task_id
+        self.thread_id = thread_id
+        self.started = started
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.is_error = is_error
+        self.error = error
+        self.override = override
+        self.input_snapshot = input_snapshot
+        self.output_snapshot = output_snapshot
+        self.depth = depth
+
+    def __getstate__(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name in self.__slots__:
+            setattr(self, name, state.get(name, 0 if name == 'depth' else None))
+
+    def __repr__(self):
+        return 'TraceRecord(step={}, run_id={!r}, task_name={!r}, wall_time={})'.format(
+            self.step, self.run_id, self.task_name, self.wall_time
+        )
+
+
+def _override_name(result):
+    if result is None:
+        return None
+    override = result.override_err_task if result.is_error else result.override_success_task
+    if result.stop and not result.is_error:
+        override = None
+    if isinstance(override, Task):
+        return override.task_name
+    return None
+
+
+class ExecutionTracer(Instrumentation):
+    """
+    Records executed Tasks in a ring buffer holding the most recent capacity records, so tracing can stay on in
+    production with bounded memory. Recording a Task costs one small object and a deque append; snapshots are only
+    encoded for sampled runs.
+
+    Runs are sampled by run ID - a run is either snapshotted at every step or not at all, so every sampled run can be
+    replayed. The tracer is thread-safe and can be pickled with its records.
+    """
+    def __init__(self, capacity=10000, snapshot_rate=0.0, codec=None):
+        """
+        :param capacity: int with the number of records kept - the oldest are dropped first
+        :param snapshot_rate: float between 0 and 1 with the fraction of runs whose Results are snapshotted
+        :param codec: Codec or codec name used for the snapshots (default: pickle, see pytaskflow.serialization)
+        """
+        if capacity < 1:
+            raise Exception("capacity must be at least 1")
+        if not 0 <= snapshot_rate <= 1:
+            raise Exception("snapshot_rate must be between 0 and 1")
+        self.capacity = capacity
+        self.snapshot_rate = snapshot_rate
+        self.codec = codec
+        self._records = collections.deque(maxlen=capacity)
+        self._init_state()
+
+    def _init_state(self):
+        self._steps = itertools.count()
+        self._pending_inputs = {}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_records'] = list(self._records)
+        for name in ('_steps', '_pending_inputs'):
+            state.pop(name)
+        return state
+
+    def __setstate__(self, state):
+        records = state.pop('_records')
+        self.__dict__.update(state)
+        self._records = collections.deque(records, maxlen=self.capacity)
+        self._init_state()
+
+    def is_sampled(self, run_id):
+        """
+        :param run_id: str with the run ID (runs without an ExecutionContext have None)
+        :return: bool True if the Results of the run are snapshotted
+        """
+        if self.snapshot_rate >= 1:
+            return True
+        if self.snapshot_rate <= 0 or run_id is None:
+            return False
+        return zlib.crc32(run_id.encode('utf-8')) < self.snapshot_rate * 0x100000000
+
+    def _snapshot(self, result):
+        if result is None:
+            return None
+        try:
+            return encode_tagged(result, codec=self.codec)
+        except Exception:
+            warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+            return None
+
+    def before_task(self, event):
+        # Snapshot the input now, before the Function gets a chance to change it
+        if self.is_sampled(event.run_id):
+            self._pending_inputs[id(event)] = self._snapshot(event.input_result)
+
+    def after_task(self, event):
+        sampled = self.is_sampled(event.run_id)
+        error = None
+        if event.exception is not None:
+            error = '{}: {}'.format(type(event.exception).__name__, event.exception)
+        self._records.append(TraceRecord(
+            step=next(self._steps), run_id=event.run_id, workflow_name=event.workflow_name, task_name=event.task_name,
+            task_id=event.task_id, thread_id=threading.get_ident(), started=time.perf_counter() - event.wall_time,
+            wall_time=event.wall_time, cpu_time=event.cpu_time, is_error=event.is_error, error=error,
+            override=_override_name(event.result),
+            input_snapshot=self._pending_inputs.pop(id(event), None) if sampled else None,
+            output_snapshot=self._snapshot(event.result) if sampled else None, depth=event.depth,
+        ))
+
+    def records(self, run_id=None):
+        """
+        :param run_id: str to only get the records of one run (optional)
+        :return: list of TraceRecord, oldest first
+        """
+        records = list(self._records)
+        if run_id is not None:
+            records = [record for record in records if record.run_id == run_id]
+        return records
+
+    def run_ids(self):
+        """
+        :return: list of str with the IDs of the runs in the buffer, in the order they were first seen
+        """
+        return list(collections.OrderedDict((record.run_id, None) for record in self._records))
+
+    def transitions(self, run_id):
+        """
+        The path a run took
+        :param run_id: str with the run ID
+        :return: list of (task_name, next_task_name, override) tuples. next_task_name is None for the last Task and
+        override is the name of the Task a Result overrode the next Task with (None if it did not)
+        """
+        records = self.records(run_id)
+        return [
+            (record.task_name, records[i + 1].task_name if i + 1 < len(records) else None, record.override)
+            for i, record in enumerate(records)
+        ]
+
+    def clear(self):
+        """
+        Drop every record
+        """
+        self._records.clear()
+
+    def to_chrome_trace(self, run_id=None):
+        """
+        Convert the records to the Chrome trace event format read by chrome://tracing and Perfetto. Every Task is a
+        complete ("X") event on the thread that ran it, and flow events connect the steps of a run, so a run can be
+        followed across threads.
+        :param run_id: str to only export one run (optional)
+        :return: dict
+        """
+        pid = os.getpid()
+        events = []
+        thread_ids = set()
+        previous_by_run = {}
+        flow_ids = itertools.count(1)
+        for record in self.records(run_id):
+            ts = record.started * 1e6
+            thread_ids.add(record.thread_id)
+            args = {'run_id': record.run_id, 'task_id': record.task_id, 'step': record.step, 'is_error': record.is_error}
+            if record.override is not None:
+                args['override'] = record.override
+            if record.error is not None:
+                args['error'] = record.error
+            if record.cpu_time is not None:
+                args['cpu_ms'] = record.cpu_time * 1000
+            events.append({
+                'name': record.task_name, 'cat': record.workflow_name or 'workflow', 'ph': 'X', 'ts': ts,
+                'dur': record.wall_time * 1e6, 'pid': pid, 'tid': record.thread_id, 'args': args,
+            })
+            previous = previous_by_run.get(record.run_id)
+            if previous is not None:
+                flow_id = next(flow_ids)
+                events.append({
+                    'name': 'next', 'cat': 'transition', 'ph': 's', 'id': flow_id, 'pid': pid, 'tid': previous.thread_id,
+                    'ts': (previous.started + previous.wall_time) * 1e6,
+                })
+                events.append({
+                    'name': 'next', 'cat': 'transition', 'ph': 'f', 'bp': 'e', 'id': flow_id, 'pid': pid,
+                    'tid': record.thread_id, 'ts': ts,
+                })
+            if record.run_id is not None:
+                previous_by_run[record.run_id] = record
+        for thread_id in sorted(thread_ids):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id, 'args': {'name': 'Thread {}'.format(thread_id)}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export_chrome_trace(self, filename, run_id=None):
+        """
+        Write to_chrome_trace() as JSON
+        :param filename: str with the file to write
+        :param run_id: str to only export one run (optional)
+        """
+        with open(filename, 'w') as f:
+            json.dump(self.to_chrome_trace(run_id=run_id), f)
+
+
+class ReplayStep:
+    """
+    One replayed Task: the Result it produced this time, its wall time then and now, and whether the Result matches
+    the recorded one - result_obj, is_error, err_msg and stop (None if there was no recorded Result to compare with)
+    """
+    __slots__ = ('task_name', 'task_id', 'result', 'recorded_wall_time', 'wall_time', 'matches')
+
+    def __init__(self, task_name, task_id, result, recorded_wall_time, wall_time, matches):
+        self.task_name = task_name
+        self.task_id = task_id
+        self.result = result
+        self.recorded_wall_time = recorded_wall_time
+        self.wall_time = wall_time
+        self.matches = matches
+
+
+def _entries_by_name(graph):
+    entries = {}
+    for entry in graph.entries:
+        entries.setdefault(entry.task_name, entry)
+    return entries
+
+
+def replay(workflow, records, hooks=None):
+    """
+    Replay a recorded run against a WorkFlow. Every recorded Task is executed again with the input snapshot it got
+    the first time, in the recorded order - the path is taken from the records, not from the new Results - so a run
+    is reproduced step by step even when its Functions are not deterministic, and each step can be profiled on its
+    own. Tasks are looked up by ID in the compiled graph, and by name for Tasks that were not part of it. Only the
+    steps of the run itself are replayed: the steps of ParallelTask branches and sub-workflows (depth above 0) are run
+    again by the step that contains them.
+    :param workflow: WorkFlow the run was recorded with (or one built from the same definition)
+    :param records: list of TraceRecord of one sampled run, see ExecutionTracer.records()
+    :param hooks: list of Instrumentation hooks to run around every replayed Task, for example a TaskStatsAggregator
+    (optional)
+    :return: list of ReplayStep
+    """
+    graph = workflow.compiled
+    if graph is None:
+        graph = CompiledWorkFlow(workflow_name=workflow.workflow_name, starter_task=workflow.starter_task)
+    by_name = _entries_by_name(graph)
+    executor = workflow.executor
+    context = workflow.new_context(run_id='replay-{}'.format(records[0].run_id if len(records) > 0 else None))
+    steps = []
+    for record in sorted(records, key=lambda record: record.step):
+        if record.depth > 0:
+            continue
+        if record.input_snapshot is None:
+            raise Exception("Task {} of run {} has no input snapshot - the run was not sampled".format(record.task_name, record.run_id))
+        if 0 <= record.task_id < len(graph.entries) and graph.entries[record.task_id].task_name == record.task_name:
+            entry = graph.entries[record.task_id]
+        elif record.task_name in by_name:
+            entry = by_name[record.task_name]
+        else:
+            raise Exception("Task {} of run {} is not part of WorkFlow {}".format(record.task_name, record.run_id, workflow.workflow_name))
+        input_result = decode_tagged(record.input_snapshot)
+        started = time.perf_counter()
+        try:
+            if hooks:
+                result = executor._execute_instrumented(hooks, entry, input_result, context, graph)
+            elif entry.takes_run:
+                result = entry.execute(input_result, run=RunState(executor, context, graph))
+            else:
+                result = entry.execute(input_result)
+        except Exception:
+            result = Result(result_obj={}, is_error=True, err_msg=traceback.format_exc())
+        wall_time = time.perf_counter() - started
+        matches = None
+        if record.output_snapshot is not None:
+            matches = result_to_wire(result) == result_to_wire(decode_tagged(record.output_snapshot))
+        steps.append(ReplayStep(
+            task_name=entry.task_name, task_id=entry.task_id, result=result, recorded_wall_time=record.wall_time,
+            wall_time=wall_time, matches=matches
+        ))
+    return steps
+
+
+# EOF
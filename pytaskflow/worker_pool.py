@@ -0,0 +1,487 @@
+"""
+A pool of long-lived worker processes with a preloaded WorkFlowRegistry. Every worker imports the Function modules and
+builds and compiles the registered WorkFlows once, when it starts, and then serves runs until it is recycled - so a
+short WorkFlow only pays for sending its input and Result between processes.
+
+    registry = WorkFlowRegistry()
+    registry.register('checkout', 'myapp.workflows:get_checkout_workflow')
+    with WarmWorkerPool(registry, workers=4, max_runs_per_worker=10000, max_memory_mb=512) as pool:
+        result = pool.run('checkout', Result(result_obj={...}))
+
+Requests and Results travel over a pipe to each worker, encoded with a codec from pytaskflow.serialization. Other
+processes on the same host can use the pool through a UNIX socket with WorkerPoolServer and WorkerPoolClient.
+"""
+import multiprocessing, os, queue, socket, struct, sys, threading, time, traceback, warnings
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client, answer_challenge, deliver_challenge
+from concurrent.futures import ThreadPoolExecutor
+from pytaskflow.taskflow_engine import Result
+from pytaskflow.serialization import encode_tagged, decode_tagged
+from pytaskflow.batch import run_one
+from pytaskflow.subworkflow import default_registry
+
+
+_READY = 'ready'
+_FAILED = 'failed'
+
+# Seconds a replacement waits after a failed worker start, doubled after every failure up to _MAX_RESTART_BACKOFF
+_RESTART_BACKOFF = 0.1
+_MAX_RESTART_BACKOFF = 10.0
+
+# Seconds run() waits for a free worker before checking whether any worker is left
+_POLL_INTERVAL = 0.1
+
+
+def current_memory_bytes():
+    """
+    :return: int with the resident memory of this process in bytes - the current size where the platform reports it
+    (Linux), otherwise the peak size
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _worker_main(connection, registry, max_runs, max_memory, codec):
+    """
+    Main function of a worker process: preload every registered WorkFlow, then run requests until told to stop, the
+    parent goes away, or the worker has to be recycled
+    """
+    try:
+        for name in registry.names():
+            registry.get(name)
+    except Exception:
+        connection.send_bytes(encode_tagged((_FAILED, traceback.format_exc()), codec=codec))
+        return
+    connection.send_bytes(encode_tagged((_READY, os.getpid()), codec=codec))
+    runs = 0
+    while True:
+        try:
+            request = decode_tagged(connection.recv_bytes())
+        except EOFError:
+            return
+        if request is None:
+            return
+        name, input_result = request
+        try:
+            result = run_one(workflow=registry.get(name), input_result=input_result)
+        except Exception:
+            result = Result(result_obj={}, is_error=True, err_msg=traceback.format_exc())
+        runs += 1
+        recycle = runs >= max_runs or (max_memory is not None and current_memory_bytes() > max_memory)
+        connection.send_bytes(encode_tagged((result, recycle), codec=codec))
+        if recycle:
+            return
+
+
+class WorkerCrashedError(Exception):
+    """
+    Raised by WarmWorkerPool.run() when the worker process running the request died. The worker is replaced.
+    """
+    def __init__(self, pid, workflow_name, exitcode):
+        self.pid = pid
+        self.workflow_name = workflow_name
+        self.exitcode = exitcode
+        super(WorkerCrashedError, self).__init__('Worker process {} running {} exited with code {}'.format(pid, workflow_name, exitcode))
+
+
+class _Worker:
+    __slots__ = ('process', 'connection', 'pid', 'runs')
+
+    def __init__(self, process, connection, pid):
+        self.process = process
+        self.connection = connection
+        self.pid = pid
+        self.runs = 0
+
+
+class WarmWorkerPool:
+    """
+    A fixed number of worker processes that keep the WorkFlows of a registry built between runs.
+
+    * A worker is recycled - it exits and a new one is started in its place - after max_runs_per_worker runs, or when
+      its resident memory grew over max_memory_mb after a run, which contains leaks in Functions
+    * A worker that dies while running a request is replaced and the caller gets a WorkerCrashedError
+    * A replacement that fails to start (for example because a WorkFlow factory raises) is retried with backoff and
+      counted in stats(). While no worker is left and every replacement is failing, run() raises instead of waiting
+    * An exception raised by a WorkFlow is returned as an error Result, like run_many() does
+    * run() can be called from many threads; at most workers runs execute at the same time and the other callers wait
+      for a free worker
+
+    With the 'fork' start method the registry is built in the parent before the workers are started, so new workers
+    (including the ones replacing recycled workers) start with the WorkFlows already built. With 'spawn' and
+    'forkserver' every worker builds them once when it starts.
+
+    The Results sent back are in the codec's lean wire form: result_obj, is_error, err_msg and stop.
+    """
+    def __init__(self, registry=None, workers=None, max_runs_per_worker=1000, max_memory_mb=None, codec=None,
+                 start_method=None):
+        """
+        :param registry: WorkFlowRegistry with the WorkFlows to serve (default: the default registry of
+        pytaskflow.subworkflow)
+        :param workers: int with the number of worker processes (defaults to the number of CPUs)
+        :param max_runs_per_worker: int with the number of runs after which a worker is recycled
+        :param max_memory_mb: float with the resident memory in MB above which a worker is recycled (optional)
+        :param codec: Codec or codec name for requests and Results (default: pickle)
+        :param start_method: str with the multiprocessing start method (default: the platform default)
+        """
+        if max_runs_per_worker < 1:
+            raise Exception("max_runs_per_worker must be at least 1")
+        self.registry = registry if registry is not None else default_registry
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.max_runs_per_worker = max_runs_per_worker
+        self.max_memory = max_memory_mb * 1024 * 1024 if max_memory_mb is not None else None
+        self.codec = codec
+        self._context = multiprocessing.get_context(start_method)
+        self._idle = queue.Queue()
+        self._workers = {}
+        self._lock = threading.Lock()
+        self._replacements = []
+        self._executor = None
+        self._closed = False
+        self._stop = threading.Event()
+        # Replacement threads starting a worker, and how many of them are retrying after a failed start
+        self._starting = 0
+        self._failing = 0
+        self.runs = 0
+        self.recycled = 0
+        self.crashed = 0
+        self.start_failures = 0
+        self.last_start_error = None
+        if self._context.get_start_method() == 'fork':
+            for name in self.registry.names():
+                self.registry.get(name)
+        for _ in range(self.workers):
+            self._idle.put(self._start_worker())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def _start_worker(self):
+        parent_connection, child_connection = self._context.Pipe(duplex=True)
+        process = self._context.Process(
+            target=_worker_main, name='WarmWorker',
+            args=(child_connection, self.registry, self.max_runs_per_worker, self.max_memory, self.codec), daemon=True
+        )
+        try:
+            process.start()
+        except BaseException:
+            parent_connection.close()
+            raise
+        finally:
+            child_connection.close()
+        try:
+            status, detail = decode_tagged(parent_connection.recv_bytes())
+        except EOFError:
+            parent_connection.close()
+            process.join()
+            raise Exception("worker process exited with code {} while starting".format(process.exitcode))
+        if status != _READY:
+            parent_connection.close()
+            process.join()
+            raise Exception("worker process could not preload the registry: {}".format(detail))
+        worker = _Worker(process=process, connection=parent_connection, pid=detail)
+        with self._lock:
+            self._workers[worker.pid] = worker
+        return worker
+
+    def _retire(self, worker):
+        with self._lock:
+            self._workers.pop(worker.pid, None)
+        worker.connection.close()
+        worker.process.join(5)
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join()
+
+    def _replace(self, worker):
+        # self._starting was counted up by _replace_in_background()
+        self._retire(worker)
+        failing = False
+        delay = _RESTART_BACKOFF
+        try:
+            while not self._closed:
+                try:
+                    self._idle.put(self._start_worker())
+                    return
+                except Exception:
+                    with self._lock:
+                        self.start_failures += 1
+                        self.last_start_error = traceback.format_exc()
+                        if not failing:
+                            self._failing += 1
+                            failing = True
+                    warnings.warn("EXCEPTION: %s" % traceback.format_exc())
+                self._stop.wait(delay)
+                delay = min(delay * 2, _MAX_RESTART_BACKOFF)
+        finally:
+            with self._lock:
+                self._starting -= 1
+                if failing:
+                    self._failing -= 1
+
+    def _replace_in_background(self, worker):
+        # The caller gets its Result right away; the new worker joins the idle workers once it has preloaded
+        thread = threading.Thread(target=self._replace, args=(worker,), name='WarmWorkerReplacement', daemon=True)
+        with self._lock:
+            self._replacements = [existing for existing in self._replacements if existing.is_alive()] + [thread]
+            self._starting += 1
+        thread.start()
+
+    def run(self, workflow_name, input_result=None, timeout=None):
+        """
+        Run a registered WorkFlow on a worker process
+        :param workflow_name: str with the name the WorkFlow is registered under
+        :param input_result: Result containing the input parameters (default: an empty Result)
+        :param timeout: float with the seconds to wait for a free worker (None: no limit)
+        :return: Result
+        :raises WorkerCrashedError: if the worker process died while running the request
+        """
+        if self._closed:
+            raise Exception("the worker pool was closed")
+        if workflow_name not in self.registry.names():
+            raise Exception("no WorkFlow is registered as {}".format(workflow_name))
+        if input_result is None:
+            input_result = Result(result_obj={})
+        request = encode_tagged((workflow_name, input_result), codec=self.codec)
+        worker = self._get_worker(timeout)
+        try:
+            worker.connection.send_bytes(request)
+            result, recycle = decode_tagged(worker.connection.recv_bytes())
+        except (EOFError, OSError):
+            worker.process.join(5)
+            with self._lock:
+                self.crashed += 1
+            self._replace_in_background(worker)
+            raise WorkerCrashedError(pid=worker.pid, workflow_name=workflow_name, exitcode=worker.process.exitcode)
+        except BaseException:
+            # The request may be half sent or its Result unread, so the connection can not be trusted anymore
+            self._replace_in_background(worker)
+            raise
+        worker.runs += 1
+        with self._lock:
+            self.runs += 1
+            if recycle:
+                self.recycled += 1
+        if recycle:
+            self._replace_in_background(worker)
+        else:
+            self._idle.put(worker)
+        return result
+
+    def _get_worker(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                if len(self._workers) == 0 and self._failing == self._starting:
+                    raise Exception("no worker process is left - starting new workers failed {} time(s):\n{}".format(
+                        self.start_failures, self.last_start_error
+                    ))
+            wait = _POLL_INTERVAL
+            if deadline is not None:
+                wait = min(wait, max(deadline - time.monotonic(), 0))
+            try:
+                return self._idle.get(timeout=wait)
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise Exception("no worker became free within {}s".format(timeout))
+
+    def submit(self, workflow_name, input_result=None):
+        """
+        Run a registered WorkFlow on a worker process without waiting for it, see run()
+        :return: concurrent.futures.Future with the Result
+        """
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='WarmWorkerPool')
+        return self._executor.submit(self.run, workflow_name, input_result)
+
+    def stats(self):
+        """
+        :return: dict with the number of workers, the runs served, the workers recycled and crashed, the failed worker
+        starts, and the pid and runs of every live worker
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'runs': self.runs,
+                'recycled': self.recycled,
+                'crashed': self.crashed,
+                'start_failures': self.start_failures,
+                'worker_runs': dict((pid, worker.runs) for pid, worker in self._workers.items()),
+            }
+
+    def close(self):
+        """
+        Stop the worker processes once they finished the runs in progress
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        with self._lock:
+            replacements = list(self._replacements)
+        for thread in replacements:
+            thread.join()
+        # Busy workers are stopped once their run is done and they are back with the idle workers
+        while True:
+            with self._lock:
+                if len(self._workers) == 0:
+                    return
+            try:
+                worker = self._idle.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                worker.connection.send_bytes(encode_tagged(None, codec=self.codec))
+            except OSError:
+                pass
+            self._retire(worker)
+
+
+def _set_socket_timeout(connection, timeout):
+    # A Connection reads and writes its descriptor directly: time out at the socket level, on a duplicate descriptor
+    seconds = 0 if timeout is None else int(timeout)
+    microseconds = 0 if timeout is None else int((timeout - seconds) * 1000000)
+    value = struct.pack('ll', seconds, microseconds)
+    with socket.socket(fileno=os.dup(connection.fileno())) as sock:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, value)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, value)
+
+
+class WorkerPoolServer:
+    """
+    Serves a WarmWorkerPool on a UNIX socket, so other processes on the host (for example the workers of a web
+    server) can run WorkFlows on it with WorkerPoolClient. Every client connection is served by its own thread.
+
+    Requests are decoded with the codec they were sent with, which can be pickle, so only clients that know the
+    authkey are served: a connection that fails the challenge is closed before anything it sent is decoded. The
+    challenge runs on the thread of the connection, and a client that does not complete it within handshake_timeout
+    seconds is disconnected, so a silent client can not hold up the others. The socket itself is only accessible by
+    the user running the server (mode 0600).
+    """
+    def __init__(self, pool, address, authkey, handshake_timeout=5.0):
+        """
+        :param pool: WarmWorkerPool to run the requests on
+        :param address: str with the path of the UNIX socket
+        :param authkey: bytes with a shared secret clients must know
+        :param handshake_timeout: float with the seconds a client gets to answer the challenge
+        """
+        if not isinstance(authkey, bytes) or len(authkey) == 0:
+            raise Exception("authkey must be a non-empty bytes secret")
+        self.pool = pool
+        self.address = address
+        self.authkey = authkey
+        self.handshake_timeout = handshake_timeout
+        # Without an authkey the Listener accepts at once: the challenge is done by _serve()
+        self.listener = Listener(address=address, family='AF_UNIX')
+        os.chmod(address, 0o600)
+        self._thread = None
+        self._closed = False
+
+    def start(self):
+        """
+        Accept connections on a background thread
+        :return: self
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name='WorkerPoolServer', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        while not self._closed:
+            try:
+                connection = self.listener.accept()
+            except (OSError, EOFError):
+                if self._closed:
+                    return
+                continue
+            threading.Thread(target=self._serve, args=(connection,), name='WorkerPoolConnection', daemon=True).start()
+
+    def _serve(self, connection):
+        codec = self.pool.codec
+        with connection:
+            try:
+                _set_socket_timeout(connection, self.handshake_timeout)
+                deliver_challenge(connection, self.authkey)
+                answer_challenge(connection, self.authkey)
+                _set_socket_timeout(connection, None)
+            except (AuthenticationError, EOFError, OSError):
+                return
+            while True:
+                try:
+                    workflow_name, input_result = decode_tagged(connection.recv_bytes())
+                except (EOFError, OSError):
+                    return
+                try:
+                    result = self.pool.run(workflow_name, input_result)
+                except Exception:
+                    result = Result(result_obj={}, is_error=True, err_msg=traceback.format_exc())
+                try:
+                    connection.send_bytes(encode_tagged(result, codec=codec))
+                except OSError:
+                    return
+
+    def close(self):
+        """
+        Stop accepting connections and remove the socket. The pool is not closed.
+        """
+        self._closed = True
+        if self._thread is not None:
+            # Closing the listener does not wake a thread blocked in accept(): connect to it instead
+            try:
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as wake_up:
+                    wake_up.connect(self.address)
+            except OSError:
+                pass
+            self._thread.join(5)
+        self.listener.close()
+
+
+class WorkerPoolClient:
+    """
+    Runs WorkFlows on a WarmWorkerPool served by a WorkerPoolServer. A client holds one connection and is not
+    thread-safe - use one client per thread.
+    """
+    def __init__(self, address, authkey, codec=None):
+        """
+        :param address: str with the path of the server's UNIX socket
+        :param authkey: bytes with the server's shared secret
+        :param codec: Codec or codec name for requests (default: pickle). Results come back in the pool's codec
+        """
+        if not isinstance(authkey, bytes) or len(authkey) == 0:
+            raise Exception("authkey must be a non-empty bytes secret")
+        self.connection = Client(address=address, family='AF_UNIX', authkey=authkey)
+        self.codec = codec
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+    def run(self, workflow_name, input_result=None):
+        """
+        :param workflow_name: str with the name the WorkFlow is registered under in the pool's registry
+        :param input_result: Result containing the input parameters (default: an empty Result)
+        :return: Result, an error Result if the server could not run the request
+        """
+        if input_result is None:
+            input_result = Result(result_obj={})
+        self.connection.send_bytes(encode_tagged((workflow_name, input_result), codec=self.codec))
+        return decode_tagged(self.connection.recv_bytes())
+
+    def close(self):
+        self.connection.close()
+
+
+# EOF
@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+import unittest
+from pytaskflow.taskflow_engine import AsyncFunction, Function, Result, Task, WorkFlow
+
+
+class FetchFunction(AsyncFunction):
+    def __init__(self):
+        super(FetchFunction, self).__init__()
+
+    async def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        await asyncio.sleep(0.05)
+        ro = dict(input_result.result_obj)
+        ro['Fetched'] = ro['Id'] * 10
+        return Result(result_obj=ro)
+
+
+class RecordThreadFunction(Function):
+    def __init__(self):
+        super(RecordThreadFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        ro = dict(input_result.result_obj)
+        ro['Thread'] = threading.current_thread().name
+        self.result = Result(result_obj=ro)
+
+
+class BadAsyncFunction(AsyncFunction):
+    def __init__(self):
+        super(BadAsyncFunction, self).__init__()
+
+    async def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return None
+
+
+def get_workflow():
+    t2 = Task(task_name='Record Thread')
+    t2.register_function(function=RecordThreadFunction(), success_task=None, err_task=None)
+    t1 = Task(task_name='Fetch')
+    t1.register_function(function=FetchFunction(), success_task=t2, err_task=None)
+    return WorkFlow(workflow_name='Async Workflow', starter_task=t1)
+
+
+class AsyncWorkFlowTests(unittest.TestCase):
+    def test_run_workflow_async_positive001(self):
+        wf = get_workflow()
+        context = wf.new_context()
+        result = asyncio.run(wf.run_workflow_async(input_result=Result(result_obj={'Id': 4}), context=context))
+        self.assertEqual(result.result_obj['Fetched'], 40)
+        self.assertNotEqual(result.result_obj['Thread'], threading.current_thread().name)
+        self.assertEqual(list(context.trace), ['Fetch', 'Record Thread'])
+
+    def test_many_runs_multiplexed_positive001(self):
+        wf = get_workflow()
+
+        async def run_all():
+            return await asyncio.gather(*[
+                wf.run_workflow_async(input_result=Result(result_obj={'Id': i})) for i in range(200)
+            ])
+
+        started = time.monotonic()
+        results = asyncio.run(run_all())
+        elapsed = time.monotonic() - started
+        self.assertEqual([r.result_obj['Fetched'] for r in results], [i * 10 for i in range(200)])
+        # 200 runs each waiting 50ms would take 10s one after the other
+        self.assertLess(elapsed, 5.0)
+
+    def test_async_function_in_sync_run_positive001(self):
+        result = get_workflow().run_workflow(input_result=Result(result_obj={'Id': 2}))
+        self.assertEqual(result.result_obj['Fetched'], 20)
+
+    def test_sync_run_in_event_loop_negative001(self):
+        wf = get_workflow()
+
+        async def run_sync():
+            return wf.run_workflow(input_result=Result(result_obj={'Id': 1}))
+
+        with self.assertRaises(Exception) as context:
+            asyncio.run(run_sync())
+        self.assertIn('use run_workflow_async()', str(context.exception))
+
+    def test_async_function_must_return_result_negative001(self):
+        t = Task(task_name='Bad')
+        t.register_function(function=BadAsyncFunction(), success_task=None, err_task=None)
+        wf = WorkFlow(workflow_name='Bad Workflow', starter_task=t)
+        with self.assertRaises(Exception):
+            asyncio.run(wf.run_workflow_async())
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
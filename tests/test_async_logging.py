@@ -0,0 +1,132 @@
+import io
+import logging
+import threading
+import unittest
+from unittest import mock
+from pytaskflow.taskflow_engine import LoggingHandler
+from pytaskflow.async_logging import QueueLogHandler, configure_async_logging
+
+
+class CountingMessage:
+    """
+    Counts how often it is formatted
+    """
+    def __init__(self):
+        self.formatted = 0
+
+    def __str__(self):
+        self.formatted += 1
+        return 'counted'
+
+
+class BlockingHandler(logging.Handler):
+    """
+    Handles records only once released
+    """
+    def __init__(self):
+        super(BlockingHandler, self).__init__()
+        self.released = threading.Event()
+        self.records = []
+
+    def emit(self, record):
+        self.released.wait()
+        self.records.append(record.getMessage())
+
+
+def get_logger(name, handler, level=logging.DEBUG):
+    logger = logging.getLogger('pytaskflow.test.{}'.format(name))
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+    return logger
+
+
+class AsyncLoggingTests(unittest.TestCase):
+    def test_queue_handler_batches_positive001(self):
+        stream = io.StringIO()
+        handler = QueueLogHandler(stream=stream, batch_size=100, linger=0.05)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        log_handler = LoggingHandler(max_level='debug', logger=get_logger('batches', handler))
+        for i in range(50):
+            log_handler.log('info', 'Step %d', i)
+        handler.flush()
+        lines = stream.getvalue().splitlines()
+        self.assertEqual(lines[0], 'INFO Step 0')
+        self.assertEqual(len(lines), 50)
+        stats = handler.stats()
+        self.assertEqual(stats['written'], 50)
+        self.assertLess(stats['batches'], 50)
+        handler.close()
+        log_handler.log('error', 'After close')
+        self.assertEqual(stream.getvalue().splitlines()[-1], 'ERROR After close')
+
+    def test_level_filtered_before_formatting_positive001(self):
+        stream = io.StringIO()
+        handler = QueueLogHandler(stream=stream)
+        log_handler = LoggingHandler(max_level='info', logger=get_logger('levels', handler))
+        message = CountingMessage()
+        called = []
+        log_handler.log('debug', '%s', message)
+        log_handler.log('debug', lambda: called.append(True) or 'never')
+        self.assertFalse(log_handler.is_enabled('debug'))
+        log_handler.maxLevel = 'debug'
+        self.assertTrue(log_handler.is_enabled('debug'))
+        log_handler.log('debug', '%s', message)
+        log_handler.log('warning', lambda: 'Lazy %s' % 'message')
+        handler.close()
+        self.assertEqual(called, [])
+        self.assertEqual(message.formatted, 1)
+        self.assertEqual(stream.getvalue().splitlines(), ['counted', 'Lazy message'])
+
+    def test_targets_and_drops_positive001(self):
+        target = BlockingHandler()
+        handler = QueueLogHandler(targets=[target], queue_size=2, batch_size=1)
+        logger = get_logger('drops', handler)
+        for i in range(10):
+            logger.info('Record %d', i)
+        self.assertGreater(handler.stats()['dropped'], 0)
+        target.released.set()
+        handler.close()
+        self.assertEqual(target.records[0], 'Record 0')
+        self.assertEqual(len(target.records), 10 - handler.stats()['dropped'])
+
+    def test_configure_async_logging_positive001(self):
+        stream = io.StringIO()
+        handler = configure_async_logging(logger_name='pytaskflow.test.configured', level='warning', stream=stream)
+        try:
+            log_handler = LoggingHandler(max_level='debug', logger=logging.getLogger('pytaskflow.test.configured'))
+            log_handler.log('info', 'Dropped by the logger')
+            log_handler.log('error', 'Kept')
+            handler.flush()
+            self.assertIn('ERROR pytaskflow.test.configured Kept', stream.getvalue())
+            self.assertNotIn('Dropped', stream.getvalue())
+        finally:
+            logging.getLogger('pytaskflow.test.configured').removeHandler(handler)
+            handler.close()
+
+    def test_unconfigured_prints_positive001(self):
+        logger = logging.getLogger('pytaskflow.test.unconfigured')
+        logger.propagate = False
+        log_handler = LoggingHandler(max_level='info', logger=logger)
+        with mock.patch('sys.stdout', new=io.StringIO()) as stdout:
+            log_handler.log('info', 'Task %s done', 'T1')
+            log_handler.log('debug', 'Dropped')
+        self.assertEqual(stdout.getvalue(), '[NOT overridden] [info] Task T1 done\n')
+        self.assertTrue(log_handler.is_enabled('info'))
+        handler = BlockingHandler()
+        handler.released.set()
+        logger.addHandler(handler)
+        try:
+            with mock.patch('sys.stdout', new=io.StringIO()) as stdout:
+                log_handler.log('warning', 'Configured')
+            self.assertEqual(stdout.getvalue(), '')
+            self.assertEqual(handler.records, ['Configured'])
+        finally:
+            logger.removeHandler(handler)
+
+    def test_queue_handler_negative001(self):
+        with self.assertRaises(Exception):
+            QueueLogHandler(batch_size=0)
+
+
+# EOF
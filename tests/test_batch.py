@@ -0,0 +1,63 @@
+import unittest
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
+
+
+class SquareFunction(Function):
+    def __init__(self):
+        super(SquareFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        value = input_result.result_obj['Value']
+        if value == 13:
+            raise Exception('Unlucky number')
+        return Result(result_obj={'Value': value, 'Square': value * value})
+
+
+def get_workflow():
+    t = Task(task_name='Square')
+    t.register_function(function=SquareFunction(), success_task=None, err_task=None)
+    return WorkFlow(workflow_name='Square Workflow', starter_task=t)
+
+
+def get_inputs(count):
+    for i in range(count):
+        yield Result(result_obj={'Value': i})
+
+
+class RunManyTests(unittest.TestCase):
+    def check_ordered(self, mode):
+        results = list(get_workflow().run_many(inputs=get_inputs(100), workers=3, mode=mode, chunk_size=7))
+        self.assertEqual(len(results), 100)
+        for i, result in enumerate(results):
+            if i == 13:
+                self.assertTrue(result.is_error)
+                self.assertIn('Unlucky number', result.err_msg)
+            else:
+                self.assertFalse(result.is_error)
+                self.assertEqual(result.result_obj['Square'], i * i)
+
+    def test_run_many_serial_positive001(self):
+        self.check_ordered(mode='serial')
+
+    def test_run_many_thread_positive001(self):
+        self.check_ordered(mode='thread')
+
+    def test_run_many_process_positive001(self):
+        self.check_ordered(mode='process')
+
+    def test_run_many_unordered_positive001(self):
+        items = list(get_workflow().run_many(inputs=get_inputs(50), workers=4, mode='thread', chunk_size=3, ordered=False))
+        self.assertEqual(sorted(index for index, _ in items), list(range(50)))
+        for index, result in items:
+            if index != 13:
+                self.assertEqual(result.result_obj['Value'], index)
+
+    def test_run_many_invalid_mode_negative001(self):
+        with self.assertRaises(Exception):
+            list(get_workflow().run_many(inputs=get_inputs(1), mode='gpu'))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -0,0 +1,254 @@
+import unittest
+from pytaskflow.taskflow_engine import Function, BatchFunction, Result, Task, WorkFlow, FrozenDict, CopyOnWriteDict
+from pytaskflow.instrumentation import TaskStatsAggregator
+from pytaskflow.policy import TaskPolicy
+from pytaskflow.columns import ResultColumns, numpy
+
+
+class SplitFunction(Function):
+    """
+    Sends odd Values through the Double Task and even Values straight to the Sum Task
+    """
+    def __init__(self):
+        super(SplitFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        if input_result.result_obj.get('Raise'):
+            raise ValueError('raised for one record')
+        if input_result.result_obj['Value'] % 2 == 0:
+            return Result(result_obj=input_result.result_obj, override_success_task=globals_dict['SumTask'])
+        return Result(result_obj=input_result.result_obj)
+
+
+class DoubleFunction(Function):
+    def __init__(self):
+        super(DoubleFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj=dict(input_result.result_obj, Numbers=input_result.result_obj['Numbers'] * 2))
+
+
+class SumBatchFunction(BatchFunction):
+    """
+    Sums the Numbers of every record and records the size of every batch. Values over 100 are errors
+    """
+    def __init__(self):
+        super(SumBatchFunction, self).__init__()
+        self.batch_sizes = []
+
+    def execute_batch(self, input_results, globals_dict={}):
+        self.batch_sizes.append(len(input_results))
+        if any(result.result_obj.get('Explode') for result in input_results):
+            raise ValueError('raised for the batch')
+        results = []
+        for input_result in input_results:
+            total = sum(input_result.result_obj['Numbers'])
+            if input_result.result_obj['Value'] > 100:
+                results.append(Result(result_obj={'Value': input_result.result_obj['Value']}, is_error=True, err_msg='too big'))
+            else:
+                results.append(Result(result_obj={'Value': input_result.result_obj['Value'], 'Total': total}))
+        return results
+
+
+class ColumnSumFunction(BatchFunction):
+    columns = ('Value', 'Numbers')
+
+    def __init__(self):
+        super(ColumnSumFunction, self).__init__()
+        self.batches = []
+
+    def execute_batch(self, input_results, globals_dict={}):
+        self.batches.append(input_results)
+        totals = [sum(numbers) for numbers in input_results['Numbers']]
+        return input_results.to_results({'Total': totals, 'Stop': True}, keep_fields=False)
+
+
+class WrongLengthFunction(BatchFunction):
+    def __init__(self):
+        super(WrongLengthFunction, self).__init__()
+
+    def execute_batch(self, input_results, globals_dict={}):
+        return input_results[:1]
+
+
+class RecordErrorFunction(Function):
+    def __init__(self):
+        super(RecordErrorFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj={'Error': input_result.err_msg, 'Value': input_result.result_obj.get('Value')}, stop=True)
+
+
+def get_workflow(sum_function=None):
+    if sum_function is None:
+        sum_function = SumBatchFunction()
+    t_err = Task(task_name='Error')
+    t_err.register_function(function=RecordErrorFunction(), success_task=None, err_task=None)
+    t_sum = Task(task_name='Sum')
+    t_sum.register_function(function=sum_function, success_task=None, err_task=t_err)
+    t_double = Task(task_name='Double')
+    t_double.register_function(function=DoubleFunction(), success_task=t_sum, err_task=None)
+    t_split = Task(task_name='Split')
+    t_split.register_function(function=SplitFunction(), success_task=t_double, err_task=None, globals_dict={'SumTask': t_sum})
+    workflow = WorkFlow(workflow_name='Batch', starter_task=t_split)
+    workflow.compile()
+    return workflow, sum_function
+
+
+class OddIsErrorFunction(Function):
+    def __init__(self):
+        super(OddIsErrorFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj=input_result.result_obj, is_error=input_result.result_obj['Value'] % 2 == 1)
+
+
+def get_diamond_workflow():
+    # A success -> B, A err -> C -> B: C is numbered after B by the depth-first walk
+    function = SumBatchFunction()
+    t_b = Task(task_name='B')
+    t_b.register_function(function=function, success_task=None, err_task=None)
+    t_c = Task(task_name='C')
+    t_c.register_function(function=DoubleFunction(), success_task=t_b, err_task=None)
+    t_a = Task(task_name='A')
+    t_a.register_function(function=OddIsErrorFunction(), success_task=t_b, err_task=t_c)
+    workflow = WorkFlow(workflow_name='Diamond', starter_task=t_a)
+    workflow.compile()
+    return workflow, function
+
+
+def get_inputs(count):
+    return [Result(result_obj={'Value': i, 'Numbers': [i, 1]}) for i in range(count)]
+
+
+class BatchFunctionTests(unittest.TestCase):
+    def test_grouped_run_positive001(self):
+        workflow, function = get_workflow()
+        inputs = get_inputs(10) + [Result(result_obj={'Value': 101, 'Numbers': [1]})]
+        contexts = [workflow.new_context() for _ in inputs]
+        results = workflow.run_workflow_batch(input_results=inputs, contexts=contexts)
+        # Records taking both paths meet again at Sum: one call for all of them
+        self.assertEqual(function.batch_sizes, [11])
+        expected = [workflow.run_workflow(input_result=input_result) for input_result in get_inputs(10)]
+        self.assertEqual([result.result_obj for result in results[:10]], [result.result_obj for result in expected])
+        self.assertEqual(results[1].result_obj, {'Value': 1, 'Total': 4})
+        # The error Result of one record is routed to the err_task of that record only
+        self.assertEqual(results[10].result_obj, {'Error': 'too big', 'Value': 101})
+        self.assertEqual(list(contexts[1].trace), ['Split', 'Double', 'Sum'])
+        self.assertEqual(list(contexts[10].trace), ['Split', 'Double', 'Sum', 'Error'])
+        self.assertEqual(list(contexts[2].trace), ['Split', 'Sum'])
+        self.assertEqual(workflow.run_workflow_batch(input_results=[]), [])
+
+    def test_diamond_positive001(self):
+        workflow, function = get_diamond_workflow()
+        self.assertEqual([entry.task_name for entry in workflow.compiled.entries], ['A', 'B', 'C'])
+        results = workflow.run_workflow_batch(input_results=get_inputs(6))
+        # B waits for the records going through C, so it runs once
+        self.assertEqual(function.batch_sizes, [6])
+        self.assertEqual([result.result_obj['Total'] for result in results], [1, 4, 3, 8, 5, 12])
+
+    def test_single_runs_and_hooks_positive001(self):
+        workflow, function = get_workflow()
+        stats = TaskStatsAggregator()
+        workflow.executor.add_hook(stats)
+        self.assertEqual(workflow.run_workflow(input_result=get_inputs(3)[2]).result_obj, {'Value': 2, 'Total': 3})
+        self.assertEqual(function.batch_sizes, [1])
+        workflow.run_workflow_batch(input_results=get_inputs(6))
+        self.assertEqual(function.batch_sizes, [1, 6])
+        snapshot = stats.snapshot()
+        self.assertEqual(snapshot['Sum']['count'], 7)
+        self.assertEqual(snapshot['Double']['count'], 3)
+        self.assertTrue(workflow.uses_batch_functions())
+        error_task = workflow.compiled.entries[-1].task
+        self.assertFalse(WorkFlow(workflow_name='Plain', starter_task=error_task).uses_batch_functions())
+
+    def test_columns_positive001(self):
+        workflow, function = get_workflow(ColumnSumFunction())
+        results = workflow.run_workflow_batch(input_results=get_inputs(4))
+        self.assertEqual([result.result_obj for result in results], [{'Total': total, 'Stop': True} for total in (1, 4, 3, 8)])
+        self.assertEqual(len(function.batches), 1)
+        self.assertIsInstance(function.batches[0], ResultColumns)
+        columns = ResultColumns(results=get_inputs(3) + [Result(result_obj={})], names=('Value',), use_numpy=False)
+        self.assertEqual(columns['Value'], [0, 1, 2, None])
+        with self.assertRaises(KeyError):
+            columns['Numbers']
+        results = columns.to_results({'Double': [0, 2, 4, None]}, is_error=[False, False, True, False], err_msg='odd')
+        self.assertEqual(results[1].result_obj, {'Value': 1, 'Numbers': [1, 1], 'Double': 2})
+        self.assertEqual((results[2].is_error, results[2].err_msg, results[1].err_msg), (True, 'odd', None))
+
+    def test_columns_of_mappings_positive001(self):
+        inputs = [
+            Result(result_obj=FrozenDict({'x': 1})), Result(result_obj=CopyOnWriteDict({'x': 2})), Result(result_obj={'x': 3})
+        ]
+        columns = ResultColumns(results=inputs, names=('x',), use_numpy=False)
+        self.assertEqual(columns['x'], [1, 2, 3])
+        results = columns.to_results({'y': [x * 10 for x in columns['x']]})
+        self.assertEqual([result.result_obj for result in results], [{'x': 1, 'y': 10}, {'x': 2, 'y': 20}, {'x': 3, 'y': 30}])
+        # The inputs are not changed
+        self.assertEqual(dict(inputs[0].result_obj), {'x': 1})
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_numpy_columns_positive001(self):
+        columns = ResultColumns(results=get_inputs(3), names=('Value', 'Numbers'))
+        self.assertEqual(columns['Value'].tolist(), [0, 1, 2])
+        self.assertEqual(columns['Numbers'].shape, (3, 2))
+        results = columns.to_results({'Total': columns['Numbers'].sum(axis=1)}, keep_fields=False)
+        self.assertEqual([result.result_obj['Total'] for result in results], [1, 2, 3])
+        self.assertIs(type(results[0].result_obj['Total']), int)
+        ragged = ResultColumns(results=[Result(result_obj={'Numbers': [1]}), Result(result_obj={'Numbers': [1, 2]})], names=('Numbers',))
+        self.assertEqual(ragged['Numbers'], [[1], [1, 2]])
+
+    def test_run_many_and_stream_positive001(self):
+        workflow, function = get_workflow()
+        expected = [result.result_obj for result in workflow.run_workflow_batch(input_results=get_inputs(20))]
+        del function.batch_sizes[:]
+        results = list(workflow.run_many(inputs=get_inputs(20), mode='serial', chunk_size=8))
+        self.assertEqual([result.result_obj for result in results], expected)
+        self.assertEqual(function.batch_sizes, [8, 8, 4])
+        results = list(workflow.run_many(inputs=get_inputs(20), workers=2, mode='thread', chunk_size=5))
+        self.assertEqual([result.result_obj for result in results], expected)
+        results = list(workflow.run_many(inputs=get_inputs(20), workers=2, mode='process', chunk_size=5))
+        self.assertEqual([result.result_obj for result in results], expected)
+        del function.batch_sizes[:]
+        results = list(workflow.stream(inputs=iter(get_inputs(20)), batch_size=6))
+        self.assertEqual([result.result_obj for result in results], expected)
+        self.assertEqual(function.batch_sizes, [6, 6, 6, 2])
+        del function.batch_sizes[:]
+        results = list(workflow.stream(inputs=get_inputs(20), pipeline=True, queue_size=4, batch_size=3))
+        self.assertEqual([result.result_obj for result in results], expected)
+        self.assertEqual(sum(function.batch_sizes), 20)
+        self.assertLessEqual(max(function.batch_sizes), 3)
+
+    def test_exceptions_negative001(self):
+        workflow, function = get_workflow()
+        inputs = get_inputs(4)
+        inputs[1] = Result(result_obj={'Value': 1, 'Raise': True})
+        results = workflow.run_workflow_batch(input_results=inputs)
+        self.assertIn('raised for one record', results[1].err_msg)
+        self.assertEqual([result.is_error for result in results], [False, True, False, False])
+        inputs[2] = Result(result_obj={'Value': 2, 'Numbers': [], 'Explode': True})
+        results = workflow.run_workflow_batch(input_results=inputs)
+        self.assertIn('raised for one record', results[1].err_msg)
+        for result in (results[0], results[2], results[3]):
+            self.assertIn('raised for the batch', result.err_msg)
+        results = list(workflow.stream(inputs=inputs, pipeline=True))
+        self.assertIn('raised for the batch', results[2].err_msg)
+        results = get_workflow(WrongLengthFunction())[0].run_workflow_batch(input_results=get_inputs(2))
+        self.assertIn('one Result per input', results[0].err_msg)
+        with self.assertRaises(Exception):
+            list(workflow.stream(inputs=inputs, batch_size=0))
+
+    def test_policy_runs_per_record_negative001(self):
+        function = SumBatchFunction()
+        task = Task(task_name='Sum')
+        task.register_function(function=function, success_task=None, err_task=None)
+        task.set_policy(TaskPolicy(max_retries=1))
+        workflow = WorkFlow(workflow_name='Policy', starter_task=task)
+        workflow.compile()
+        self.assertFalse(workflow.compiled.starter.is_batch)
+        results = workflow.run_workflow_batch(input_results=get_inputs(3))
+        self.assertEqual([result.result_obj['Total'] for result in results], [1, 2, 3])
+        self.assertEqual(function.batch_sizes, [1, 1, 1])
+
+
+# EOF
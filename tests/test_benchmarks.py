@@ -0,0 +1,47 @@
+import unittest
+from benchmarks.bench_engine import run_benchmarks
+from benchmarks.bench_codecs import run_benchmarks as run_codec_benchmarks
+from benchmarks.bench_result import run_benchmarks as run_result_benchmarks
+from benchmarks.bench_logging import run_benchmarks as run_logging_benchmarks
+from benchmarks.compare import compare
+
+
+class BenchmarkSuiteTests(unittest.TestCase):
+    def test_engine_suite_report_positive001(self):
+        report = run_benchmarks(scale=0.01, repeat=1)
+        self.assertEqual(report['suite'], 'engine')
+        for name in ('task.run_task', 'chain.linear', 'loop.override_success_task.compiled', 'routing.err_task',
+                     'result.construct', 'session.save', 'session.load', 'session.sqlite.save_many'):
+            self.assertIn(name, report['benchmarks'])
+            self.assertGreater(report['benchmarks'][name]['best_ns'], 0)
+
+    def test_codec_suite_report_positive001(self):
+        report = run_codec_benchmarks(items=10, number=10, repeat=1)
+        for name in ('pickle', 'json', 'marshal'):
+            self.assertGreater(report['benchmarks']['codec.{}.decode'.format(name)]['best_ns'], 0)
+            self.assertGreater(report['sizes'][name], 0)
+
+    def test_result_suite_report_positive001(self):
+        report = run_result_benchmarks(steps=100, payload=5, repeat=1)
+        for name in ('result.construct.legacy', 'result.construct.slots', 'loop.deepcopy', 'loop.copy_on_write', 'loop.frozen'):
+            self.assertGreater(report['benchmarks'][name]['best_ns'], 0)
+        self.assertLess(report['memory']['result.slots'], report['memory']['result.legacy'])
+
+    def test_logging_suite_report_positive001(self):
+        report = run_logging_benchmarks(calls=200, write_delay=0.0, repeat=1)
+        for name in ('log.disabled', 'log.disabled.callable', 'log.enabled.queue', 'log.enabled.stream', 'log.print'):
+            self.assertGreater(report['benchmarks'][name]['best_ns'], 0)
+        self.assertEqual(report['writes']['log.enabled.stream'], 200)
+        self.assertLessEqual(report['writes']['log.enabled.queue'], 200)
+
+    def test_compare_flags_regressions_positive001(self):
+        baseline = {'benchmarks': {'a': {'best_ns': 100.0}, 'b': {'best_ns': 100.0}, 'gone': {'best_ns': 1.0}}}
+        current = {'benchmarks': {'a': {'best_ns': 105.0}, 'b': {'best_ns': 150.0}, 'new': {'best_ns': 1.0}}}
+        rows = compare(baseline, current, threshold=0.10)
+        self.assertEqual([(row[0], row[4]) for row in rows], [('a', False), ('b', True)])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -0,0 +1,114 @@
+import shutil
+import tempfile
+import unittest
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow, FileBasedSessionPersistence
+from pytaskflow.session_store import FileSessionStore
+from pytaskflow.checkpoint import Checkpointer
+from tests.test_simple import CountDownFunction
+
+
+class ExpensiveFunction(Function):
+    calls = 0
+
+    def __init__(self):
+        super(ExpensiveFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        ExpensiveFunction.calls += 1
+        ro = dict(input_result.result_obj)
+        ro['Expensive'] = 42
+        return Result(result_obj=ro)
+
+
+class CrashOnceFunction(Function):
+    crash = True
+
+    def __init__(self):
+        super(CrashOnceFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        if CrashOnceFunction.crash:
+            CrashOnceFunction.crash = False
+            raise Exception('Worker died')
+        ro = dict(input_result.result_obj)
+        ro['Done'] = True
+        return Result(result_obj=ro)
+
+
+class CheckpointTests(unittest.TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        store = FileSessionStore(root_dir=self.root_dir)
+        self.persistence_factory = lambda token, data: FileBasedSessionPersistence(session_token=token, session_data=data, store=store)
+        ExpensiveFunction.calls = 0
+        CrashOnceFunction.crash = True
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def get_workflow(self, **kwargs):
+        t2 = Task(task_name='Crash Once')
+        t2.register_function(function=CrashOnceFunction(), success_task=None, err_task=None)
+        t1 = Task(task_name='Expensive')
+        t1.register_function(function=ExpensiveFunction(), success_task=t2, err_task=None)
+        wf = WorkFlow(workflow_name='Checkpointed', starter_task=t1)
+        wf.compile()
+        wf.enable_checkpoints(Checkpointer(persistence_factory=self.persistence_factory, **kwargs))
+        return wf
+
+    def test_resume_after_crash_positive001(self):
+        wf = self.get_workflow()
+        context = wf.new_context(session_token='session-1')
+        with self.assertRaises(Exception):
+            wf.run_workflow(input_result=Result(result_obj={'Input': 1}), context=context)
+        # a new process builds the WorkFlow again
+        wf = self.get_workflow()
+        resumed_context = wf.new_context()
+        result = wf.resume('session-1', context=resumed_context)
+        self.assertEqual(result.result_obj, {'Input': 1, 'Expensive': 42, 'Done': True})
+        self.assertEqual(ExpensiveFunction.calls, 1)
+        self.assertEqual(resumed_context.run_id, context.run_id)
+        self.assertEqual(resumed_context.step_count, 2)
+        # a finished run is not executed again
+        self.assertEqual(wf.resume('session-1').result_obj['Done'], True)
+        self.assertEqual(ExpensiveFunction.calls, 1)
+
+    def test_resume_with_new_input_positive001(self):
+        wf = self.get_workflow()
+        with self.assertRaises(Exception):
+            wf.run_workflow(input_result=Result(result_obj={}), session_token='session-2')
+        result = wf.resume('session-2', input_result=Result(result_obj={'From': 'request 2'}))
+        self.assertEqual(result.result_obj, {'From': 'request 2', 'Done': True})
+
+    def test_every_and_keep_finished_positive001(self):
+        t = Task(task_name='Count Down')
+        t.register_function(function=CountDownFunction(), success_task=t, err_task=None)
+        wf = WorkFlow(workflow_name='Loop', starter_task=t)
+        wf.compile()
+        saved = []
+        checkpointer = Checkpointer(persistence_factory=self.persistence_factory, every=10, keep_finished=False)
+        original_save = checkpointer.save
+        checkpointer.save = lambda context, checkpoint: saved.append(checkpoint.step_count) or original_save(context, checkpoint)
+        wf.enable_checkpoints(checkpointer)
+        wf.run_workflow(input_result=Result(result_obj={'Count': 35}), session_token='loop')
+        self.assertEqual(saved, [10, 20, 30])
+        self.assertIsNone(checkpointer.load('loop'))
+
+    def test_no_checkpoint_without_session_token_positive001(self):
+        wf = self.get_workflow()
+        CrashOnceFunction.crash = False
+        wf.run_workflow()
+        with self.assertRaises(Exception):
+            wf.resume('never-saved')
+
+    def test_requires_compiled_workflow_negative001(self):
+        t = Task(task_name='Expensive')
+        t.register_function(function=ExpensiveFunction(), success_task=None, err_task=None)
+        with self.assertRaises(Exception):
+            WorkFlow(workflow_name='Not Compiled', starter_task=t).enable_checkpoints(Checkpointer())
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -0,0 +1,152 @@
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
+from pytaskflow.instrumentation import TaskStatsAggregator, TaskEvent
+from pytaskflow.cli import main, run, read_inputs, percentile, get_workflow
+from tests.test_definition import get_definition
+from tests.test_batch_function import get_workflow as get_batch_workflow, get_inputs
+
+
+class SquareFunction(Function):
+    def __init__(self):
+        super(SquareFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        value = input_result.result_obj.get('Value', 0)
+        if value < 0:
+            raise Exception('negative value')
+        return Result(result_obj={'Value': value * value}, stop=True)
+
+
+def get_square_workflow():
+    task = Task(task_name='Square')
+    task.register_function(function=SquareFunction(), success_task=None, err_task=None)
+    return WorkFlow(workflow_name='Square', starter_task=task)
+
+
+class CliTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_lines(self, values):
+        path = os.path.join(self.directory, 'inputs.jsonl')
+        with open(path, 'w') as f:
+            for value in values:
+                f.write(json.dumps({'Value': value}) + '\n')
+            f.write('\n')
+        return path
+
+    def test_run_modes_positive001(self):
+        for mode in ('serial', 'thread', 'process'):
+            collected = {}
+            inputs = read_inputs(['{{"Value": {}}}'.format(i) for i in range(-1, 20)])
+            report = run(
+                get_square_workflow(), inputs, mode=mode, workers=2, chunk_size=3,
+                on_result=lambda index, result: collected.__setitem__(index, result)
+            )
+            self.assertEqual(report['runs'], 21)
+            self.assertEqual(report['errors'], 1)
+            self.assertEqual(collected[5].result_obj, {'Value': 16})
+            self.assertEqual(report['tasks']['Square']['count'], 21)
+            self.assertEqual(report['tasks']['Square']['error_count'], 1)
+            self.assertLessEqual(report['latency']['percentiles']['p50'], report['latency']['percentiles']['p99'])
+            self.assertLessEqual(report['latency']['percentiles']['p99'], report['latency']['max'])
+
+    def test_run_batch_functions_positive001(self):
+        workflow, function = get_batch_workflow()
+        for mode in ('serial', 'thread'):
+            del function.batch_sizes[:]
+            collected = {}
+            report = run(
+                workflow, get_inputs(10), mode=mode, workers=2, chunk_size=4,
+                on_result=lambda index, result: collected.__setitem__(index, result)
+            )
+            # The records of a chunk reach the BatchFunction together
+            self.assertEqual(sorted(function.batch_sizes), [2, 4, 4])
+            self.assertEqual(report['runs'], 10)
+            self.assertEqual(collected[1].result_obj, {'Value': 1, 'Total': 4})
+            self.assertEqual(report['tasks']['Sum']['count'], 10)
+
+    def test_run_keeps_own_aggregator_positive001(self):
+        workflow = get_square_workflow()
+        own = TaskStatsAggregator()
+        workflow.executor.add_hook(own)
+        for mode in ('serial', 'thread'):
+            report = run(workflow, read_inputs(['{"Value": 2}'] * 5), mode=mode, workers=2, chunk_size=2)
+            self.assertEqual(report['tasks']['Square']['count'], 5)
+        # The runner drains only the aggregator it added
+        self.assertEqual(own.snapshot()['Square']['count'], 10)
+        self.assertEqual(workflow.executor.hooks, [own])
+
+    def test_main_definition_positive001(self):
+        path = os.path.join(self.directory, 'workflow.json')
+        with open(path, 'w') as f:
+            json.dump(get_definition(), f)
+        report_path = os.path.join(self.directory, 'report.json')
+        output_path = os.path.join(self.directory, 'results.jsonl')
+        out = io.StringIO()
+        with mock.patch('sys.stdout', out):
+            exit_code = main([
+                path, '--input', self.write_lines([1, 9]), '--repeat', '3', '--output', output_path, '--report', report_path,
+                '--cache-dir', os.path.join(self.directory, 'cache')
+            ])
+        self.assertEqual(exit_code, 0)
+        self.assertIn('Runs:        6 (0 errors)', out.getvalue())
+        self.assertIn('Double Until Target', out.getvalue())
+        with open(output_path) as f:
+            results = [json.loads(line) for line in f]
+        self.assertEqual([result['result_obj'] for result in results[:2]], [{'Value': 48, 'Max': 48}, {'Error': 'too large'}])
+        with open(report_path) as f:
+            self.assertEqual(json.load(f)['runs'], 6)
+
+    def test_main_factory_positive001(self):
+        out = io.StringIO()
+        with mock.patch('sys.stdout', out):
+            main(['tests.test_cli:get_square_workflow', '--count', '5', '--mode', 'thread', '--workers', '2'])
+        self.assertIn('Runs:        5 (0 errors)', out.getvalue())
+        stdin = io.StringIO('{"Value": 3}\n{"Value": 4}\n')
+        out = io.StringIO()
+        with mock.patch('sys.stdin', stdin), mock.patch('sys.stdout', out), mock.patch('sys.stderr', io.StringIO()):
+            main(['tests.test_cli.get_square_workflow', '--input', '-', '--output', '-'])
+        self.assertEqual([json.loads(line)['result_obj'] for line in out.getvalue().splitlines()], [{'Value': 9}, {'Value': 16}])
+
+    def test_aggregator_drain_merge_positive001(self):
+        first = TaskStatsAggregator()
+        second = TaskStatsAggregator()
+        for aggregator, wall_time in ((first, 0.001), (second, 0.1)):
+            event = TaskEvent(run_id='run', workflow_name='W', task_name='T', task_id=0)
+            event.wall_time = wall_time
+            event.cpu_time = wall_time
+            event.result_size = 1
+            aggregator.after_task(event)
+        drained = second.drain()
+        self.assertEqual(second.snapshot(), {})
+        first.merge(drained)
+        stats = first.snapshot()['T']
+        self.assertEqual(stats['count'], 2)
+        self.assertAlmostEqual(stats['wall_max'], 0.1)
+        self.assertAlmostEqual(stats['wall_min'], 0.001)
+
+    def test_percentile_positive001(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile(values, 1.0), 100)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_get_workflow_negative001(self):
+        with self.assertRaises(Exception):
+            get_workflow('tests.test_cli:SquareFunction')
+        with self.assertRaises(Exception):
+            get_workflow('no_such_module:get_workflow')
+
+
+# EOF
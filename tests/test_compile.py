@@ -0,0 +1,98 @@
+import pickle
+import unittest
+from pytaskflow.taskflow_engine import Result, Task, WorkFlow, WorkFlowCompileError, _RunLocalGraph
+from pytaskflow.parallel import ParallelTask
+from tests.test_simple import PrintFunction, SetVariableFunction, CountDownFunction, FailingFunction, \
+    ErrorHandlerFunction, TaskOverridingSuccessTask
+
+
+class CompileTests(unittest.TestCase):
+    def get_linear_workflow(self):
+        t2 = Task(task_name='Task 2')
+        t2.register_function(function=SetVariableFunction(), success_task=None, err_task=None)
+        t1 = Task(task_name='Task 1')
+        t1.register_function(function=PrintFunction(), success_task=t2, err_task=None)
+        return WorkFlow(workflow_name='Linear', starter_task=t1), t1, t2
+
+    def test_compile_assigns_ids_positive001(self):
+        wf, t1, t2 = self.get_linear_workflow()
+        compiled = wf.compile()
+        self.assertIs(wf.compiled, compiled)
+        self.assertEqual([(entry.task_id, entry.task_name) for entry in compiled.entries], [(0, 'Task 1'), (1, 'Task 2')])
+        self.assertEqual(compiled.cycles, [])
+        result = wf.run_workflow(input_result=Result(result_obj={}))
+        self.assertEqual(result.result_obj, {'Message': 'Hello World', 'Variable': 10})
+
+    def test_compiled_loop_and_error_routing_positive001(self):
+        t_err = Task(task_name='Error Task')
+        t_err.register_function(function=ErrorHandlerFunction(), success_task=None, err_task=None)
+        t_fail = Task(task_name='Fail')
+        t_fail.register_function(function=FailingFunction(), success_task=None, err_task=t_err)
+        t_loop = Task(task_name='Loop')
+        t_loop.register_function(function=CountDownFunction(), success_task=t_loop, err_task=None)
+        wf = WorkFlow(workflow_name='Loop', starter_task=t_loop)
+        compiled = wf.compile()
+        self.assertEqual([[task.task_name for task in cycle] for cycle in compiled.cycles], [['Loop']])
+        result = wf.run_workflow(input_result=Result(result_obj={'Count': 5000}))
+        self.assertEqual(result.result_obj['Steps'], 5000)
+        wf = WorkFlow(workflow_name='Fail', starter_task=t_fail)
+        wf.compile()
+        self.assertEqual(wf.run_workflow().result_obj['Handled'], 'Failed on purpose')
+
+    def test_uncompiled_links_entries_positive001(self):
+        wf, t1, t2 = self.get_linear_workflow()
+        graph = _RunLocalGraph()
+        entry = graph.entry_for(t1)
+        next_entry = graph.next_entry(entry, Result(result_obj={}))
+        self.assertIs(next_entry.task, t2)
+        self.assertIs(entry.success_entry, next_entry)
+        self.assertIs(graph.next_entry(entry, Result(result_obj={})), next_entry)
+        self.assertIsNone(entry.err_entry)
+        self.assertEqual(wf.run_workflow().result_obj, {'Message': 'Hello World', 'Variable': 10})
+
+    def test_compiled_override_outside_graph_positive001(self):
+        t = Task(task_name='Task 1')
+        t.register_function(function=TaskOverridingSuccessTask(), success_task=None, err_task=None)
+        wf = WorkFlow(workflow_name='Override', starter_task=t)
+        wf.compile()
+        result = wf.run_workflow()
+        self.assertTrue(result.result_obj['Dumped'])
+
+    def test_compile_reports_problems_negative001(self):
+        t3 = Task(task_name='Task 3')
+        t2 = Task(task_name='Task 2')
+        t1 = Task(task_name='Task 1')
+        t1.register_function(function=PrintFunction(), success_task=t2, err_task=None)
+        t2.register_function(function=PrintFunction(), success_task=t1, err_task=None)
+        unregistered = Task(task_name='No Function')
+        t2.err_task = unregistered
+        wf = WorkFlow(workflow_name='Broken', starter_task=t1)
+        with self.assertRaises(WorkFlowCompileError) as cm:
+            wf.compile(tasks=[t1, t2, t3], allow_cycles=False)
+        problems = cm.exception.problems
+        self.assertIn('Task No Function has no Function registered', problems)
+        self.assertIn('Task Task 3 is not reachable from the starter Task', problems)
+        self.assertIn('Cycle detected: Task 1 -> Task 2', problems)
+        self.assertIsNone(wf.compiled)
+
+    def test_compile_walks_globals_and_branches_positive001(self):
+        t_branch = Task(task_name='Branch')
+        t_branch.register_function(function=SetVariableFunction(), success_task=None, err_task=None)
+        t_target = Task(task_name='Override Target')
+        t_target.register_function(function=SetVariableFunction(), success_task=None, err_task=None)
+        t_parallel = ParallelTask(task_name='Parallel')
+        t_parallel.register_branches(branch_tasks=[t_branch], success_task=None, err_task=None, globals_dict={'Target': t_target})
+        compiled = WorkFlow(workflow_name='Walk', starter_task=t_parallel).compile(tasks=[t_branch, t_target])
+        self.assertEqual(sorted(entry.task_name for entry in compiled.entries), ['Branch', 'Override Target', 'Parallel'])
+
+    def test_compiled_workflow_pickles_positive001(self):
+        wf, _, _ = self.get_linear_workflow()
+        wf.compile()
+        wf = pickle.loads(pickle.dumps(wf))
+        self.assertEqual(wf.run_workflow().result_obj['Variable'], 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+import warnings
+from unittest import mock
+from pytaskflow.taskflow_engine import Function, Result, WorkFlowCompileError
+from pytaskflow.definition import build_workflow, load_workflow, import_object, yaml
+from pytaskflow.policy import TaskPolicy
+
+
+class MultiplyFunction(Function):
+    def __init__(self, factor=2):
+        super(MultiplyFunction, self).__init__()
+        self.factor = factor
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        value = input_result.result_obj['Value'] * self.factor
+        if value > globals_dict.get('Limit', 1000):
+            return Result(result_obj={'Value': value}, is_error=True, err_msg='too large')
+        if value < globals_dict.get('Target', 0):
+            return Result(result_obj={'Value': value}, override_success_task=globals_dict['LoopTask'])
+        return Result(result_obj={'Value': value, 'Max': globals_dict['Max']([value, 1])})
+
+
+class RecordErrorFunction(Function):
+    def __init__(self):
+        super(RecordErrorFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj={'Error': input_result.err_msg}, stop=True)
+
+
+def get_definition():
+    return {
+        'workflow_name': 'Multiply',
+        'starter_task': 'double',
+        'tasks': {
+            'double': {
+                'task_name': 'Double Until Target',
+                'function': 'tests.test_definition:MultiplyFunction',
+                'success_task': 'triple',
+                'err_task': 'error',
+                'globals': {'LoopTask': {'$task': 'double'}, 'Max': {'$import': 'builtins.max'}, 'Target': 10},
+            },
+            'triple': {
+                'function': 'tests.test_definition.MultiplyFunction',
+                'function_args': {'factor': 3},
+                'err_task': 'error',
+                'globals': {'Limit': 50, 'Max': {'$import': 'builtins:max'}},
+                'policy': {'max_retries': 2, 'backoff': 0.01, 'circuit_breaker': {'failure_threshold': 3}},
+            },
+            'error': {
+                'function': 'tests.test_definition:RecordErrorFunction',
+            },
+        },
+    }
+
+
+class DefinitionTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_definition(self, definition, filename='workflow.json'):
+        path = os.path.join(self.directory, filename)
+        with open(path, 'w') as f:
+            json.dump(definition, f)
+        return path
+
+    def test_build_workflow_positive001(self):
+        workflow = build_workflow(get_definition())
+        self.assertIsNotNone(workflow.compiled)
+        self.assertEqual(len(workflow.compiled.entries), 3)
+        self.assertEqual(workflow.run_workflow(input_result=Result(result_obj={'Value': 1})).result_obj, {'Value': 48, 'Max': 48})
+        self.assertEqual(workflow.run_workflow(input_result=Result(result_obj={'Value': 9})).result_obj, {'Error': 'too large'})
+        triple = workflow.compiled.entries[1].task
+        self.assertEqual(triple.task_name, 'triple')
+        self.assertIsInstance(triple.policy, TaskPolicy)
+        self.assertEqual(triple.policy.circuit_breaker.failure_threshold, 3)
+
+    def test_load_workflow_cache_positive001(self):
+        path = self.write_definition(get_definition())
+        cache_dir = os.path.join(self.directory, 'cache')
+        load_workflow(path, cache_dir=cache_dir)
+        with mock.patch('pytaskflow.definition.build_workflow', side_effect=Exception('not cached')):
+            workflow = load_workflow(path, cache_dir=cache_dir)
+        self.assertEqual(workflow.run_workflow(input_result=Result(result_obj={'Value': 1})).result_obj['Value'], 48)
+        self.assertEqual(workflow.compiled.entry_for(workflow.starter_task).task_id, 0)
+        definition = get_definition()
+        definition['tasks']['double']['globals']['Target'] = 0
+        self.write_definition(definition)
+        workflow = load_workflow(path, cache_dir=cache_dir)
+        self.assertEqual(workflow.run_workflow(input_result=Result(result_obj={'Value': 1})).result_obj['Value'], 6)
+
+    def test_load_workflow_cache_permissions_negative001(self):
+        path = self.write_definition(get_definition())
+        cache_dir = os.path.join(self.directory, 'new', 'cache')
+        load_workflow(path, cache_dir=cache_dir)
+        self.assertEqual(stat.S_IMODE(os.stat(cache_dir).st_mode), 0o700)
+        os.chmod(cache_dir, 0o777)
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            with mock.patch('pytaskflow.definition.build_workflow', wraps=build_workflow) as build:
+                workflow = load_workflow(path, cache_dir=cache_dir)
+        # The cached WorkFlow is not loaded from a directory other users can write to
+        self.assertEqual(build.call_count, 1)
+        self.assertIn('mode 0700', str(caught[0].message))
+        self.assertEqual(workflow.run_workflow(input_result=Result(result_obj={'Value': 1})).result_obj['Value'], 48)
+
+    def test_example_definition_positive001(self):
+        workflow = load_workflow(os.path.join('examples', 'example01', 'workflow.json'), cache_dir=None)
+        self.assertEqual(workflow.workflow_name, 'Example Workflow')
+        self.assertEqual(len(workflow.compiled.entries), 5)
+
+    @unittest.skipIf(yaml is None, 'PyYAML is not installed')
+    def test_yaml_definition_positive001(self):
+        path = os.path.join(self.directory, 'workflow.yaml')
+        with open(path, 'w') as f:
+            yaml.safe_dump(get_definition(), f)
+        workflow = load_workflow(path, cache_dir=None)
+        self.assertEqual(workflow.run_workflow(input_result=Result(result_obj={'Value': 1})).result_obj['Value'], 48)
+
+    def test_invalid_definition_negative001(self):
+        definition = get_definition()
+        definition['tasks']['double']['success_task'] = 'missing'
+        definition['tasks']['triple']['function'] = 'tests.test_definition:NoSuchFunction'
+        definition['tasks']['error']['function'] = 'builtins:dict'
+        with self.assertRaises(WorkFlowCompileError) as context:
+            build_workflow(definition)
+        problems = context.exception.problems
+        self.assertEqual(len(problems), 3)
+        self.assertIn('there is no task named missing', problems[0])
+        with self.assertRaises(WorkFlowCompileError):
+            build_workflow({'tasks': {'a': {'function': 'tests.test_definition:RecordErrorFunction'}}})
+        with self.assertRaises(WorkFlowCompileError):
+            build_workflow({'starter_task': 'a', 'tasks': {}})
+        with self.assertRaises(Exception):
+            import_object('nodots')
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
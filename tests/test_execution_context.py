@@ -0,0 +1,84 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow, ExecutionContext
+
+
+class MultiplyFunction(Function):
+    """
+    Sets self.result (the classic style) and yields the thread half way through to provoke interleaving
+    """
+    def __init__(self):
+        super(MultiplyFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        value = input_result.result_obj['Value']
+        time.sleep(0)
+        self.result = Result(result_obj={'Value': value, 'Multiplied': value * 2})
+
+
+class AddFunction(Function):
+    """
+    Returns the Result instead of setting self.result
+    """
+    def __init__(self):
+        super(AddFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        ro = dict(input_result.result_obj)
+        time.sleep(0)
+        ro['Added'] = ro['Multiplied'] + globals_dict['Increment']
+        return Result(result_obj=ro)
+
+
+def get_workflow():
+    t2 = Task(task_name='Add')
+    t2.register_function(function=AddFunction(), success_task=None, err_task=None, globals_dict={'Increment': 1})
+    t1 = Task(task_name='Multiply')
+    t1.register_function(function=MultiplyFunction(), success_task=t2, err_task=None)
+    return WorkFlow(workflow_name='Concurrent Workflow', starter_task=t1)
+
+
+class ExecutionContextTests(unittest.TestCase):
+    def test_context_records_run_positive001(self):
+        wf = get_workflow()
+        context = wf.new_context(run_id='run-1')
+        result = wf.run_workflow(input_result=Result(result_obj={'Value': 3}), context=context)
+        self.assertEqual(result.result_obj['Added'], 7)
+        self.assertEqual(context.run_id, 'run-1')
+        self.assertEqual(context.workflow_name, 'Concurrent Workflow')
+        self.assertEqual(list(context.trace), ['Multiply', 'Add'])
+        self.assertEqual(context.step_count, 2)
+        self.assertEqual(context.results['Multiply'].result_obj['Multiplied'], 6)
+        self.assertIs(context.result, result)
+
+    def test_context_unique_run_ids_positive001(self):
+        self.assertNotEqual(ExecutionContext().run_id, ExecutionContext().run_id)
+
+    def test_run_workflow_does_not_touch_graph_positive001(self):
+        wf = get_workflow()
+        wf.run_workflow(input_result=Result(result_obj={'Value': 1}))
+        self.assertIsNone(wf.starter_task.task_result)
+
+    def test_concurrent_runs_are_isolated_positive001(self):
+        wf = get_workflow()
+
+        def run(value):
+            context = wf.new_context()
+            result = wf.run_workflow(input_result=Result(result_obj={'Value': value}), context=context)
+            return value, result, context
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            outcomes = list(pool.map(run, range(2000)))
+        self.assertEqual(len(set(context.run_id for _, _, context in outcomes)), 2000)
+        for value, result, context in outcomes:
+            self.assertEqual(result.result_obj['Value'], value)
+            self.assertEqual(result.result_obj['Multiplied'], value * 2)
+            self.assertEqual(result.result_obj['Added'], value * 2 + 1)
+            self.assertEqual(context.results['Multiply'].result_obj['Value'], value)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from pytaskflow.taskflow_engine import Result, Task, WorkFlow
+from pytaskflow.instrumentation import Instrumentation, TaskStatsAggregator
+from tests.test_simple import CountDownFunction, FailingFunction, ErrorHandlerFunction, PrintFunction
+
+
+class RecordingHook(Instrumentation):
+    def __init__(self):
+        self.calls = []
+
+    def before_task(self, event):
+        self.calls.append(('before', event.task_name, event.run_id))
+
+    def after_task(self, event):
+        self.calls.append(('after', event.task_name, event.result_size, event.wall_time >= 0))
+
+    def on_error(self, event):
+        self.calls.append(('error', event.task_name, event.exception is not None))
+
+
+class BrokenHook(Instrumentation):
+    def before_task(self, event):
+        raise Exception('Broken hook')
+
+
+class ExplodingFunction(PrintFunction):
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        raise ValueError('Boom')
+
+
+def get_error_workflow():
+    t_err = Task(task_name='Error Task')
+    t_err.register_function(function=ErrorHandlerFunction(), success_task=None, err_task=None)
+    t = Task(task_name='Fail')
+    t.register_function(function=FailingFunction(), success_task=None, err_task=t_err)
+    return WorkFlow(workflow_name='Error Workflow', starter_task=t)
+
+
+class InstrumentationTests(unittest.TestCase):
+    def test_hooks_called_in_order_positive001(self):
+        wf = get_error_workflow()
+        hook = RecordingHook()
+        wf.executor.add_hook(hook)
+        context = wf.new_context(run_id='run-7')
+        wf.run_workflow(context=context)
+        self.assertEqual(hook.calls, [
+            ('before', 'Fail', 'run-7'),
+            ('after', 'Fail', 1, True),
+            ('error', 'Fail', False),
+            ('before', 'Error Task', 'run-7'),
+            ('after', 'Error Task', 2, True),
+        ])
+        wf.executor.remove_hook(hook)
+        self.assertEqual(wf.executor.hooks, [])
+
+    def test_hooks_see_exceptions_negative001(self):
+        t = Task(task_name='Explode')
+        t.register_function(function=ExplodingFunction(), success_task=None, err_task=None)
+        wf = WorkFlow(workflow_name='Explode', starter_task=t)
+        hook = RecordingHook()
+        wf.executor.add_hook(hook)
+        with self.assertRaises(ValueError):
+            wf.run_workflow()
+        self.assertEqual(hook.calls[-1], ('error', 'Explode', True))
+
+    def test_broken_hook_does_not_break_run_negative001(self):
+        wf = get_error_workflow()
+        wf.executor.add_hook(BrokenHook())
+        with self.assertWarns(UserWarning):
+            result = wf.run_workflow()
+        self.assertEqual(result.result_obj['Handled'], 'Failed on purpose')
+
+    def test_aggregator_positive001(self):
+        t = Task(task_name='Count Down')
+        t.register_function(function=CountDownFunction(), success_task=t, err_task=None)
+        wf = WorkFlow(workflow_name='Loop', starter_task=t)
+        aggregator = TaskStatsAggregator()
+        wf.executor.add_hook(aggregator)
+        wf.run_workflow(input_result=Result(result_obj={'Count': 500}))
+        asyncio.run(wf.run_workflow_async(input_result=Result(result_obj={'Count': 10})))
+        stats = aggregator.snapshot()['Count Down']
+        self.assertEqual(stats['count'], 510)
+        self.assertEqual(stats['error_count'], 0)
+        self.assertEqual(stats['result_size_mean'], 2)
+        self.assertLessEqual(stats['wall_min'], stats['percentiles']['p50'])
+        self.assertLessEqual(stats['percentiles']['p50'], stats['percentiles']['p99'])
+        self.assertLessEqual(stats['percentiles']['p99'], stats['wall_max'])
+        filename = os.path.join(tempfile.mkdtemp(), 'stats.json')
+        aggregator.dump(filename)
+        with open(filename) as f:
+            self.assertEqual(json.load(f)['Count Down']['count'], 510)
+        aggregator.reset()
+        self.assertEqual(aggregator.snapshot(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
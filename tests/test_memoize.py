@@ -0,0 +1,160 @@
+import functools
+import pickle
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from pytaskflow.taskflow_engine import Function, AsyncFunction, Result, Task, WorkFlow, FileBasedSessionPersistence
+from pytaskflow.session_store import FileSessionStore
+from pytaskflow.memoize import MemoizedFunction, memoize
+
+
+class SquareFunction(Function):
+    """
+    A pure Function that counts how often it really runs
+    """
+    calls = 0
+
+    def __init__(self):
+        super(SquareFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        SquareFunction.calls += 1
+        number = input_result.result_obj['Number']
+        if number < 0:
+            return Result(result_obj={}, is_error=True, err_msg='negative number')
+        return Result(result_obj={'Number': number, 'Square': number * number, 'Tags': []}, stop=True)
+
+
+@memoize(max_entries=2)
+class DecoratedSquareFunction(SquareFunction):
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        SquareFunction.calls += 1
+        # Set self.result instead of returning it, like older Functions do
+        self.result = Result(result_obj={'Square': input_result.result_obj['Number'] ** 2})
+
+
+class OverrideFunction(Function):
+    """
+    Routes to the Task it was created with by overriding the success_task
+    """
+    def __init__(self, next_task):
+        super(OverrideFunction, self).__init__()
+        self.next_task = next_task
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj=input_result.result_obj, override_success_task=self.next_task)
+
+
+class MemoizedFunctionTests(unittest.TestCase):
+    def setUp(self):
+        SquareFunction.calls = 0
+
+    def test_hits_skip_execution_positive001(self):
+        function = MemoizedFunction(SquareFunction(), max_entries=10)
+        for _ in range(3):
+            result = function.execute(input_result=Result(result_obj={'Number': 3}))
+            self.assertEqual(result.result_obj['Square'], 9)
+        function.execute(input_result=Result(result_obj={'Number': 4}))
+        self.assertEqual(SquareFunction.calls, 2)
+        stats = function.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (2, 2, 2))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_cached_results_are_copied_positive001(self):
+        function = MemoizedFunction(SquareFunction())
+        function.execute(input_result=Result(result_obj={'Number': 3})).result_obj['Tags'].append('changed')
+        result = function.execute(input_result=Result(result_obj={'Number': 3}))
+        self.assertEqual(result.result_obj['Tags'], [])
+        result.result_obj['Square'] = 0
+        self.assertEqual(function.execute(input_result=Result(result_obj={'Number': 3})).result_obj['Square'], 9)
+
+    def test_shared_result_obj_keeps_overrides_positive001(self):
+        t_next = Task(task_name='Next')
+        t_next.register_function(function=SquareFunction(), success_task=None, err_task=None)
+        function = MemoizedFunction(OverrideFunction(t_next), copy_results=False)
+        t_first = Task(task_name='First')
+        t_first.register_function(function=function, success_task=None, err_task=None)
+        workflow = WorkFlow(workflow_name='Override', starter_task=t_first)
+        workflow.compile()
+        for _ in range(3):
+            # The executor clears the overrides of the Result it routes on - never those of the cached Result
+            context = workflow.new_context()
+            workflow.run_workflow(input_result=Result(result_obj={'Number': 3}), context=context)
+            self.assertEqual(list(context.trace), ['First', 'Next'])
+        self.assertEqual(function.stats()['hits'], 2)
+
+    def test_overrides_not_persisted_negative001(self):
+        directory = tempfile.mkdtemp()
+        try:
+            factory = functools.partial(FileBasedSessionPersistence, store=FileSessionStore(root_dir=directory))
+            t_next = Task(task_name='Next')
+            t_next.register_function(function=SquareFunction(), success_task=None, err_task=None)
+            function = MemoizedFunction(OverrideFunction(t_next), persistence_factory=factory)
+            function.execute(input_result=Result(result_obj={'Number': 3}))
+            other = MemoizedFunction(OverrideFunction(t_next), persistence_factory=factory)
+            # Not found in the store: the Function runs again and the override is kept
+            self.assertIs(other.execute(input_result=Result(result_obj={'Number': 3})).override_success_task, t_next)
+            self.assertEqual(other.stats()['persistent_hits'], 0)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_unpicklable_input_negative001(self):
+        function = MemoizedFunction(SquareFunction())
+        for _ in range(2):
+            result = function.execute(input_result=Result(result_obj={'Number': 3, 'Lock': threading.Lock()}))
+            self.assertEqual(result.result_obj['Square'], 9)
+        self.assertEqual(SquareFunction.calls, 2)
+        self.assertEqual((function.stats()['uncached'], function.stats()['misses']), (2, 0))
+
+    def test_key_func_ttl_and_errors_positive001(self):
+        function = MemoizedFunction(SquareFunction(), ttl=0.05, key_func=lambda result_obj: str(abs(result_obj['Number'])))
+        function.execute(input_result=Result(result_obj={'Number': 2}))
+        self.assertEqual(function.execute(input_result=Result(result_obj={'Number': 2, 'Ignored': 1})).result_obj['Square'], 4)
+        self.assertEqual(SquareFunction.calls, 1)
+        time.sleep(0.1)
+        function.execute(input_result=Result(result_obj={'Number': 2}))
+        self.assertEqual(SquareFunction.calls, 2)
+        function = MemoizedFunction(SquareFunction())
+        for _ in range(2):
+            self.assertTrue(function.execute(input_result=Result(result_obj={'Number': -1})).is_error)
+        self.assertEqual(SquareFunction.calls, 4)
+
+    def test_persistence_shares_results_positive001(self):
+        directory = tempfile.mkdtemp()
+        try:
+            store = FileSessionStore(root_dir=directory)
+            factory = functools.partial(FileBasedSessionPersistence, store=store)
+            MemoizedFunction(SquareFunction(), persistence_factory=factory).execute(input_result=Result(result_obj={'Number': 5}))
+            other = pickle.loads(pickle.dumps(MemoizedFunction(SquareFunction(), persistence_factory=factory)))
+            self.assertEqual(other.execute(input_result=Result(result_obj={'Number': 5})).result_obj['Square'], 25)
+            self.assertEqual(SquareFunction.calls, 1)
+            self.assertEqual(other.stats()['persistent_hits'], 1)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_decorator_in_workflow_positive001(self):
+        task = Task(task_name='Square')
+        task.register_function(function=DecoratedSquareFunction(), success_task=None, err_task=None)
+        workflow = WorkFlow(workflow_name='Memoize', starter_task=task)
+        for number in (2, 2, 3, 2):
+            result = workflow.run_workflow(input_result=Result(result_obj={'Number': number}))
+            self.assertEqual(result.result_obj['Square'], number * number)
+        self.assertEqual(SquareFunction.calls, 2)
+        self.assertEqual(DecoratedSquareFunction.memo.stats()['hits'], 2)
+
+    def test_async_function_negative001(self):
+        class SleepFunction(AsyncFunction):
+            async def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+                return input_result
+        with self.assertRaises(Exception):
+            MemoizedFunction(SleepFunction())
+        with self.assertRaises(Exception):
+            MemoizedFunction(object())
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -0,0 +1,118 @@
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
+from pytaskflow.instrumentation import TaskStatsAggregator
+from pytaskflow.parallel import ParallelTask, merge_by_branch, COLLECT_ALL
+
+
+class SlowFetchFunction(Function):
+    def __init__(self, key, fail=False):
+        super(SlowFetchFunction, self).__init__()
+        self.key = key
+        self.fail = fail
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        time.sleep(0.2)
+        if self.fail:
+            return Result(result_obj={}, is_error=True, err_msg='{} failed'.format(self.key))
+        ro = input_result.result_obj
+        ro[self.key] = ro['Id']
+        return Result(result_obj=ro)
+
+
+class CollectFunction(Function):
+    def __init__(self):
+        super(CollectFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        ro = dict(input_result.result_obj)
+        ro['Collected'] = True
+        return Result(result_obj=ro, is_error=input_result.is_error, err_msg=input_result.err_msg)
+
+
+def get_branch(key, fail=False):
+    t = Task(task_name='Fetch {}'.format(key))
+    t.register_function(function=SlowFetchFunction(key=key, fail=fail), success_task=None, err_task=None)
+    return t
+
+
+def get_workflow(fail=(), **kwargs):
+    t_done = Task(task_name='Done')
+    t_done.register_function(function=CollectFunction(), success_task=None, err_task=None)
+    t_err = Task(task_name='Error')
+    t_err.register_function(function=CollectFunction(), success_task=None, err_task=None)
+    t = ParallelTask(task_name='Fetch All', **kwargs)
+    t.register_branches(branch_tasks=[get_branch(key, key in fail) for key in ('A', 'B', 'C')], success_task=t_done, err_task=t_err)
+    return WorkFlow(workflow_name='Parallel Workflow', starter_task=t)
+
+
+class ParallelTaskTests(unittest.TestCase):
+    def test_branches_run_concurrently_positive001(self):
+        wf = get_workflow()
+        started = time.monotonic()
+        result = wf.run_workflow(input_result=Result(result_obj={'Id': 5}))
+        elapsed = time.monotonic() - started
+        self.assertEqual(result.result_obj, {'Id': 5, 'A': 5, 'B': 5, 'C': 5, 'Collected': True})
+        self.assertLess(elapsed, 0.5)
+
+    def test_merge_by_branch_positive001(self):
+        result = get_workflow(merge_policy=merge_by_branch).run_workflow(input_result=Result(result_obj={'Id': 1}))
+        self.assertEqual(result.result_obj['Fetch B'], {'Id': 1, 'B': 1})
+
+    def test_fail_fast_negative001(self):
+        result = get_workflow(fail=('B',)).run_workflow(input_result=Result(result_obj={'Id': 1}))
+        self.assertTrue(result.is_error)
+        self.assertEqual(result.err_msg, 'B failed')
+        self.assertTrue(result.result_obj['Collected'])
+
+    def test_collect_all_negative001(self):
+        result = get_workflow(fail=('A', 'C'), error_policy=COLLECT_ALL).run_workflow(input_result=Result(result_obj={'Id': 1}))
+        self.assertTrue(result.is_error)
+        self.assertEqual(result.result_obj['Errors'], {'Fetch A': 'A failed', 'Fetch C': 'C failed'})
+
+    def test_run_async_positive001(self):
+        result = asyncio.run(get_workflow().run_workflow_async(input_result=Result(result_obj={'Id': 2})))
+        self.assertEqual(result.result_obj['C'], 2)
+
+    def test_branches_join_the_run_positive001(self):
+        wf = get_workflow()
+        wf.compile()
+        stats = TaskStatsAggregator()
+        wf.executor.add_hook(stats)
+        for run in (wf.run_workflow, lambda **kwargs: asyncio.run(wf.run_workflow_async(**kwargs))):
+            context = wf.new_context(run_id='parent')
+            run(input_result=Result(result_obj={'Id': 3}), context=context)
+            # Branch steps are recorded in the run, in branch order, before the join
+            self.assertEqual(list(context.trace), ['Fetch A', 'Fetch B', 'Fetch C', 'Fetch All', 'Done'])
+            self.assertEqual(context.step_count, 5)
+            self.assertEqual(context.results['Fetch B'].result_obj['B'], 3)
+        # The hooks of the WorkFlow see the branch Tasks
+        self.assertEqual(stats.snapshot()['Fetch A']['count'], 2)
+
+    def test_concurrent_runs_positive001(self):
+        wf = get_workflow()
+        task = wf.starter_task
+        with ThreadPoolExecutor(max_workers=4) as callers:
+            started = time.monotonic()
+            results = list(callers.map(lambda i: wf.run_workflow(input_result=Result(result_obj={'Id': i})), range(4)))
+            elapsed = time.monotonic() - started
+        self.assertEqual([result.result_obj['A'] for result in results], list(range(4)))
+        # Room for the branches of every run: the runs do not wait for each other
+        self.assertLess(elapsed, 0.6)
+        self.assertEqual(task._own_executor._max_workers, 24)
+        task.close()
+        self.assertIsNone(task._own_executor)
+        self.assertEqual(wf.run_workflow(input_result=Result(result_obj={'Id': 1})).result_obj['C'], 1)
+        task.close()
+
+    def test_invalid_error_policy_negative001(self):
+        with self.assertRaises(Exception):
+            ParallelTask(task_name='Bad', error_policy='ignore')
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -0,0 +1,201 @@
+import asyncio
+import pickle
+import threading
+import time
+import unittest
+from pytaskflow.taskflow_engine import AsyncFunction, Function, Result, Task, WorkFlow
+from pytaskflow.policy import TaskPolicy, CircuitBreaker, TaskTimeoutError, TaskPoolSaturatedError, CLOSED, OPEN
+
+
+class FlakyFunction(Function):
+    """
+    Raises for the first `failures` calls
+    """
+    def __init__(self, failures, exception_class=ConnectionError):
+        super(FlakyFunction, self).__init__()
+        self.failures = failures
+        self.exception_class = exception_class
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        with self.lock:
+            self.calls += 1
+            calls = self.calls
+        if calls <= self.failures:
+            raise self.exception_class('call {} failed'.format(calls))
+        return Result(result_obj={'Calls': calls})
+
+
+class SlowFunction(Function):
+    def __init__(self):
+        super(SlowFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        time.sleep(input_result.result_obj.get('Sleep', 1.0))
+        return Result(result_obj={'Slept': True})
+
+
+class LateWriteFunction(Function):
+    def __init__(self):
+        super(LateWriteFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        time.sleep(0.1)
+        input_result.result_obj['Late'] = True
+        return Result(result_obj=input_result.result_obj)
+
+
+class SlowAsyncFunction(AsyncFunction):
+    async def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        await asyncio.sleep(1.0)
+        return Result(result_obj={'Slept': True})
+
+
+class ErrorFunction(Function):
+    def __init__(self):
+        super(ErrorFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj={'Handled': input_result.err_msg}, stop=True)
+
+
+def get_workflow(function, policy):
+    error_task = Task(task_name='Handle Error')
+    error_task.register_function(function=ErrorFunction(), success_task=None, err_task=None)
+    task = Task(task_name='Call Service')
+    task.register_function(function=function, success_task=None, err_task=error_task)
+    task.set_policy(policy)
+    return WorkFlow(workflow_name='Policy', starter_task=task)
+
+
+class TaskPolicyTests(unittest.TestCase):
+    def test_retries_transient_failures_positive001(self):
+        function = FlakyFunction(failures=2)
+        policy = TaskPolicy(max_retries=3, backoff=0.001)
+        workflow = get_workflow(function, policy)
+        workflow.compile()
+        self.assertEqual(workflow.run_workflow().result_obj, {'Calls': 3})
+        self.assertEqual(policy.stats()['retries'], 2)
+
+    def test_exhausted_retries_route_to_err_task_positive001(self):
+        policy = TaskPolicy(max_retries=1, backoff=0.001)
+        result = get_workflow(FlakyFunction(failures=5), policy).run_workflow()
+        self.assertIn('failed after 2 attempt(s): ConnectionError: call 2 failed', result.result_obj['Handled'])
+        function = FlakyFunction(failures=5, exception_class=KeyError)
+        get_workflow(function, TaskPolicy(max_retries=3, backoff=0.001, retry_on=(ConnectionError,))).run_workflow()
+        self.assertEqual(function.calls, 1)
+
+    def test_backoff_delay_positive001(self):
+        policy = TaskPolicy(backoff=1.0, backoff_factor=2.0, max_backoff=5.0, jitter=0.5)
+        for attempt, longest in ((0, 1.0), (1, 2.0), (2, 4.0), (5, 5.0)):
+            delay = policy.backoff_delay(attempt)
+            self.assertTrue(longest / 2 <= delay <= longest, (attempt, delay))
+
+    def test_timeout_positive001(self):
+        policy = TaskPolicy(timeout=0.05)
+        started = time.perf_counter()
+        result = get_workflow(SlowFunction(), policy).run_workflow()
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertIn('TaskTimeoutError', result.result_obj['Handled'])
+        self.assertEqual(policy.stats()['timeouts'], 1)
+        result = get_workflow(SlowFunction(), policy).run_workflow(input_result=Result(result_obj={'Sleep': 0}))
+        self.assertEqual(result.result_obj, {'Slept': True})
+        policy.close()
+
+    def test_async_timeout_positive001(self):
+        workflow = get_workflow(SlowAsyncFunction(), TaskPolicy(timeout=0.05))
+        started = time.perf_counter()
+        result = asyncio.run(workflow.run_workflow_async())
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertIn('timed out after 0.05s', result.result_obj['Handled'])
+
+    def test_timed_out_attempt_input_positive001(self):
+        # An attempt that timed out keeps running, but only ever changes its own copy of the result_obj
+        policy = TaskPolicy(timeout=0.02, max_retries=1, backoff=0.001)
+        result_obj = {'Value': 1}
+        get_workflow(LateWriteFunction(), policy).run_workflow(input_result=Result(result_obj=result_obj))
+        time.sleep(0.3)
+        self.assertEqual(result_obj, {'Value': 1})
+        self.assertEqual(policy.stats()['timeouts'], 2)
+        policy.close()
+
+    def test_saturated_pool_negative001(self):
+        policy = TaskPolicy(timeout=0.05, timeout_workers=1)
+        workflow = get_workflow(SlowFunction(), policy)
+        workflow.run_workflow(input_result=Result(result_obj={'Sleep': 0.3}))
+        # The only thread still runs the hung attempt: the next one is refused instead of timing out in the queue
+        started = time.perf_counter()
+        result = workflow.run_workflow(input_result=Result(result_obj={'Sleep': 0}))
+        self.assertLess(time.perf_counter() - started, 0.05)
+        self.assertIn('TaskPoolSaturatedError', result.result_obj['Handled'])
+        self.assertEqual((policy.stats()['timeouts'], policy.stats()['saturated']), (1, 1))
+        time.sleep(0.35)
+        self.assertEqual(workflow.run_workflow(input_result=Result(result_obj={'Sleep': 0})).result_obj, {'Slept': True})
+        self.assertIn('2 timeout_workers', str(TaskPoolSaturatedError('Slow', 2)))
+        policy.close()
+
+    def test_circuit_breaker_positive001(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.1)
+        function = FlakyFunction(failures=2)
+        policy = TaskPolicy(circuit_breaker=breaker)
+        workflow = get_workflow(function, policy)
+        for _ in range(2):
+            workflow.run_workflow()
+        self.assertEqual(breaker.state, OPEN)
+        result = workflow.run_workflow()
+        self.assertIn('circuit is open', result.result_obj['Handled'])
+        self.assertEqual(function.calls, 2)
+        time.sleep(0.15)
+        self.assertEqual(workflow.run_workflow().result_obj, {'Calls': 3})
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(policy.stats()['short_circuits'], 1)
+
+    def test_circuit_breaker_half_open_negative001(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker.open_count, 2)
+
+    def test_retry_error_results_positive001(self):
+        class ErrorOnceFunction(FlakyFunction):
+            def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+                self.calls += 1
+                return Result(result_obj={}, is_error=self.calls == 1, err_msg='try again')
+        function = ErrorOnceFunction(failures=0)
+        get_workflow(function, TaskPolicy(max_retries=2, backoff=0.001)).run_workflow()
+        self.assertEqual(function.calls, 1)
+        function = ErrorOnceFunction(failures=0)
+        result = get_workflow(function, TaskPolicy(max_retries=2, backoff=0.001, retry_error_results=True)).run_workflow()
+        self.assertEqual(function.calls, 2)
+        self.assertFalse(result.is_error)
+
+    def test_threads_and_pickle_positive001(self):
+        policy = TaskPolicy(timeout=1.0, max_retries=2, backoff=0.001, circuit_breaker=CircuitBreaker())
+        workflow = get_workflow(FlakyFunction(failures=3), policy)
+        results = list(workflow.run_many([Result(result_obj={}) for _ in range(8)], workers=4, mode='thread', chunk_size=1))
+        self.assertTrue(all(result.result_obj.get('Calls', 0) > 0 for result in results))
+        self.assertEqual(policy.stats()['calls'], 8)
+        copied = pickle.loads(pickle.dumps(policy))
+        self.assertEqual((copied.timeout, copied.stats()['calls'], copied.circuit_breaker.state), (1.0, 0, CLOSED))
+        policy.close()
+
+    def test_invalid_policy_negative001(self):
+        with self.assertRaises(Exception):
+            TaskPolicy(max_retries=-1)
+        with self.assertRaises(Exception):
+            TaskPolicy(jitter=2)
+        with self.assertRaises(Exception):
+            CircuitBreaker(failure_threshold=0)
+        self.assertIn('1.5s', str(TaskTimeoutError('Slow', 1.5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
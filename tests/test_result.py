@@ -0,0 +1,90 @@
+import copy
+import pickle
+import unittest
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow, FrozenDict, CopyOnWriteDict, freeze
+from pytaskflow.serialization import get_codec
+
+
+class CountUpFunction(Function):
+    """
+    Changes its input result_obj in place, like FunkyLooperFunction
+    """
+    def __init__(self):
+        super(CountUpFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        input_result.result_obj['Count'] += 1
+        return Result(result_obj=input_result.result_obj, stop=input_result.result_obj['Count'] >= 10)
+
+
+class ResultTests(unittest.TestCase):
+    def test_slots_positive001(self):
+        result = Result(result_obj=None)
+        self.assertEqual(result.result_obj, {})
+        self.assertFalse(hasattr(result, '__dict__'))
+        with self.assertRaises(AttributeError):
+            result.extra = 1
+        copied = pickle.loads(pickle.dumps(Result(result_obj={'A': 1}, is_error=True, err_msg='failed')))
+        self.assertEqual((copied.result_obj, copied.is_error, copied.err_msg), ({'A': 1}, True, 'failed'))
+
+    def test_freeze_positive001(self):
+        data = {'A': [1, {'B': 2}], 'C': {3}}
+        result = Result(result_obj=data).freeze()
+        self.assertEqual(result.result_obj, {'A': (1, {'B': 2}), 'C': frozenset([3])})
+        self.assertIsInstance(result.result_obj['A'][1], FrozenDict)
+        data['A'].append(4)
+        self.assertEqual(len(result.result_obj['A']), 2)
+        self.assertIs(copy.deepcopy(result.result_obj), result.result_obj)
+        self.assertEqual(hash(freeze({'A': 1})), hash(freeze({'A': 1})))
+        self.assertIn('A=', str(result))
+
+    def test_frozen_dict_derive_positive001(self):
+        frozen = FrozenDict({'A': 1}, B=[2])
+        changed = frozen.set('A', 10).merge({'C': 3}).delete('B')
+        self.assertEqual(changed, {'A': 10, 'C': 3})
+        self.assertEqual(frozen, {'A': 1, 'B': (2,)})
+        self.assertEqual(frozen.thaw(), {'A': 1, 'B': (2,)})
+        self.assertEqual(pickle.loads(pickle.dumps(frozen)), frozen)
+
+    def test_frozen_dict_negative001(self):
+        frozen = FrozenDict({'A': 1})
+        with self.assertRaises(TypeError):
+            frozen['A'] = 2
+        with self.assertRaises(TypeError):
+            del frozen['A']
+        with self.assertRaises(AttributeError):
+            frozen.update({'A': 2})
+
+    def test_copy_on_write_positive001(self):
+        data = {'A': 1, 'B': 2}
+        shared = CopyOnWriteDict(data)
+        other = shared.copy()
+        self.assertFalse(shared.copied)
+        shared['A'] = 10
+        del other['B']
+        self.assertEqual(data, {'A': 1, 'B': 2})
+        self.assertEqual(shared, {'A': 10, 'B': 2})
+        self.assertEqual(other, {'A': 1})
+        self.assertTrue(shared.copied)
+        self.assertEqual(pickle.loads(pickle.dumps(shared)), {'A': 10, 'B': 2})
+
+    def test_copy_on_write_in_workflow_positive001(self):
+        task = Task(task_name='Count Up')
+        task.register_function(function=CountUpFunction(), success_task=task, err_task=None)
+        workflow = WorkFlow(workflow_name='Count', starter_task=task)
+        start = Result(result_obj={'Count': 0})
+        result = workflow.run_workflow(input_result=start.copy_on_write())
+        self.assertEqual(result.result_obj['Count'], 10)
+        self.assertEqual(start.result_obj, {'Count': 0})
+
+    def test_codecs_positive001(self):
+        result = Result(result_obj=FrozenDict({'A': [1]}))
+        for name in ('pickle', 'json', 'marshal'):
+            codec = get_codec(name)
+            self.assertEqual(codec.decode(codec.encode(result)).result_obj['A'][0], 1, name)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
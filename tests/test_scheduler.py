@@ -0,0 +1,144 @@
+import threading
+import time
+import unittest
+from concurrent.futures import CancelledError
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
+from pytaskflow.scheduler import WorkFlowScheduler, SchedulerFullError, DeadlineExceededError
+
+
+class GateFunction(Function):
+    """
+    Records the order runs start in, counts concurrent runs, and waits for the gate when the input asks for it
+    """
+    def __init__(self):
+        super(GateFunction, self).__init__()
+        self.gate = threading.Event()
+        self.started = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        with self.lock:
+            self.started.append(input_result.result_obj['Name'])
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            if input_result.result_obj.get('Wait'):
+                self.gate.wait(5)
+            if input_result.result_obj.get('Sleep'):
+                time.sleep(input_result.result_obj['Sleep'])
+            if input_result.result_obj.get('Fail'):
+                raise ValueError('failed run')
+        finally:
+            with self.lock:
+                self.active -= 1
+        return Result(result_obj={'Name': input_result.result_obj['Name']}, stop=True)
+
+
+def get_workflow():
+    function = GateFunction()
+    task = Task(task_name='Gate')
+    task.register_function(function=function, success_task=None, err_task=None)
+    return WorkFlow(workflow_name='Gate', starter_task=task), function
+
+
+def wait_until(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition() and time.monotonic() < end:
+        time.sleep(0.005)
+
+
+class SchedulerTests(unittest.TestCase):
+    def test_priorities_positive001(self):
+        workflow, function = get_workflow()
+        with WorkFlowScheduler(workers=1) as scheduler:
+            blocker = scheduler.submit(workflow, Result(result_obj={'Name': 'blocker', 'Wait': True}))
+            wait_until(lambda: function.started == ['blocker'])
+            futures = [
+                scheduler.submit(workflow, Result(result_obj={'Name': 'report'}), priority=10),
+                scheduler.submit(workflow, Result(result_obj={'Name': 'late'}), priority=0, deadline=30),
+                scheduler.submit(workflow, Result(result_obj={'Name': 'any'}), priority=0),
+                scheduler.submit(workflow, Result(result_obj={'Name': 'soon'}), priority=0, deadline=10),
+            ]
+            self.assertEqual(scheduler.stats()['queued_by_priority'], {10: 1, 0: 3})
+            function.gate.set()
+            self.assertEqual(blocker.result().result_obj, {'Name': 'blocker'})
+            self.assertEqual([future.result().result_obj['Name'] for future in futures], ['report', 'late', 'any', 'soon'])
+        self.assertEqual(function.started, ['blocker', 'soon', 'late', 'any', 'report'])
+
+    def test_bounded_concurrency_positive001(self):
+        workflow, function = get_workflow()
+        with WorkFlowScheduler(workers=2) as scheduler:
+            futures = [scheduler.submit(workflow, Result(result_obj={'Name': i, 'Sleep': 0.02})) for i in range(6)]
+            for future in futures:
+                future.result()
+            stats = scheduler.stats()
+        self.assertEqual(function.max_active, 2)
+        self.assertEqual(stats['completed'], 6)
+        self.assertEqual(stats['wait_time']['count'], 6)
+        self.assertGreater(stats['wait_time']['max'], 0.01)
+        self.assertLessEqual(stats['wait_time']['p50'], stats['wait_time']['p99'])
+        self.assertIn(0, stats['wait_time_by_priority'])
+
+    def test_backpressure_block_positive001(self):
+        workflow, function = get_workflow()
+        with WorkFlowScheduler(workers=1, max_queue=1, overflow='block') as scheduler:
+            scheduler.submit(workflow, Result(result_obj={'Name': 'blocker', 'Wait': True}))
+            wait_until(lambda: len(function.started) == 1)
+            scheduler.submit(workflow, Result(result_obj={'Name': 'queued'}))
+            with self.assertRaises(SchedulerFullError):
+                scheduler.submit(workflow, Result(result_obj={'Name': 'too many'}), timeout=0.05)
+            threading.Timer(0.05, function.gate.set).start()
+            future = scheduler.submit(workflow, Result(result_obj={'Name': 'waited'}), timeout=5)
+            self.assertEqual(future.result().result_obj, {'Name': 'waited'})
+            self.assertEqual(scheduler.stats()['rejected'], 1)
+
+    def test_backpressure_reject_negative001(self):
+        workflow, function = get_workflow()
+        with WorkFlowScheduler(workers=1, max_queue=2) as scheduler:
+            scheduler.submit(workflow, Result(result_obj={'Name': 'blocker', 'Wait': True}))
+            wait_until(lambda: len(function.started) == 1)
+            scheduler.submit(workflow, Result(result_obj={'Name': 1}))
+            scheduler.submit(workflow, Result(result_obj={'Name': 2}))
+            with self.assertRaises(SchedulerFullError):
+                scheduler.submit(workflow, Result(result_obj={'Name': 3}))
+            stats = scheduler.stats()
+            self.assertEqual((stats['queued'], stats['max_queued'], stats['running'], stats['rejected']), (2, 2, 1, 1))
+            function.gate.set()
+
+    def test_deadline_negative001(self):
+        workflow, function = get_workflow()
+        with WorkFlowScheduler(workers=1) as scheduler:
+            scheduler.submit(workflow, Result(result_obj={'Name': 'blocker', 'Wait': True}))
+            wait_until(lambda: len(function.started) == 1)
+            future = scheduler.submit(workflow, Result(result_obj={'Name': 'expired'}), deadline=0.01)
+            time.sleep(0.05)
+            function.gate.set()
+            with self.assertRaises(DeadlineExceededError):
+                future.result()
+            self.assertEqual(scheduler.stats()['expired'], 1)
+        self.assertNotIn('expired', function.started)
+
+    def test_failures_and_shutdown_negative001(self):
+        workflow, function = get_workflow()
+        scheduler = WorkFlowScheduler(workers=1)
+        failing = scheduler.submit(workflow, Result(result_obj={'Name': 'fail', 'Fail': True}))
+        with self.assertRaises(ValueError):
+            failing.result()
+        scheduler.submit(workflow, Result(result_obj={'Name': 'blocker', 'Wait': True}))
+        wait_until(lambda: len(function.started) == 2)
+        pending = scheduler.submit(workflow, Result(result_obj={'Name': 'pending'}))
+        threading.Timer(0.05, function.gate.set).start()
+        scheduler.shutdown(wait=True, cancel_pending=True)
+        with self.assertRaises(CancelledError):
+            pending.result()
+        stats = scheduler.stats()
+        self.assertEqual((stats['failed'], stats['cancelled'], stats['completed']), (1, 1, 1))
+        with self.assertRaises(Exception):
+            scheduler.submit(workflow, Result(result_obj={'Name': 'late'}))
+        with self.assertRaises(Exception):
+            WorkFlowScheduler(overflow='drop')
+
+
+# EOF
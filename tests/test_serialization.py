@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pytaskflow.taskflow_engine import Result, Task
+from pytaskflow.serialization import get_codec, encode_tagged, decode_tagged, result_to_wire
+from pytaskflow.session_store import FileSessionStore
+from pytaskflow.sqlite_store import SqliteSessionStore
+
+
+class CodecTests(unittest.TestCase):
+    def test_round_trip_positive001(self):
+        data = {'Run': 'abc', 'Numbers': [1, 2.5, None, True], 'Result': Result(result_obj={'A': [1, 2]}, stop=True)}
+        for name in ('pickle', 'json', 'marshal'):
+            decoded = get_codec(name).decode(get_codec(name).encode(data))
+            self.assertEqual(decoded['Run'], 'abc', name)
+            self.assertEqual(decoded['Numbers'], [1, 2.5, None, True], name)
+            self.assertIsInstance(decoded['Result'], Result, name)
+            self.assertEqual(decoded['Result'].result_obj, {'A': [1, 2]}, name)
+            self.assertTrue(decoded['Result'].stop, name)
+            self.assertFalse(decoded['Result'].is_error, name)
+
+    def test_result_wire_form_drops_override_tasks_positive001(self):
+        task = Task(task_name='Override')
+        result = Result(result_obj={'A': 1}, is_error=True, err_msg='failed', override_success_task=task)
+        self.assertEqual(result_to_wire(result), ({'A': 1}, True, 'failed', False))
+        for name in ('pickle', 'json', 'marshal'):
+            decoded = decode_tagged(encode_tagged(result, name))
+            self.assertIsNone(decoded.override_success_task, name)
+            self.assertEqual(decoded.err_msg, 'failed', name)
+
+    def test_decode_tagged_uses_writing_codec_positive001(self):
+        self.assertEqual(decode_tagged(encode_tagged({'A': 1}, 'json')), {'A': 1})
+        self.assertEqual(decode_tagged(encode_tagged({'A': 1}, 'marshal')), {'A': 1})
+        self.assertEqual(decode_tagged(encode_tagged({'A': 1})), {'A': 1})
+
+    def test_unknown_codec_negative001(self):
+        with self.assertRaises(Exception):
+            get_codec('xml')
+        with self.assertRaises(Exception):
+            decode_tagged(b'?data')
+        with self.assertRaises(TypeError):
+            get_codec('json').encode({'A': object()})
+
+
+class StoreCodecTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_file_store_codecs_positive001(self):
+        json_store = FileSessionStore(root_dir=self.directory, codec='json', compress_threshold=64)
+        json_store.save('a', Result(result_obj={'Text': 'x' * 1000}))
+        self.assertEqual(json_store.load('a').result_obj, {'Text': 'x' * 1000})
+        pickle_store = FileSessionStore(root_dir=self.directory)
+        self.assertEqual(pickle_store.load('a').result_obj, {'Text': 'x' * 1000})
+
+    def test_sqlite_store_codecs_positive001(self):
+        store = SqliteSessionStore(os.path.join(self.directory, 'sessions.db'), codec='marshal')
+        store.save_many({'a': Result(result_obj={'A': 1}), 'b': {'B': (1, 2)}})
+        sessions = store.load_many(['a', 'b'])
+        self.assertEqual(sessions['a'].result_obj, {'A': 1})
+        self.assertEqual(sessions['b'], {'B': (1, 2)})
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
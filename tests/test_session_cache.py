@@ -0,0 +1,234 @@
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from pytaskflow.taskflow_engine import SessionPersistence, FileBasedSessionPersistence
+from pytaskflow.session_store import FileSessionStore
+from pytaskflow.session_cache import SessionCache, CachedSessionPersistence, WRITE_BEHIND
+
+
+class DictSessionPersistence(SessionPersistence):
+    """
+    A custom SessionPersistence that counts how often it is used
+    """
+    storage = {}
+    loads = 0
+    saves = 0
+
+    def get_session_data(self):
+        DictSessionPersistence.loads += 1
+        return DictSessionPersistence.storage.get(self.session_token)
+
+    def save_session_data(self):
+        DictSessionPersistence.saves += 1
+        DictSessionPersistence.storage[self.session_token] = self.session_data
+        return True
+
+    def delete_session_data(self):
+        return DictSessionPersistence.storage.pop(self.session_token, None) is not None
+
+
+class BlockingSessionPersistence(DictSessionPersistence):
+    """
+    Waits for the release Event before a save and fails while the fail flag is set
+    """
+    release = threading.Event()
+    fail = False
+
+    def save_session_data(self):
+        BlockingSessionPersistence.release.wait(5)
+        if BlockingSessionPersistence.fail:
+            raise IOError('store is down')
+        return super(BlockingSessionPersistence, self).save_session_data()
+
+
+class SlowReadSessionPersistence(DictSessionPersistence):
+    """
+    Signals reading and then waits for the release Event before reading
+    """
+    reading = threading.Event()
+    release = threading.Event()
+
+    def get_session_data(self):
+        SlowReadSessionPersistence.reading.set()
+        SlowReadSessionPersistence.release.wait(5)
+        return super(SlowReadSessionPersistence, self).get_session_data()
+
+
+class CachedSessionPersistenceTests(unittest.TestCase):
+    def setUp(self):
+        DictSessionPersistence.storage = {}
+        DictSessionPersistence.loads = 0
+        DictSessionPersistence.saves = 0
+
+    def session(self, cache, token, data=None):
+        return CachedSessionPersistence(session_token=token, session_data=data, cache=cache, backend_factory=DictSessionPersistence)
+
+    def test_hits_skip_backend_positive001(self):
+        cache = SessionCache()
+        DictSessionPersistence.storage['a'] = {'A': 1}
+        for _ in range(5):
+            self.assertEqual(self.session(cache, 'a').get_session_data(), {'A': 1})
+        self.assertEqual(DictSessionPersistence.loads, 1)
+        self.assertIsNone(self.session(cache, 'missing').get_session_data())
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (4, 2))
+        self.assertAlmostEqual(stats['hit_rate'], 4 / 6)
+
+    def test_write_through_positive001(self):
+        cache = SessionCache()
+        self.assertTrue(self.session(cache, 'a', {'A': 1}).save_session_data())
+        self.assertEqual(DictSessionPersistence.storage['a'], {'A': 1})
+        self.assertEqual(self.session(cache, 'a').get_session_data(), {'A': 1})
+        self.assertEqual(DictSessionPersistence.loads, 0)
+        self.assertTrue(self.session(cache, 'a').delete_session_data())
+        self.assertIsNone(self.session(cache, 'a').get_session_data())
+
+    def test_lru_and_size_eviction_positive001(self):
+        cache = SessionCache(max_entries=2)
+        for token in ('a', 'b'):
+            self.session(cache, token, token).save_session_data()
+        self.session(cache, 'a').get_session_data()
+        self.session(cache, 'c', 'c').save_session_data()
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.get('b', default='evicted'), 'evicted')
+        self.assertEqual(cache.get('a'), 'a')
+        cache = SessionCache(max_bytes=100, sizer=len)
+        self.session(cache, 'a', 'x' * 60).save_session_data()
+        self.session(cache, 'b', 'x' * 60).save_session_data()
+        self.assertEqual(cache.stats()['entries'], 1)
+        self.assertEqual(cache.stats()['bytes'], 60)
+
+    def test_ttl_positive001(self):
+        cache = SessionCache(ttl=0.05)
+        self.session(cache, 'a', 1).save_session_data()
+        self.assertEqual(cache.get('a'), 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+
+    def test_write_behind_positive001(self):
+        cache = SessionCache(write_mode=WRITE_BEHIND, flush_interval=60, max_entries=2)
+        self.session(cache, 'a', 1).save_session_data()
+        self.session(cache, 'b', 2).save_session_data()
+        self.assertEqual(DictSessionPersistence.saves, 0)
+        self.session(cache, 'c', 3).save_session_data()
+        # evicting a dirty entry writes it
+        self.assertEqual(DictSessionPersistence.storage, {'a': 1})
+        self.assertEqual(cache.flush(), 2)
+        self.assertEqual(cache.flush(), 0)
+        self.session(cache, 'c', 4).save_session_data()
+        cache.close()
+        self.assertEqual(DictSessionPersistence.storage, {'a': 1, 'b': 2, 'c': 4})
+        self.assertEqual(cache.stats()['writes'], 4)
+
+    def test_write_behind_ordering_positive001(self):
+        cache = SessionCache(write_mode=WRITE_BEHIND, flush_interval=60, max_entries=1)
+        BlockingSessionPersistence.release.clear()
+        self.session(cache, 'a', 1).save_session_data()
+        cache.put('a', 1, backend_factory=BlockingSessionPersistence)
+        evicting = threading.Thread(target=cache.put, args=('b', 2), kwargs={'backend_factory': DictSessionPersistence})
+        evicting.start()
+        time.sleep(0.05)
+        # Evicted, still being written: read from the cache, not from the store
+        self.assertEqual(self.session(cache, 'a').get_session_data(), 1)
+        self.assertEqual(DictSessionPersistence.loads, 0)
+        self.assertEqual(cache.stats()['pending'], 1)
+        BlockingSessionPersistence.release.set()
+        evicting.join()
+        self.assertEqual(cache.stats()['pending'], 0)
+        # A stale entry is not written over newer data
+        cache = SessionCache(write_mode=WRITE_BEHIND, flush_interval=60)
+        BlockingSessionPersistence.release.clear()
+        cache.put('c', 'old', backend_factory=BlockingSessionPersistence)
+        flushing = threading.Thread(target=cache.flush)
+        flushing.start()
+        time.sleep(0.05)
+        cache.put('c', 'new', backend_factory=DictSessionPersistence)
+        writing = threading.Thread(target=cache.flush)
+        writing.start()
+        BlockingSessionPersistence.release.set()
+        flushing.join()
+        writing.join()
+        self.assertEqual(DictSessionPersistence.storage['c'], 'new')
+        cache.put('d', 'deleted', backend_factory=DictSessionPersistence)
+        cache.invalidate('d')
+        self.assertEqual(cache.flush(), 0)
+        self.assertNotIn('d', DictSessionPersistence.storage)
+
+    def test_write_behind_failure_negative001(self):
+        cache = SessionCache(write_mode=WRITE_BEHIND, flush_interval=60, max_entries=1)
+        BlockingSessionPersistence.release.set()
+        BlockingSessionPersistence.fail = True
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                cache.put('a', 1, backend_factory=BlockingSessionPersistence)
+                cache.put('b', 2, backend_factory=BlockingSessionPersistence)
+                # The failed write of the evicted entry is kept for the next flush
+                self.assertEqual(cache.get('a'), 1)
+                self.assertEqual(cache.flush(), 0)
+            BlockingSessionPersistence.fail = False
+            self.assertEqual(cache.flush(), 2)
+            self.assertEqual(DictSessionPersistence.storage, {'a': 1, 'b': 2})
+            self.assertEqual(cache.stats()['pending'], 0)
+        finally:
+            BlockingSessionPersistence.fail = False
+        cache.close()
+        # Saves after close() are written through
+        self.assertTrue(self.session(cache, 'c', 3).save_session_data())
+        self.assertEqual(DictSessionPersistence.storage['c'], 3)
+        with self.assertRaises(Exception):
+            cache.put('d', 4, backend_factory=DictSessionPersistence)
+
+    def test_read_during_save_positive001(self):
+        for write_mode in (WRITE_BEHIND, 'write_through'):
+            DictSessionPersistence.storage = {'a': 'old'}
+            cache = SessionCache(write_mode=write_mode, flush_interval=60)
+            SlowReadSessionPersistence.reading.clear()
+            SlowReadSessionPersistence.release.clear()
+            read = []
+            reader = threading.Thread(target=lambda: read.append(CachedSessionPersistence(
+                session_token='a', cache=cache, backend_factory=SlowReadSessionPersistence
+            ).get_session_data()))
+            reader.start()
+            SlowReadSessionPersistence.reading.wait(5)
+            self.session(cache, 'a', 'new').save_session_data()
+            SlowReadSessionPersistence.release.set()
+            reader.join()
+            # The read started before the save: it does not replace the saved data
+            self.assertEqual(len(read), 1)
+            self.assertEqual(cache.get('a'), 'new')
+            cache.close()
+            self.assertEqual(DictSessionPersistence.storage['a'], 'new')
+        # Later reads fill the cache again
+        cache = SessionCache()
+        SlowReadSessionPersistence.release.set()
+        self.assertEqual(CachedSessionPersistence(session_token='a', cache=cache, backend_factory=SlowReadSessionPersistence).get_session_data(), 'new')
+        self.assertEqual(cache.get('a', default=None), 'new')
+        self.assertEqual(cache._fills, {})
+
+    def test_around_file_store_positive001(self):
+        root_dir = tempfile.mkdtemp()
+        try:
+            store = FileSessionStore(root_dir=root_dir)
+            factory = lambda token, data: FileBasedSessionPersistence(session_token=token, session_data=data, store=store)
+            cache = SessionCache()
+            CachedSessionPersistence(session_token='t', session_data={'A': 1}, cache=cache, backend_factory=factory).save_session_data()
+            self.assertEqual(store.load('t'), {'A': 1})
+            cache.invalidate('t')
+            self.assertEqual(CachedSessionPersistence(session_token='t', cache=cache, backend_factory=factory).get_session_data(), {'A': 1})
+        finally:
+            shutil.rmtree(root_dir)
+
+    def test_cache_required_negative001(self):
+        with self.assertRaises(Exception):
+            CachedSessionPersistence(session_token='a')
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from pytaskflow.taskflow_engine import Result, FileBasedSessionPersistence
+from pytaskflow.session_store import FileSessionStore
+
+
+class FileSessionStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def list_files(self):
+        return [os.path.join(d, f) for d, _, files in os.walk(self.root_dir) for f in files]
+
+    def test_save_load_delete_positive001(self):
+        store = FileSessionStore(root_dir=self.root_dir)
+        store.save('user/1', Result(result_obj={'Numbers': [1, 2, 3]}))
+        path = store.path_for('user/1')
+        self.assertTrue(path.startswith(self.root_dir))
+        self.assertEqual(len(os.path.relpath(path, self.root_dir).split(os.sep)), 3)
+        self.assertEqual(self.list_files(), [path])
+        self.assertEqual(store.load('user/1').result_obj, {'Numbers': [1, 2, 3]})
+        self.assertTrue(store.delete('user/1'))
+        self.assertFalse(store.delete('user/1'))
+        self.assertEqual(store.load('user/1', default='missing'), 'missing')
+
+    def test_compression_positive001(self):
+        big = {'Data': 'x' * 100000}
+        for compression in ('zlib', 'lzma', None):
+            store = FileSessionStore(root_dir=self.root_dir, compression=compression, compress_threshold=1000)
+            store.save('big', big)
+            size = os.path.getsize(store.path_for('big'))
+            if compression is None:
+                self.assertGreater(size, 100000)
+            else:
+                self.assertLess(size, 10000)
+            self.assertEqual(store.load('big'), big)
+        store = FileSessionStore(root_dir=self.root_dir, compression='zlib', compress_threshold=1000)
+        self.assertEqual(store.encode({'a': 1})[:1], b'P')
+
+    def test_failed_write_keeps_old_session_negative001(self):
+        store = FileSessionStore(root_dir=self.root_dir)
+        store.save('token', {'Version': 1})
+        with self.assertRaises(Exception):
+            store.save('token', {'Lock': threading.Lock()})
+        self.assertEqual(store.load('token'), {'Version': 1})
+        with mock.patch('pytaskflow.session_store.os.replace', side_effect=OSError('Crashed before rename')):
+            with self.assertRaises(OSError):
+                store.save('token', {'Version': 2})
+        self.assertEqual(store.load('token'), {'Version': 1})
+        self.assertEqual(len(self.list_files()), 1)
+
+    def test_ttl_and_sweep_positive001(self):
+        store = FileSessionStore(root_dir=self.root_dir, ttl=60)
+        store.save('old', 1)
+        store.save('new', 2)
+        old_time = time.time() - 120
+        os.utime(store.path_for('old'), (old_time, old_time))
+        self.assertIsNone(store.load('old'))
+        self.assertFalse(os.path.exists(store.path_for('old')))
+        os.utime(store.path_for('new'), (old_time, old_time))
+        store.save('fresh', 3)
+        self.assertEqual(store.sweep_expired(), 1)
+        self.assertEqual(store.load('fresh'), 3)
+
+    def test_invalid_compression_negative001(self):
+        with self.assertRaises(Exception):
+            FileSessionStore(root_dir=self.root_dir, compression='bz2')
+
+
+class FileBasedSessionPersistenceTests(unittest.TestCase):
+    def setUp(self):
+        self.root_dir = tempfile.mkdtemp()
+        self.store = FileSessionStore(root_dir=self.root_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.root_dir)
+
+    def test_round_trip_positive001(self):
+        saved = FileBasedSessionPersistence(session_token='abc', session_data=Result(result_obj={'A': 1}), store=self.store)
+        self.assertTrue(saved.save_session_data())
+        self.assertEqual(saved.filename, self.store.path_for('abc'))
+        loaded = FileBasedSessionPersistence(session_token='abc', store=self.store)
+        self.assertEqual(loaded.get_session_data().result_obj, {'A': 1})
+        self.assertTrue(loaded.delete_session_data())
+        self.assertIsNone(loaded.get_session_data())
+
+    def test_default_store_positive001(self):
+        persistence = FileBasedSessionPersistence(session_token='pytaskflow-test-default-store', session_data={'B': 2})
+        self.assertTrue(persistence.save_session_data())
+        self.assertEqual(persistence.get_session_data(), {'B': 2})
+        self.assertTrue(persistence.delete_session_data())
+
+    def test_no_token_negative001(self):
+        persistence = FileBasedSessionPersistence(session_token=None, session_data={'A': 1}, store=self.store)
+        self.assertFalse(persistence.save_session_data())
+        self.assertIsNone(persistence.get_session_data())
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -1,3 +1,4 @@
+import sys
 import unittest
 from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
 
@@ -14,7 +15,7 @@ class PrintFunction(Function):
     def __init__(self):
         super(PrintFunction, self).__init__()
 
-    def execute(self, input_result=Result(result_obj={})):
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
         ro = input_result.result_obj
         ro['Message'] = 'Hello World'
         self.result = Result(result_obj=ro, is_error=False)
@@ -24,7 +25,7 @@ class SetVariableFunction(Function):
     def __init__(self):
         super(SetVariableFunction, self).__init__()
 
-    def execute(self, input_result=Result(result_obj={})):
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
         ro = input_result.result_obj
         ro['Variable'] = 10
         self.result = Result(result_obj=ro, is_error=False)
@@ -34,7 +35,7 @@ class FunkyLooperFunction(Function):
     def __init__(self):
         super(FunkyLooperFunction, self).__init__()
 
-    def execute(self, input_result=Result(result_obj={})):
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
         """
         Required in the input_result is the following keys in the result_obj:
             'Numbers': [num1, num2, ..., numX]
@@ -69,7 +70,7 @@ class DumpResultObj(Function):
     def __init__(self):
         super(DumpResultObj, self).__init__()
 
-    def execute(self, input_result=Result(result_obj={})):
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
         if isinstance(input_result.result_obj, dict):
             for k,v in input_result.result_obj.items():
                 print('DUMP: {}={}'.format(k, v))
@@ -88,13 +89,41 @@ class TaskOverridingSuccessTask(Function):
     def __init__(self):
         super(TaskOverridingSuccessTask, self).__init__()
 
-    def execute(self, input_result=Result(result_obj={})):
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
         f = DumpResultObj()
         t = Task(task_name='Dumper Task')
         t.register_function(function=f, success_task=None, err_task=None)
         self.result = Result(result_obj={'Stop': True, 'Message': 'Dumping stuff and stopping the bus'}, override_success_task=t)
 
 
+class CountDownFunction(Function):
+    def __init__(self):
+        super(CountDownFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        count = input_result.result_obj['Count'] - 1
+        steps = input_result.result_obj.get('Steps', 0) + 1
+        self.result = Result(result_obj={'Count': count, 'Steps': steps}, stop=count <= 0)
+
+
+class FailingFunction(Function):
+    def __init__(self):
+        super(FailingFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        self.result = Result(result_obj={'Failed': True}, is_error=True, err_msg='Failed on purpose')
+
+
+class ErrorHandlerFunction(Function):
+    def __init__(self):
+        super(ErrorHandlerFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        ro = input_result.result_obj
+        ro['Handled'] = input_result.err_msg
+        self.result = Result(result_obj=ro, stop=True)
+
+
 class FunctionTests(unittest.TestCase):
     def test_define_function_positive001(self):
         f = PrintFunction()
@@ -135,6 +164,24 @@ class TaskTests(unittest.TestCase):
         self.assertEqual(t.task_result.result_obj['Message'], 'Dumping stuff and stopping the bus')
         self.assertTrue(t.task_result.result_obj['Dumped'])
 
+    def test_error_task_positive001(self):
+        t_err = Task(task_name='Error Task')
+        t_err.register_function(function=ErrorHandlerFunction(), success_task=None, err_task=None)
+        t = Task(task_name='Task 1')
+        t.register_function(function=FailingFunction(), success_task=None, err_task=t_err)
+        t.run_task(input_result=Result(result_obj={}))
+        self.assertTrue(t.task_result.result_obj['Failed'])
+        self.assertEqual(t.task_result.result_obj['Handled'], 'Failed on purpose')
+        self.assertFalse(t.task_result.is_error)
+
+    def test_long_looping_task_positive001(self):
+        steps = sys.getrecursionlimit() * 20
+        t = Task(task_name='Count Down Task')
+        t.register_function(function=CountDownFunction(), success_task=t, err_task=None)
+        t.run_task(input_result=Result(result_obj={'Count': steps}))
+        self.assertEqual(t.task_result.result_obj['Count'], 0)
+        self.assertEqual(t.task_result.result_obj['Steps'], steps)
+
 
 class WorkFlowTests(unittest.TestCase):
     def test_basic_workflow_positive001(self):
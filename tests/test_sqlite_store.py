@@ -0,0 +1,104 @@
+import gc
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pytaskflow.taskflow_engine import Result
+from pytaskflow.sqlite_store import SqliteSessionStore, SqliteSessionPersistence
+
+
+class SqliteSessionStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.database = os.path.join(self.directory, 'sessions.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_load_delete_positive001(self):
+        store = SqliteSessionStore(self.database)
+        store.save('a', Result(result_obj={'A': 1}))
+        self.assertEqual(store.load('a').result_obj, {'A': 1})
+        store.save('a', {'A': 2})
+        self.assertEqual(store.load('a'), {'A': 2})
+        self.assertTrue(store.delete('a'))
+        self.assertFalse(store.delete('a'))
+        self.assertEqual(store.load('a', default='missing'), 'missing')
+        journal_mode = store._connection().execute('PRAGMA journal_mode').fetchone()[0]
+        self.assertEqual(journal_mode, 'wal')
+        store.close()
+
+    def test_save_many_load_many_positive001(self):
+        store = SqliteSessionStore(self.database)
+        self.assertEqual(store.save_many(('token-{}'.format(i), {'Index': i}) for i in range(2500)), 2500)
+        self.assertEqual(store.count(), 2500)
+        tokens = ['token-{}'.format(i) for i in range(0, 2500, 2)] + ['unknown']
+        sessions = store.load_many(tokens)
+        self.assertEqual(len(sessions), 1250)
+        self.assertEqual(sessions['token-1000'], {'Index': 1000})
+        store.save_many({'x': 1, 'y': 2})
+        self.assertEqual(store.load_many(['x', 'y']), {'x': 1, 'y': 2})
+
+    def test_ttl_and_sweep_positive001(self):
+        store = SqliteSessionStore(self.database, ttl=60)
+        store.save_many({'a': 1, 'b': 2})
+        self.assertEqual(store.load('a'), 1)
+        self.assertEqual(store.sweep_expired(now=time.time() + 120), 2)
+        self.assertEqual(store.count(), 0)
+        store = SqliteSessionStore(self.database, ttl=-1)
+        store.save('expired', 1)
+        self.assertIsNone(store.load('expired'))
+        self.assertEqual(store.load_many(['expired']), {})
+
+    def test_threads_share_database_positive001(self):
+        store = SqliteSessionStore(self.database)
+
+        def save_and_load(i):
+            store.save('t{}'.format(i), i)
+            return store.load('t{}'.format(i))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            self.assertEqual(list(pool.map(save_and_load, range(200))), list(range(200)))
+        self.assertEqual(store.count(), 200)
+        store.close()
+        self.assertEqual(store.load('t5'), 5)
+
+    def test_short_lived_threads_positive001(self):
+        store = SqliteSessionStore(self.database)
+        store.save('a', 1)
+        loaded = []
+        for _ in range(20):
+            threads = [threading.Thread(target=lambda: loaded.append(store.load('a'))) for _ in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        gc.collect()
+        self.assertEqual(loaded, [1] * 200)
+        # The connections of finished threads are closed: only the one of this thread is left
+        self.assertEqual(len(store._connections), 1)
+        store.close()
+        self.assertEqual(len(store._connections), 0)
+        self.assertEqual(store.load('a'), 1)
+
+    def test_persistence_positive001(self):
+        store = SqliteSessionStore(self.database)
+        self.assertTrue(SqliteSessionPersistence(session_token='s', session_data={'A': 1}, store=store).save_session_data())
+        persistence = SqliteSessionPersistence(session_token='s', store=store)
+        self.assertEqual(persistence.get_session_data(), {'A': 1})
+        self.assertTrue(persistence.delete_session_data())
+        self.assertIsNone(persistence.get_session_data())
+        self.assertFalse(SqliteSessionPersistence(session_token=None, session_data={'A': 1}, store=store).save_session_data())
+
+    def test_store_required_negative001(self):
+        with self.assertRaises(Exception):
+            SqliteSessionPersistence(session_token='s')
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
@@ -0,0 +1,127 @@
+import threading
+import time
+import unittest
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
+
+
+class SleepStageFunction(Function):
+    """
+    Waits like an I/O call and records the threads it ran on
+    """
+    def __init__(self, key):
+        super(SleepStageFunction, self).__init__()
+        self.key = key
+        self.threads = set()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(0.01)
+        value = input_result.result_obj['Value']
+        if value == 13 and self.key == 'B':
+            raise Exception('Unlucky number')
+        result_obj = dict(input_result.result_obj)
+        result_obj[self.key] = value
+        return Result(result_obj=result_obj)
+
+
+class LoopBackFunction(Function):
+    """
+    Sends every record back to the first Task once, overriding the success_task
+    """
+    def __init__(self):
+        super(LoopBackFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        result_obj = dict(input_result.result_obj)
+        result_obj['Loops'] = result_obj.get('Loops', 0) + 1
+        if result_obj['Loops'] < 2:
+            return Result(result_obj=result_obj, override_success_task=globals_dict['FirstTask'])
+        return Result(result_obj=result_obj, stop=True)
+
+
+def get_workflow():
+    t3 = Task(task_name='C')
+    t3.register_function(function=SleepStageFunction('C'), success_task=None, err_task=None)
+    t2 = Task(task_name='B')
+    t2.register_function(function=SleepStageFunction('B'), success_task=t3, err_task=None)
+    t1 = Task(task_name='A')
+    t1.register_function(function=SleepStageFunction('A'), success_task=t2, err_task=None)
+    return WorkFlow(workflow_name='Stream', starter_task=t1)
+
+
+class CountingInputs:
+    """
+    An iterable that records how many inputs were pulled
+    """
+    def __init__(self, count):
+        self.count = count
+        self.pulled = 0
+
+    def __iter__(self):
+        for i in range(self.count):
+            self.pulled += 1
+            yield Result(result_obj={'Value': i})
+
+
+class StreamTests(unittest.TestCase):
+    def check_results(self, results, count):
+        self.assertEqual(len(results), count)
+        for i, result in enumerate(results):
+            if i == 13:
+                self.assertIn('Unlucky number', result.err_msg)
+            else:
+                self.assertEqual(result.result_obj, {'Value': i, 'A': i, 'B': i, 'C': i})
+
+    def test_stream_serial_positive001(self):
+        self.check_results(list(get_workflow().stream(CountingInputs(20))), 20)
+
+    def test_stream_pipeline_positive001(self):
+        workflow = get_workflow()
+        started = time.perf_counter()
+        results = list(workflow.stream(CountingInputs(30), pipeline=True, queue_size=2))
+        elapsed = time.perf_counter() - started
+        self.check_results(results, 30)
+        # 30 records through three 10ms stages take about 0.9s one after the other and about 0.3s pipelined
+        self.assertLess(elapsed, 0.75)
+        self.assertEqual(workflow.starter_task.function.threads, {'WorkFlowStage-A'})
+
+    def test_stream_pipeline_unordered_positive001(self):
+        items = list(get_workflow().stream(CountingInputs(20), pipeline=True, ordered=False))
+        self.assertEqual(sorted(index for index, _ in items), list(range(20)))
+
+    def test_stream_pulls_lazily_positive001(self):
+        inputs = CountingInputs(100000)
+        results = get_workflow().stream(inputs, pipeline=True, queue_size=2)
+        for _ in range(5):
+            next(results)
+        results.close()
+        # At most queue_size records per stage (and the output) are in flight
+        self.assertLess(inputs.pulled, 20)
+        serial = get_workflow().stream(CountingInputs(100000))
+        next(serial)
+        serial.close()
+
+    def test_stream_pipeline_loop_back_positive001(self):
+        t2 = Task(task_name='Loop Back')
+        t1 = Task(task_name='First')
+        t1.register_function(function=SleepStageFunction('A'), success_task=t2, err_task=None)
+        t2.register_function(function=LoopBackFunction(), success_task=None, err_task=None, globals_dict={'FirstTask': t1})
+        workflow = WorkFlow(workflow_name='Loop', starter_task=t1)
+        workflow.compile()
+        results = list(workflow.stream((Result(result_obj={'Value': i}) for i in range(10)), pipeline=True, queue_size=1))
+        self.assertEqual([result.result_obj['Loops'] for result in results], [2] * 10)
+
+    def test_stream_failing_inputs_negative001(self):
+        def inputs():
+            yield Result(result_obj={'Value': 1})
+            raise ValueError('broken input')
+        with self.assertRaises(ValueError):
+            list(get_workflow().stream(inputs(), pipeline=True))
+        with self.assertRaises(Exception):
+            list(get_workflow().stream([], pipeline=True, queue_size=0))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# EOF
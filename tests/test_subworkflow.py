@@ -0,0 +1,202 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
+from pytaskflow.subworkflow import SubWorkFlowTask, WorkFlowRegistry
+from pytaskflow.definition import build_workflow
+
+
+BUILDS = []
+
+
+class AddFunction(Function):
+    """
+    Adds Amount to Value. Fails when Value gets over Limit, and stops when Stop is set
+    """
+    def __init__(self, amount):
+        super(AddFunction, self).__init__()
+        self.amount = amount
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        result_obj = dict(input_result.result_obj)
+        result_obj['Value'] = result_obj.get('Value', 0) + self.amount
+        result_obj.setdefault('Path', []).append(self.amount)
+        if result_obj['Value'] > globals_dict.get('Limit', 1000):
+            return Result(result_obj=result_obj, is_error=True, err_msg='over the limit')
+        return Result(result_obj=result_obj, stop=globals_dict.get('Stop', False))
+
+
+class RecordErrorFunction(Function):
+    def __init__(self):
+        super(RecordErrorFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj={'Error': input_result.err_msg, 'Value': input_result.result_obj.get('Value')}, stop=True)
+
+
+def get_add_workflow():
+    BUILDS.append('add')
+    t_err = Task(task_name='Sub Error')
+    t_err.register_function(function=RecordErrorFunction(), success_task=None, err_task=None)
+    t2 = Task(task_name='Add 10')
+    t2.register_function(function=AddFunction(10), success_task=None, err_task=None, globals_dict={'Limit': 50, 'Stop': True})
+    t1 = Task(task_name='Add 1')
+    t1.register_function(function=AddFunction(1), success_task=t2, err_task=t_err, globals_dict={'Limit': 50})
+    return WorkFlow(workflow_name='Add', starter_task=t1)
+
+
+def get_parent_workflow(registry, name='Parent'):
+    t_err = Task(task_name='Parent Error')
+    t_err.register_function(function=RecordErrorFunction(), success_task=None, err_task=None)
+    t_last = Task(task_name='Add 100')
+    t_last.register_function(function=AddFunction(100), success_task=None, err_task=t_err, globals_dict={'Stop': True})
+    t_sub = SubWorkFlowTask(task_name='Run Add', workflow_name='add', registry=registry)
+    t_sub.register_subworkflow(success_task=t_last, err_task=t_err)
+    workflow = WorkFlow(workflow_name=name, starter_task=t_sub)
+    workflow.compile()
+    return workflow
+
+
+def get_registry():
+    registry = WorkFlowRegistry()
+    registry.register('add', 'tests.test_subworkflow:get_add_workflow')
+    return registry
+
+
+class SubWorkFlowTests(unittest.TestCase):
+    def setUp(self):
+        del BUILDS[:]
+
+    def test_subworkflow_step_positive001(self):
+        registry = get_registry()
+        workflow = get_parent_workflow(registry)
+        self.assertFalse(registry.is_loaded('add'))
+        result = workflow.run_workflow(input_result=Result(result_obj={'Value': 0}))
+        # The sub-workflow stops after Add 10, the parent goes on to Add 100
+        self.assertEqual(result.result_obj, {'Value': 111, 'Path': [1, 10, 100]})
+        self.assertTrue(registry.is_loaded('add'))
+        context = workflow.new_context()
+        workflow.run_workflow(input_result=Result(result_obj={'Value': 0}), context=context)
+        # The steps of the sub-workflow are part of the parent run
+        self.assertEqual(list(context.trace), ['Add 1', 'Add 10', 'Run Add', 'Add 100'])
+        self.assertEqual(context.step_count, 4)
+        self.assertEqual(context.results['Add 1'].result_obj['Value'], 1)
+        context = workflow.new_context(run_id='async')
+        asyncio.run(workflow.run_workflow_async(input_result=Result(result_obj={'Value': 0}), context=context))
+        self.assertEqual(list(context.trace), ['Add 1', 'Add 10', 'Run Add', 'Add 100'])
+
+    def test_subworkflow_errors_positive001(self):
+        workflow = get_parent_workflow(get_registry())
+        # Handled inside the sub-workflow: it ends with a normal Result
+        result = workflow.run_workflow(input_result=Result(result_obj={'Value': 60}))
+        self.assertEqual(result.result_obj, {'Error': 'over the limit', 'Value': 161, 'Path': [100]})
+        # Add 10 fails without an err_task, so the sub-workflow's error Result goes to the parent's err_task
+        result = workflow.run_workflow(input_result=Result(result_obj={'Value': 45}))
+        self.assertEqual(result.result_obj, {'Error': 'over the limit', 'Value': 56})
+
+    def test_shared_and_built_once_positive001(self):
+        registry = get_registry()
+        parents = [get_parent_workflow(registry, name='Parent {}'.format(i)) for i in range(3)]
+        results = []
+        threads = [
+            threading.Thread(target=lambda parent=parent: results.append(parent.run_workflow(input_result=Result(result_obj={}))))
+            for parent in parents * 4
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 12)
+        self.assertEqual(BUILDS, ['add'])
+        self.assertIs(parents[0].starter_task.get_workflow(), parents[2].starter_task.get_workflow())
+        registry.unload('add')
+        parents[0].run_workflow(input_result=Result(result_obj={}))
+        self.assertEqual(BUILDS, ['add', 'add'])
+
+    def test_async_and_process_positive001(self):
+        workflow = get_parent_workflow(get_registry())
+        result = asyncio.run(workflow.run_workflow_async(input_result=Result(result_obj={'Value': 0})))
+        self.assertEqual(result.result_obj['Value'], 111)
+        results = list(workflow.run_many(inputs=[Result(result_obj={'Value': i}) for i in range(4)], workers=2, mode='process'))
+        self.assertEqual([result.result_obj['Value'] for result in results], [111, 112, 113, 114])
+
+    def test_definition_sources_positive001(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'add.json')
+            with open(path, 'w') as f:
+                json.dump({
+                    'workflow_name': 'Add Definition',
+                    'starter_task': 'add',
+                    'tasks': {'add': {'function': 'tests.test_subworkflow:AddFunction', 'function_args': {'amount': 5}}},
+                }, f)
+            registry = WorkFlowRegistry()
+            registry.register('add', path)
+            result = get_parent_workflow(registry).run_workflow(input_result=Result(result_obj={'Value': 0}))
+            self.assertEqual(result.result_obj['Path'], [5, 100])
+        finally:
+            shutil.rmtree(directory)
+        workflow = build_workflow({
+            'workflow_name': 'Parent Definition',
+            'starter_task': 'sub',
+            'tasks': {'sub': {'workflow': 'numbers'}},
+        })
+        self.assertIsInstance(workflow.starter_task, SubWorkFlowTask)
+        workflow.starter_task.registry = WorkFlowRegistry()
+        workflow.starter_task.registry.register('numbers', get_add_workflow)
+        self.assertEqual(workflow.run_workflow(input_result=Result(result_obj={})).result_obj['Value'], 11)
+
+    def test_recursive_subworkflow_negative001(self):
+        registry = WorkFlowRegistry()
+        registry.register('loop', lambda: get_parent_workflow(registry, name='Loop'))
+        registry.register('outer', lambda: get_parent_workflow(registry, name='Outer'))
+        # Loop runs itself, Outer runs Loop
+        registry.get('loop').starter_task.workflow_name = 'loop'
+        registry.get('outer').starter_task.workflow_name = 'loop'
+        for name, chain in (('loop', 'Loop -> Loop'), ('outer', 'Outer -> Loop -> Loop')):
+            with self.assertRaises(Exception) as context:
+                registry.get(name).run_workflow(input_result=Result(result_obj={}))
+            self.assertIn('sub-workflow loop runs itself: {}'.format(chain), str(context.exception))
+        with self.assertRaises(Exception) as context:
+            asyncio.run(registry.get('loop').run_workflow_async(input_result=Result(result_obj={})))
+        self.assertIn('Loop -> Loop', str(context.exception))
+
+    def test_same_workflow_names_positive001(self):
+        registry = WorkFlowRegistry()
+
+        def get_main_add_workflow():
+            workflow = get_add_workflow()
+            workflow.workflow_name = 'Main'
+            return workflow
+
+        registry.register('add', get_main_add_workflow)
+        # Two different WorkFlows named Main, one running the other
+        result = get_parent_workflow(registry, name='Main').run_workflow(input_result=Result(result_obj={'Value': 0}))
+        self.assertEqual(result.result_obj['Value'], 111)
+        nested = WorkFlowRegistry()
+        nested.register('inner', lambda: get_parent_workflow(registry, name='Main'))
+        t_inner = SubWorkFlowTask(task_name='Run Inner', workflow_name='inner', registry=nested)
+        t_inner.register_subworkflow(success_task=None, err_task=None)
+        workflow = WorkFlow(workflow_name='Main', starter_task=t_inner)
+        self.assertEqual(workflow.run_workflow(input_result=Result(result_obj={'Value': 0})).result_obj['Value'], 111)
+
+    def test_registry_negative001(self):
+        registry = get_registry()
+        with self.assertRaises(Exception):
+            registry.register('add', get_add_workflow)
+        registry.register('add', get_add_workflow, replace=True)
+        with self.assertRaises(Exception):
+            registry.register('bad', 42)
+        registry.register('not a workflow', dict)
+        with self.assertRaises(Exception):
+            registry.get('not a workflow')
+        with self.assertRaises(Exception):
+            registry.get('missing')
+        self.assertEqual(registry.names(), ['add', 'not a workflow'])
+
+
+# EOF
@@ -0,0 +1,174 @@
+import json
+import os
+import pickle
+import random
+import tempfile
+import unittest
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
+from pytaskflow.instrumentation import TaskStatsAggregator
+from pytaskflow.tracing import ExecutionTracer, replay
+from pytaskflow.parallel import ParallelTask
+
+
+class AppendFunction(Function):
+    """
+    Appends to the list in its input (changing the input in place) and loops back to the LoopTask until the list has
+    Target items
+    """
+    def __init__(self, random_values=False):
+        super(AppendFunction, self).__init__()
+        self.random_values = random_values
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        values = input_result.result_obj.setdefault('Values', [])
+        values.append(random.random() if self.random_values else len(values))
+        if len(values) < input_result.result_obj['Target']:
+            return Result(result_obj=input_result.result_obj, override_success_task=globals_dict['LoopTask'])
+        return Result(result_obj=input_result.result_obj)
+
+
+class SumFunction(Function):
+    def __init__(self):
+        super(SumFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        return Result(result_obj={'Sum': sum(input_result.result_obj['Values'])}, stop=True)
+
+
+def get_workflow(random_values=False):
+    t_sum = Task(task_name='Sum')
+    t_sum.register_function(function=SumFunction(), success_task=None, err_task=None)
+    t_append = Task(task_name='Append')
+    t_append.register_function(
+        function=AppendFunction(random_values=random_values), success_task=t_sum, err_task=None,
+        globals_dict={'LoopTask': t_append}
+    )
+    workflow = WorkFlow(workflow_name='Append', starter_task=t_append)
+    workflow.compile()
+    return workflow
+
+
+class CallFunction(Function):
+    """
+    Records every call in the calls list
+    """
+    def __init__(self, name, calls):
+        super(CallFunction, self).__init__()
+        self.name = name
+        self.calls = calls
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        self.calls.append(self.name)
+        return Result(result_obj={self.name: True})
+
+
+def get_parallel_workflow(calls):
+    branches = []
+    for name in ('a', 'b'):
+        branch = Task(task_name=name)
+        branch.register_function(function=CallFunction(name, calls), success_task=None, err_task=None)
+        branches.append(branch)
+    t_parallel = ParallelTask(task_name='p')
+    t_parallel.register_branches(branch_tasks=branches, success_task=None, err_task=None)
+    workflow = WorkFlow(workflow_name='Parallel', starter_task=t_parallel)
+    workflow.compile()
+    return workflow
+
+
+class TracingTests(unittest.TestCase):
+    def run_traced(self, workflow, tracer, run_id, target=3):
+        workflow.executor.add_hook(tracer)
+        result = workflow.run_workflow(input_result=Result(result_obj={'Target': target}), context=workflow.new_context(run_id=run_id))
+        workflow.executor.remove_hook(tracer)
+        return result
+
+    def test_transitions_positive001(self):
+        tracer = ExecutionTracer()
+        self.run_traced(get_workflow(), tracer, 'run-1')
+        self.assertEqual(tracer.transitions('run-1'), [
+            ('Append', 'Append', 'Append'),
+            ('Append', 'Append', 'Append'),
+            ('Append', 'Sum', None),
+            ('Sum', None, None),
+        ])
+        self.assertEqual(tracer.run_ids(), ['run-1'])
+        self.assertIsNone(tracer.records()[0].input_snapshot)
+
+    def test_ring_buffer_positive001(self):
+        tracer = ExecutionTracer(capacity=5)
+        workflow = get_workflow()
+        for i in range(3):
+            self.run_traced(workflow, tracer, 'run-{}'.format(i))
+        records = tracer.records()
+        self.assertEqual(len(records), 5)
+        self.assertEqual(tracer.run_ids(), ['run-1', 'run-2'])
+        self.assertEqual([record.step for record in records], list(range(7, 12)))
+
+    def test_chrome_trace_positive001(self):
+        tracer = ExecutionTracer()
+        self.run_traced(get_workflow(), tracer, 'run-1')
+        filename = os.path.join(tempfile.mkdtemp(), 'trace.json')
+        tracer.export_chrome_trace(filename)
+        with open(filename) as f:
+            trace = json.load(f)
+        complete = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+        self.assertEqual([event['name'] for event in complete], ['Append', 'Append', 'Append', 'Sum'])
+        self.assertEqual(complete[0]['args']['override'], 'Append')
+        self.assertTrue(all(event['dur'] >= 0 for event in complete))
+        self.assertEqual(len([event for event in trace['traceEvents'] if event['ph'] == 's']), 3)
+        os.remove(filename)
+
+    def test_replay_positive001(self):
+        tracer = ExecutionTracer(snapshot_rate=1.0)
+        workflow = get_workflow()
+        result = self.run_traced(workflow, tracer, 'run-1', target=4)
+        self.assertEqual(result.result_obj, {'Sum': 6})
+        records = tracer.records('run-1')
+        # The input snapshot is taken before the Function changes the input in place
+        self.assertEqual(pickle.loads(records[1].input_snapshot[1:]).result_obj['Values'], [0])
+        stats = TaskStatsAggregator()
+        steps = replay(get_workflow(), pickle.loads(pickle.dumps(tracer)).records('run-1'), hooks=[stats])
+        self.assertEqual([step.task_name for step in steps], ['Append'] * 4 + ['Sum'])
+        self.assertTrue(all(step.matches for step in steps))
+        self.assertEqual(steps[-1].result.result_obj, {'Sum': 6})
+        self.assertEqual(stats.snapshot()['Append']['count'], 4)
+
+    def test_replay_parallel_positive001(self):
+        tracer = ExecutionTracer(snapshot_rate=1.0)
+        calls = []
+        workflow = get_parallel_workflow(calls)
+        self.run_traced(workflow, tracer, 'run-1')
+        records = tracer.records('run-1')
+        self.assertEqual(sorted((record.task_name, record.depth) for record in records), [('a', 1), ('b', 1), ('p', 0)])
+        del calls[:]
+        steps = replay(workflow, records)
+        # The branch steps are run again by the ParallelTask step only
+        self.assertEqual([step.task_name for step in steps], ['p'])
+        self.assertEqual(sorted(calls), ['a', 'b'])
+        self.assertTrue(steps[0].matches)
+        workflow.starter_task.close()
+
+    def test_replay_not_deterministic_positive001(self):
+        tracer = ExecutionTracer(snapshot_rate=1.0, codec='json')
+        self.run_traced(get_workflow(random_values=True), tracer, 'run-1')
+        steps = replay(get_workflow(random_values=True), tracer.records('run-1'))
+        # Every step gets its recorded input, so the path is the recorded one even though the Results differ
+        self.assertEqual([step.task_name for step in steps], ['Append', 'Append', 'Append', 'Sum'])
+        self.assertFalse(steps[0].matches)
+
+    def test_sampling_positive001(self):
+        tracer = ExecutionTracer(snapshot_rate=0.5)
+        sampled = [tracer.is_sampled('run-{}'.format(i)) for i in range(1000)]
+        self.assertTrue(400 < sum(sampled) < 600)
+        self.assertEqual(sampled, [tracer.is_sampled('run-{}'.format(i)) for i in range(1000)])
+
+    def test_replay_not_sampled_negative001(self):
+        tracer = ExecutionTracer(snapshot_rate=0.0)
+        self.run_traced(get_workflow(), tracer, 'run-1')
+        with self.assertRaises(Exception):
+            replay(get_workflow(), tracer.records('run-1'))
+        with self.assertRaises(Exception):
+            ExecutionTracer(snapshot_rate=2)
+
+
+# EOF
@@ -0,0 +1,201 @@
+import os
+import shutil
+import socket
+import stat
+import tempfile
+import threading
+import time
+import unittest
+import warnings
+from multiprocessing import AuthenticationError
+from pytaskflow.taskflow_engine import Function, Result, Task, WorkFlow
+from pytaskflow.subworkflow import WorkFlowRegistry
+from pytaskflow.worker_pool import WarmWorkerPool, WorkerPoolServer, WorkerPoolClient, WorkerCrashedError, current_memory_bytes
+
+
+# Number of times get_pid_workflow() was called in this process
+BUILDS = []
+
+
+class PidFunction(Function):
+    """
+    Reports the process it ran in and how often that process built the WorkFlow. Exits the process when asked to.
+    """
+    def __init__(self):
+        super(PidFunction, self).__init__()
+
+    def execute(self, input_result=Result(result_obj={}), globals_dict={}):
+        if input_result.result_obj.get('Crash'):
+            os._exit(3)
+        if input_result.result_obj.get('Raise'):
+            raise ValueError('raised in the worker')
+        return Result(result_obj={'Pid': os.getpid(), 'Builds': len(BUILDS), 'Value': input_result.result_obj.get('Value')})
+
+
+def get_pid_workflow():
+    BUILDS.append(os.getpid())
+    task = Task(task_name='Pid')
+    task.register_function(function=PidFunction(), success_task=None, err_task=None)
+    return WorkFlow(workflow_name='Pid', starter_task=task)
+
+
+def get_flagged_workflow():
+    # Fails while the file named by PYTASKFLOW_TEST_FAIL_BUILD exists - read in spawned workers too
+    if os.path.exists(os.environ.get('PYTASKFLOW_TEST_FAIL_BUILD', '')):
+        raise ValueError('factory failed')
+    return get_pid_workflow()
+
+
+def get_registry():
+    registry = WorkFlowRegistry()
+    registry.register('pid', 'tests.test_worker_pool:get_pid_workflow')
+    return registry
+
+
+class WorkerPoolTests(unittest.TestCase):
+    def test_warm_workers_positive001(self):
+        del BUILDS[:]
+        with WarmWorkerPool(get_registry(), workers=2, max_runs_per_worker=100) as pool:
+            results = [pool.run('pid', Result(result_obj={'Value': i})) for i in range(10)]
+            self.assertEqual([result.result_obj['Value'] for result in results], list(range(10)))
+            # Built once in the parent before forking - never again in the workers
+            self.assertEqual(set(result.result_obj['Builds'] for result in results), {1})
+            self.assertNotIn(os.getpid(), set(result.result_obj['Pid'] for result in results))
+            futures = [pool.submit('pid', Result(result_obj={'Value': i})) for i in range(6)]
+            self.assertEqual([future.result().result_obj['Value'] for future in futures], list(range(6)))
+            error = pool.run('pid', Result(result_obj={'Raise': True}))
+            self.assertTrue(error.is_error)
+            self.assertIn('raised in the worker', error.err_msg)
+            stats = pool.stats()
+        self.assertEqual(stats['runs'], 17)
+        self.assertEqual(len(stats['worker_runs']), 2)
+        self.assertEqual(BUILDS, [os.getpid()])
+
+    def test_spawned_workers_positive001(self):
+        with WarmWorkerPool(get_registry(), workers=1, start_method='spawn', codec='marshal') as pool:
+            first = pool.run('pid', Result(result_obj={'Value': 1}))
+            second = pool.run('pid', Result(result_obj={'Value': 2}))
+        # A spawned worker built the WorkFlow itself, once
+        self.assertEqual((first.result_obj['Builds'], second.result_obj['Builds']), (1, 1))
+        self.assertEqual(first.result_obj['Pid'], second.result_obj['Pid'])
+
+    def test_recycling_positive001(self):
+        with WarmWorkerPool(get_registry(), workers=1, max_runs_per_worker=3) as pool:
+            pids = [pool.run('pid').result_obj['Pid'] for _ in range(7)]
+            self.assertEqual(len(set(pids[:3])), 1)
+            self.assertEqual(len(set(pids)), 3)
+            self.assertEqual(pool.stats()['recycled'], 2)
+        with WarmWorkerPool(get_registry(), workers=1, max_memory_mb=1) as pool:
+            pids = [pool.run('pid').result_obj['Pid'] for _ in range(3)]
+            self.assertEqual(len(set(pids)), 3)
+        self.assertGreater(current_memory_bytes(), 1024 * 1024)
+
+    def test_unix_socket_positive001(self):
+        directory = tempfile.mkdtemp()
+        address = os.path.join(directory, 'pool.sock')
+        try:
+            with WarmWorkerPool(get_registry(), workers=2) as pool:
+                server = WorkerPoolServer(pool, address, authkey=b'secret').start()
+                results = []
+
+                def use_client():
+                    with WorkerPoolClient(address, authkey=b'secret') as client:
+                        results.extend(client.run('pid', Result(result_obj={'Value': i})).result_obj['Value'] for i in range(5))
+                        results.append(client.run('missing'))
+
+                threads = [threading.Thread(target=use_client) for _ in range(3)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                self.assertEqual(stat.S_IMODE(os.stat(address).st_mode), 0o600)
+                # A client without the secret is turned away and the server keeps serving
+                with self.assertRaises(AuthenticationError):
+                    WorkerPoolClient(address, authkey=b'wrong')
+                with WorkerPoolClient(address, authkey=b'secret') as client:
+                    self.assertEqual(client.run('pid', Result(result_obj={'Value': 7})).result_obj['Value'], 7)
+                with self.assertRaises(Exception):
+                    WorkerPoolServer(pool, os.path.join(directory, 'open.sock'), authkey=None)
+                server.close()
+                self.assertFalse(server._thread.is_alive())
+            errors = [result for result in results if isinstance(result, Result)]
+            self.assertEqual(len(errors), 3)
+            self.assertIn('no WorkFlow is registered as missing', errors[0].err_msg)
+            self.assertEqual(sorted(value for value in results if not isinstance(value, Result)), sorted(list(range(5)) * 3))
+            self.assertFalse(os.path.exists(address))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_silent_client_negative001(self):
+        directory = tempfile.mkdtemp()
+        address = os.path.join(directory, 'pool.sock')
+        try:
+            with WarmWorkerPool(get_registry(), workers=1) as pool:
+                server = WorkerPoolServer(pool, address, authkey=b'secret', handshake_timeout=0.5).start()
+                # A client that connects and never answers the challenge does not hold up the next one
+                silent = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                silent.connect(address)
+                start = time.time()
+                with WorkerPoolClient(address, authkey=b'secret') as client:
+                    self.assertEqual(client.run('pid', Result(result_obj={'Value': 3})).result_obj['Value'], 3)
+                self.assertLess(time.time() - start, 0.5)
+                # ...and it is disconnected once the handshake_timeout has passed
+                silent.settimeout(5)
+                received = b''
+                while True:
+                    data = silent.recv(4096)
+                    if not data:
+                        break
+                    received += data
+                self.assertTrue(received)
+                silent.close()
+                server.close()
+        finally:
+            shutil.rmtree(directory)
+
+    def test_failed_replacement_negative001(self):
+        directory = tempfile.mkdtemp()
+        flag = os.path.join(directory, 'fail')
+        os.environ['PYTASKFLOW_TEST_FAIL_BUILD'] = flag
+        registry = WorkFlowRegistry()
+        registry.register('flagged', 'tests.test_worker_pool:get_flagged_workflow')
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                with WarmWorkerPool(registry, workers=1, max_runs_per_worker=1, start_method='spawn') as pool:
+                    self.assertFalse(pool.run('flagged').is_error)
+                    open(flag, 'w').close()
+                    # The replacement keeps failing: run() raises instead of waiting forever
+                    with self.assertRaises(Exception) as context:
+                        pool.run('flagged')
+                    self.assertIn('factory failed', str(context.exception))
+                    self.assertGreaterEqual(pool.stats()['start_failures'], 1)
+                    os.remove(flag)
+                    end = time.monotonic() + 30
+                    while time.monotonic() < end:
+                        try:
+                            result = pool.run('flagged')
+                            break
+                        except Exception:
+                            time.sleep(0.1)
+                    self.assertFalse(result.is_error)
+        finally:
+            del os.environ['PYTASKFLOW_TEST_FAIL_BUILD']
+            shutil.rmtree(directory)
+
+    def test_crashed_worker_negative001(self):
+        with WarmWorkerPool(get_registry(), workers=1) as pool:
+            with self.assertRaises(WorkerCrashedError) as context:
+                pool.run('pid', Result(result_obj={'Crash': True}))
+            self.assertEqual(context.exception.exitcode, 3)
+            self.assertEqual(pool.run('pid', Result(result_obj={'Value': 1})).result_obj['Value'], 1)
+            self.assertEqual(pool.stats()['crashed'], 1)
+            with self.assertRaises(Exception):
+                pool.run('missing')
+        with self.assertRaises(Exception):
+            pool.run('pid')
+        with self.assertRaises(Exception):
+            WarmWorkerPool(get_registry(), max_runs_per_worker=0)
+
+
+# EOF